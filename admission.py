@@ -0,0 +1,209 @@
+import threading
+import time
+
+from customers import normalize_contact
+from menu import TIFFIN_SIZES
+from metrics import REGISTRY
+from pricing import MINIMUM_ORDER_VALUE
+
+
+# Sanity limits on one order; the form's inputs stop at 20, so anything
+# above these didn't come from the form
+MAX_QTY_PER_LINE = 20
+MAX_TIFFINS_PER_MEAL = 40
+MAX_ORDER_VALUE = 50000
+
+# Token buckets: a burst of this many submissions, then one per refill interval
+CONTACT_BURST = 3
+CONTACT_REFILL_SECONDS = 60
+SESSION_BURST = 5
+SESSION_REFILL_SECONDS = 20
+# Attempts to verify a returning customer, per contact number and per session
+LOOKUP_BURST = 5
+LOOKUP_REFILL_SECONDS = 60
+# Staff password attempts per session; the larger cap across all sessions
+# bounds guessing from many sessions without letting one lock staff out
+STAFF_SESSION_BURST = 5
+STAFF_SESSION_REFILL_SECONDS = 60
+STAFF_GLOBAL_BURST = 50
+STAFF_GLOBAL_REFILL_SECONDS = 10
+# Buckets kept per limiter before idle (full) ones are dropped
+MAX_BUCKETS = 10000
+
+
+def validate_order(name, contact, address, priced, allowed_dates):
+    """
+    Check a submission before anything is stored.
+
+    Args:
+        allowed_dates (set): full_date strings currently open for ordering
+
+    Returns:
+        list: Error messages for the customer (empty if the order is valid)
+    """
+    missing_fields = []
+    if not name.strip():
+        missing_fields.append("Name")
+    if not contact.strip():
+        missing_fields.append("Contact Number")
+    if not address.strip():
+        missing_fields.append("Address")
+    if not priced.dates:
+        missing_fields.append("Dates")
+    if missing_fields:
+        return [f'Please fill all required fields marked with *: {", ".join(missing_fields)}']
+
+    errors = []
+    if normalize_contact(contact) is None:
+        errors.append("Please enter a valid 10-digit mobile number.")
+    if not priced.meets_minimum():
+        errors.append(f'**Minimum order value is ₹{MINIMUM_ORDER_VALUE}.** Your current total is '
+                      f'₹{priced.total}. Please add more items to your order.')
+    if priced.total > MAX_ORDER_VALUE:
+        errors.append(f"Orders over ₹{MAX_ORDER_VALUE} can't be placed online; please call us.")
+    if (priced.quantities > MAX_QTY_PER_LINE).any() or (priced.quantities < 0).any():
+        errors.append(f"Each item can be ordered at most {MAX_QTY_PER_LINE} at a time.")
+    tiffins = priced.quantities[:, :, [priced.menu.sku_index[size] for size in TIFFIN_SIZES]]
+    if (tiffins.sum(axis=2) > MAX_TIFFINS_PER_MEAL).any():
+        errors.append(f"At most {MAX_TIFFINS_PER_MEAL} tiffins can be ordered per meal.")
+    closed = [d for d in priced.dates if d['full_date'] not in allowed_dates]
+    if closed:
+        errors.append("Orders are closed for " + ", ".join(f"{d['date']} ({d['day']})" for d in closed)
+                      + ". Please reload the page and choose again.")
+    if errors:
+        REGISTRY.inc('admission_invalid')
+    return errors
+
+
+class RateLimited(Exception):
+    """Too many submissions from one contact number or session"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Rate limited by {scope}; retry in {retry_after:.0f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated_at')
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated_at = now
+
+
+class RateLimiter:
+    """Token buckets keyed by contact number or session, shared by all sessions in this process"""
+
+    def __init__(self, scope, burst, refill_seconds):
+        self.scope = scope
+        self.burst = burst
+        self.refill_seconds = refill_seconds
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _refill(self, bucket, now):
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) / self.refill_seconds)
+        bucket.updated_at = now
+
+    def _prune(self, now):
+        for key, bucket in list(self._buckets.items()):
+            self._refill(bucket, now)
+            if bucket.tokens >= self.burst:
+                del self._buckets[key]
+
+    def retry_after(self, key, now=None):
+        """Seconds until key may submit again (0 if it may now)"""
+        now = now or time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0.0
+            self._refill(bucket, now)
+            return max(0.0, (1 - bucket.tokens) * self.refill_seconds)
+
+    def take(self, key, now=None):
+        """Spend one token for key; raises RateLimited if there is none"""
+        now = now or time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            else:
+                self._refill(bucket, now)
+            if bucket.tokens < 1:
+                retry_after = (1 - bucket.tokens) * self.refill_seconds
+            else:
+                bucket.tokens -= 1
+                return
+        REGISTRY.inc(f"admission_rate_limited_{self.scope}")
+        raise RateLimited(self.scope, retry_after)
+
+    def refund(self, key, now=None):
+        """Give back a token spent by take()"""
+        now = now or time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._refill(bucket, now)
+                bucket.tokens = min(self.burst, bucket.tokens + 1)
+
+    def size(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+contact_limiter = RateLimiter('contact', CONTACT_BURST, CONTACT_REFILL_SECONDS)
+session_limiter = RateLimiter('session', SESSION_BURST, SESSION_REFILL_SECONDS)
+lookup_contact_limiter = RateLimiter('lookup_contact', LOOKUP_BURST, LOOKUP_REFILL_SECONDS)
+lookup_session_limiter = RateLimiter('lookup_session', LOOKUP_BURST, LOOKUP_REFILL_SECONDS)
+staff_session_limiter = RateLimiter('staff_session', STAFF_SESSION_BURST, STAFF_SESSION_REFILL_SECONDS)
+staff_limiter = RateLimiter('staff', STAFF_GLOBAL_BURST, STAFF_GLOBAL_REFILL_SECONDS)
+
+
+def _take_all(buckets):
+    """
+    Spend a token from every (limiter, key) bucket, or raise RateLimited.
+
+    Each token is checked and spent under its limiter's lock, so concurrent
+    submissions can't both take a bucket's last token. If a later bucket is
+    empty the tokens already spent are refunded, so a session that is over
+    its limit doesn't also drain the contact's tokens.
+    """
+    now = time.monotonic()
+    taken = []
+    try:
+        for limiter, key in buckets:
+            limiter.take(key, now)
+            taken.append((limiter, key))
+    except RateLimited:
+        for limiter, key in taken:
+            limiter.refund(key, now)
+        raise
+
+
+def admit(contact, session_id):
+    """Let a validated submission through to storage, or raise RateLimited"""
+    contact = normalize_contact(contact) or contact
+    _take_all(((session_limiter, session_id), (contact_limiter, contact)))
+    REGISTRY.inc('admission_admitted')
+
+
+def admit_lookup(contact, session_id):
+    """Allow one attempt to verify a returning customer, or raise RateLimited"""
+    contact = normalize_contact(contact) or contact
+    _take_all(((lookup_session_limiter, session_id), (lookup_contact_limiter, contact)))
+
+
+def admit_staff_attempt(session_id):
+    """Allow one staff password attempt from a session, or raise RateLimited"""
+    _take_all(((staff_session_limiter, session_id), (staff_limiter, 'all')))
+
+
+def limiter_stats():
+    """Keys currently tracked by each limiter, for monitoring"""
+    return {limiter.scope: limiter.size() for limiter in (
+        contact_limiter, session_limiter, lookup_contact_limiter, lookup_session_limiter,
+        staff_session_limiter, staff_limiter)}
@@ -0,0 +1,204 @@
+"""
+Simulate many customers placing orders at once and report how the app holds up.
+
+Each simulated session drives streamlit_app.py through Streamlit's AppTest:
+it loads the page, selects dates, fills in quantities one rerun at a time,
+enters contact details and submits. The Google Sheet is replaced by the
+in-memory FakeClient, so latency, failures and quota limits are controlled
+and every API call is counted.
+
+    python benchmarks/bench_order_flow.py --sessions 40 --concurrency 4 --latency 0.3
+
+Reports rerun and submit latency percentiles, memory per session, and
+Sheets API calls per order once the outbox has drained.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'streamlit_app.py')
+
+
+def percentiles(samples):
+    import numpy as np
+    if not samples:
+        return {'n': 0}
+    values = np.array(samples) * 1000
+    return {
+        'n': len(samples),
+        'p50_ms': round(float(np.percentile(values, 50)), 1),
+        'p95_ms': round(float(np.percentile(values, 95)), 1),
+        'p99_ms': round(float(np.percentile(values, 99)), 1),
+        'max_ms': round(float(values.max()), 1),
+    }
+
+
+def run_session(session_id, n_dates, rng):
+    """Place one order; returns (AppTest, rerun timings, submit timing, succeeded)"""
+    from streamlit.testing.v1 import AppTest
+
+    reruns = []
+
+    def timed_run(at):
+        started = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - started
+        if at.exception:
+            raise RuntimeError(f"session {session_id}: {at.exception[0].message}")
+        return elapsed
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    reruns.append(timed_run(at))
+
+    dates = at.multiselect[0]
+    # Friday has no menu in day-menu.yaml
+    options = [option for option in dates.options if 'Friday' not in option]
+    chosen = rng.sample(options, min(n_dates, len(options)))
+    dates.set_value(chosen)
+    reruns.append(timed_run(at))
+
+    for number_input in at.number_input:
+        if number_input.key.startswith(('lunch_full_tiffins_', 'dinner_half_tiffins_')):
+            number_input.set_value(rng.randint(1, 3))
+            reruns.append(timed_run(at))
+
+    at.text_input(key='form_name').input(f"Bench Customer {session_id}")
+    at.text_input(key='form_contact').input(f"98{session_id % 10 ** 8:08d}")
+    at.text_area(key='form_address').input(f"{session_id} Test Lane, Pune 4110{session_id % 100:02d}")
+    next(button for button in at.button if button.label == 'Submit Order').click()
+    submit = timed_run(at)
+    return at, reruns, submit, bool(at.success)
+
+
+def wait_for_drain(timeout):
+    from outbox import pending_count
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pending_count() == 0:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def install_fake(args):
+    """Point this process at a FakeClient and return it"""
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import sheets
+    from benchmarks.fake_gspread import FakeClient
+
+    fake = FakeClient(latency=args.latency, error_rate=args.error_rate, quota_per_minute=args.quota)
+    sheets.use_client_factory(fake.factory)
+    return fake
+
+
+def worker(worker_id, session_ids, seeds, args, results):
+    """
+    One simulated Streamlit worker process placing orders one session at a
+    time. AppTest isn't thread-safe, so concurrency comes from processes,
+    which also matches how autoscaled workers share the local order store.
+    """
+    fake = install_fake(args)
+    from config import SHEET_NAME, SPREADSHEET_NAME
+    timings = []
+    for session_id in session_ids:
+        _, reruns, submit, ok = run_session(session_id, args.dates, random.Random(seeds[session_id]))
+        timings.append((reruns, submit, ok))
+    drained = wait_for_drain(args.drain_timeout)
+    results.put({
+        'worker': worker_id,
+        'timings': timings,
+        'drained': drained,
+        'finished_at': time.time(),
+        'api_calls': fake.calls,
+        'rows_written': len(fake.spreadsheets[SPREADSHEET_NAME].sheets[SHEET_NAME].rows) - 1,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4, help="simulated worker processes")
+    parser.add_argument('--dates', type=int, default=3, help="dates selected per order")
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds per fake API call")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--quota', type=int, default=None,
+                        help="fake API calls allowed per minute, per worker process")
+    parser.add_argument('--memory-sessions', type=int, default=3,
+                        help="sessions measured separately under tracemalloc (0 to skip)")
+    parser.add_argument('--drain-timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    # Keep benchmark orders out of the real local store; set before any app
+    # module is imported so every worker process inherits it
+    os.environ['TIFFIN_DATA_DIR'] = tempfile.mkdtemp(prefix='tiffin-bench-')
+
+    rng = random.Random(args.seed)
+    seeds = [rng.random() for _ in range(args.sessions + args.memory_sessions)]
+    chunks = [list(range(args.sessions))[i::args.concurrency] for i in range(args.concurrency)]
+    results = multiprocessing.Queue()
+    started = time.time()
+    processes = [
+        multiprocessing.Process(target=worker, args=(i, chunk, seeds, args, results))
+        for i, chunk in enumerate(chunks) if chunk
+    ]
+    for process in processes:
+        process.start()
+    outputs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    timings = [t for output in outputs for t in output['timings']]
+    orders = sum(1 for _, _, ok in timings if ok)
+    api_calls = {}
+    for output in outputs:
+        for name, count in output['api_calls'].items():
+            api_calls[name] = api_calls.get(name, 0) + count
+    drained = all(output['drained'] for output in outputs)
+
+    # Memory is measured on a separate sequential pass; tracemalloc slows
+    # everything down and would distort the latency numbers above
+    memory_per_session = None
+    if args.memory_sessions:
+        install_fake(args)
+        # Warm up first so one-time imports and caches aren't billed to a session
+        run_session(-1, args.dates, random.Random(0))
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        kept = [run_session(args.sessions + i, args.dates, random.Random(seeds[args.sessions + i]))[0]
+                for i in range(args.memory_sessions)]
+        memory_per_session = (tracemalloc.get_traced_memory()[0] - baseline) / len(kept)
+        tracemalloc.stop()
+
+    report = {
+        'sessions': args.sessions,
+        'worker_processes': len(processes),
+        'orders_submitted': orders,
+        'rerun_latency': percentiles([t for reruns, _, _ in timings for t in reruns]),
+        'submit_latency': percentiles([submit for _, submit, _ in timings]),
+        'memory_per_session_kb': round(memory_per_session / 1024, 1) if memory_per_session else None,
+        'outbox_drained': drained,
+        'seconds_until_drained': round(max(o['finished_at'] for o in outputs) - started, 2) if drained else None,
+        'sheet_rows_written': sum(output['rows_written'] for output in outputs),
+        'api_calls': dict(sorted(api_calls.items())),
+        'api_calls_per_order': round(sum(api_calls.values()) / orders, 2) if orders else None,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == '__main__':
+    main()
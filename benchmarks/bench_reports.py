@@ -0,0 +1,125 @@
+"""
+Time the sales report page against a year of order history.
+
+Seeds a fresh local database with a year of synthetic orders (stored through
+orders.store_orders, so the pre-aggregated sales tables are maintained the
+way they are in production), then renders pages/sales_report.py through
+Streamlit's AppTest and times each report query and the forecast.
+
+    python benchmarks/bench_reports.py --orders-per-day 60 --runs 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE = os.path.join(ROOT, 'pages', 'sales_report.py')
+
+
+def seed(days, orders_per_day, rng):
+    """Store orders_per_day orders for each Monday-Saturday in the past `days` days"""
+    from menu import TIFFIN_SIZES, get_menu
+    from orders import Order, OrderLine, store_orders
+    from pricing import MEALS
+
+    menu = get_menu()
+    today = date.today()
+    stored = 0
+    for offset in range(days, 0, -1):
+        day = today - timedelta(days=offset)
+        day_menu = menu.day(day.strftime('%A'))
+        if day.weekday() == 6 or day_menu is None:
+            continue
+        batch = []
+        for n in range(orders_per_day):
+            lines = []
+            for meal in rng.sample(MEALS, rng.randint(1, len(MEALS))):
+                for size in TIFFIN_SIZES:
+                    if size in day_menu.tiffins and rng.random() < 0.6:
+                        lines.append(OrderLine(day.isoformat(), day_menu.day, meal, size,
+                                               rng.randint(1, 2), day_menu.tiffins[size].cost))
+                for extra in day_menu.extras:
+                    if rng.random() < 0.2:
+                        lines.append(OrderLine(day.isoformat(), day_menu.day, meal, extra.name, 1, extra.cost))
+            if lines:
+                batch.append(Order(f"BENCH-{day:%y%m%d}-{n:04d}", f"{day} 08:00:00", f"Customer {n}",
+                                   f"98{rng.randrange(10 ** 8):08d}", "1 Test Road, Pune 411001", '',
+                                   sum(line.total for line in lines), '', lines, menu_version=menu.version))
+        created, _ = store_orders(batch, mirror=False)
+        stored += len(created)
+    return stored
+
+
+def timings(func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--days', type=int, default=365, help="days of history to seed")
+    parser.add_argument('--orders-per-day', type=int, default=40)
+    parser.add_argument('--runs', type=int, default=3, help="repetitions per measurement")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    # Keep the app's local state out of the working tree
+    os.environ['TIFFIN_DATA_DIR'] = tempfile.mkdtemp(prefix='tiffin-reports-')
+    # Every meal takes as many orders as the benchmark places
+    os.environ.setdefault('TIFFIN_MEAL_CAPACITY', str(args.orders_per_day * 10))
+    sys.path.insert(0, ROOT)
+
+    started = time.perf_counter()
+    stored = seed(args.days, args.orders_per_day, random.Random(42))
+    seed_s = time.perf_counter() - started
+
+    import reports
+    from streamlit.testing.v1 import AppTest
+
+    today = date.today()
+    start, end = (today - timedelta(weeks=52)).isoformat(), today.isoformat()
+    next_monday = (today - timedelta(days=today.weekday()) + timedelta(weeks=1)).isoformat()
+
+    def render():
+        at = AppTest.from_file(PAGE, default_timeout=120)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return at
+
+    # st.cache_data is per process, so every AppTest after the first is warm
+    started = time.perf_counter()
+    at = render()
+    first_render_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    report = {
+        'orders': stored,
+        'seed_s': round(seed_s, 1),
+        'first_render_ms': first_render_ms,
+        'cached_render_ms': timings(render, args.runs),
+        'daily_revenue_ms': timings(lambda: reports.daily_revenue(start, end), args.runs),
+        'weekly_counts_ms': timings(lambda: reports.weekly_counts(start, end), args.runs),
+        'weekday_counts_ms': timings(lambda: reports.weekday_counts(start, end), args.runs),
+        'forecast_ms': timings(lambda: reports.forecast_demand(next_monday), args.runs),
+        'rebuild_sales_ms': timings(reports.rebuild_sales, args.runs),
+        'rendered_tables': len(at.dataframe),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:>20}: {value}")
+
+
+if __name__ == '__main__':
+    main()
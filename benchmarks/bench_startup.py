@@ -0,0 +1,143 @@
+"""
+Measure what a cold Streamlit worker pays before its first page is shown.
+
+Every measurement runs in a fresh Python process, as on a newly started
+container:
+
+- import time per module, from ``python -X importtime -c "import streamlit_app"``
+  (cumulative milliseconds, for the app's own modules and the heavy
+  third-party packages, and which heavy packages weren't imported at all)
+- time to first render: loading streamlit_app.py through AppTest and running
+  it once, with the Google Sheet replaced by the in-memory FakeClient
+- how long the background warm-up takes to finish after that first render
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Expensive to import. The first render itself needs streamlit, numpy
+# (pricing) and yaml (menu); the others should load only on use, or on the
+# warm-up thread
+HEAVY_MODULES = (
+    'streamlit', 'numpy', 'pandas', 'gspread', 'google.oauth2.service_account',
+    'PIL.Image', 'yaml',
+)
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+FIRST_RENDER = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import sheets
+
+def fake_factory(credentials_file=None):
+    # Imported on use so the fake doesn't load gspread ahead of the app
+    from benchmarks.fake_gspread import FakeClient
+    return FakeClient(latency={latency}).factory(credentials_file)
+
+sheets.use_client_factory(fake_factory)
+heavy = {heavy!r}
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+rendered = time.perf_counter()
+# By the app or by the warm-up thread it started
+loaded_at_render = [name for name in heavy if name in sys.modules]
+# Wait for the warm-up thread started by the first render
+from metrics import REGISTRY
+while 'warmup' not in REGISTRY.snapshot()[0]:
+    if time.perf_counter() - rendered > 60:
+        break
+    time.sleep(0.01)
+print(json.dumps({{
+    'error': at.exception[0].message if at.exception else None,
+    'streamlit_import_s': imported - started,
+    'first_render_s': rendered - imported,
+    'warmup_done_after_render_s': time.perf_counter() - rendered,
+    'loaded_at_first_render': loaded_at_render,
+}}))
+"""
+
+
+def import_times():
+    """Cumulative import milliseconds per module for a cold ``import streamlit_app``"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import streamlit_app'],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=ROOT)
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2)) / 1000
+    return times
+
+
+def is_app_module(name):
+    """True for the app's own top-level modules (the .py files beside streamlit_app.py)"""
+    return '.' not in name and os.path.isfile(os.path.join(ROOT, name + '.py'))
+
+
+def first_render(latency):
+    script = FIRST_RENDER.format(root=ROOT, app=os.path.join(ROOT, 'streamlit_app.py'),
+                                 heavy=HEAVY_MODULES, latency=latency)
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    if report['error']:
+        raise RuntimeError(report['error'])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=3, help="cold first renders to time")
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds per fake Sheets API call")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    # Keep the app's local state out of the working tree
+    os.environ['TIFFIN_DATA_DIR'] = tempfile.mkdtemp(prefix='tiffin-startup-')
+
+    times = import_times()
+    renders = [first_render(args.latency) for _ in range(args.runs)]
+
+    def median(key):
+        return round(statistics.median(run[key] for run in renders) * 1000, 1)
+
+    report = {
+        'import_ms': {name: times[name] for name in sorted(
+            (name for name in times if is_app_module(name) or name in HEAVY_MODULES),
+            key=lambda name: -times[name])},
+        'not_imported_by_app': [name for name in HEAVY_MODULES if name not in times],
+        'runs': args.runs,
+        'streamlit_import_ms': median('streamlit_import_s'),
+        'first_render_ms': median('first_render_s'),
+        'warmup_done_after_render_ms': median('warmup_done_after_render_s'),
+        'loaded_at_first_render': renders[-1]['loaded_at_first_render'],
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        if key == 'import_ms':
+            print("import time (cumulative ms):")
+            for name, ms in value.items():
+                print(f"{name:>32}: {ms:.1f}")
+        else:
+            print(f"{key:>32}: {value}")
+
+
+if __name__ == '__main__':
+    main()
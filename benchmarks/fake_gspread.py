@@ -0,0 +1,139 @@
+"""
+In-memory stand-in for the parts of gspread the app uses, with configurable
+latency, error rate and per-minute quota. Install it with
+``sheets.use_client_factory(FakeClient(...).factory)``.
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+
+from config import SHEET_NAME, SPREADSHEET_NAME
+
+
+# The order sheet as first laid out; the app adds the Order ID and Payment
+# Screenshot columns on its first write
+DEFAULT_HEADERS = ['Timestamp', 'Name', 'Contact Number', 'Address',
+                   'Tiffin Details', 'Special Instructions', 'Total Price']
+
+
+def _api_error(code, message, status):
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({'error': {'code': code, 'message': message, 'status': status}}).encode()
+    return APIError(response)
+
+
+class FakeClient:
+    """
+    Args:
+        latency (float): Seconds each API call sleeps
+        error_rate (float): Probability an API call fails with a 500
+        quota_per_minute (int): Calls allowed per rolling minute before 429s
+            (None for unlimited)
+    """
+
+    def __init__(self, latency=0.2, error_rate=0.0, quota_per_minute=None,
+                 spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME, headers=DEFAULT_HEADERS):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.calls = {}
+        self.spreadsheets = {spreadsheet_name: FakeSpreadsheet(self, {sheet_name: [list(headers)]})}
+
+    def factory(self, credentials_file=None):
+        """Use as sheets.use_client_factory(fake.factory)"""
+        self.api_call('authorize')
+        return None, self
+
+    def api_call(self, name):
+        """Account for, delay and possibly fail one API call"""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            over_quota = self.quota_per_minute is not None and len(self._recent) >= self.quota_per_minute
+            self._recent.append(now)
+        if self.latency:
+            time.sleep(self.latency)
+        if over_quota:
+            raise _api_error(429, "Quota exceeded for quota metric 'Write requests'", 'RESOURCE_EXHAUSTED')
+        if self.error_rate and random.random() < self.error_rate:
+            raise _api_error(500, "Internal error encountered.", 'INTERNAL')
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def open(self, title):
+        self.api_call('open')
+        if title not in self.spreadsheets:
+            raise SpreadsheetNotFound(title)
+        return self.spreadsheets[title]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, sheets):
+        self.client = client
+        self.sheets = {name: FakeWorksheet(client, rows) for name, rows in sheets.items()}
+
+    def worksheet(self, title):
+        self.client.api_call('worksheet')
+        if title not in self.sheets:
+            raise WorksheetNotFound(title)
+        return self.sheets[title]
+
+
+class FakeWorksheet:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self._lock = threading.Lock()
+
+    def row_values(self, row):
+        self.client.api_call('row_values')
+        with self._lock:
+            return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col):
+        self.client.api_call('col_values')
+        with self._lock:
+            return [row[col - 1] if col <= len(row) else '' for row in self.rows]
+
+    def get_all_values(self):
+        self.client.api_call('get_all_values')
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+    def get(self, range_name):
+        """Supports the 'A<start>:<col>' ranges used for delta syncs"""
+        self.client.api_call('get')
+        start = int(range_name.split(':')[0].lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+        with self._lock:
+            return [list(row) for row in self.rows[start - 1:]]
+
+    def update_cell(self, row, col, value):
+        self.client.api_call('update_cell')
+        with self._lock:
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            cells.extend([''] * (col - len(cells)))
+            cells[col - 1] = str(value)
+
+    def append_row(self, values, **kwargs):
+        self.client.api_call('append_row')
+        with self._lock:
+            self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self.client.api_call('append_rows')
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
@@ -0,0 +1,144 @@
+import os
+
+import production  # noqa: F401 (production_counts seeds new slots)
+from db import connect, register_schema, transaction
+from menu import TIFFIN_SIZES
+
+
+# Tiffins the kitchen can make per date and meal unless a limit is set for
+# that slot; full and half tiffins each take one place, extras don't count
+DEFAULT_MEAL_CAPACITY = int(os.environ.get('TIFFIN_MEAL_CAPACITY', 150))
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS meal_capacity (
+    date TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    capacity INTEGER,
+    booked INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, meal)
+);
+""")
+
+# A slot's counter is created on first use, seeded from the production
+# totals so orders stored before the slot existed are counted
+_SEED_SLOT = (
+    "INSERT OR IGNORE INTO meal_capacity (date, meal, booked) "
+    "SELECT ?, ?, COALESCE(SUM(qty), 0) FROM production_counts "
+    f"WHERE date = ? AND meal = ? AND sku IN ({', '.join('?' * len(TIFFIN_SIZES))})"
+)
+
+
+class CapacityError(Exception):
+    """An order asks for more tiffins than a slot has left"""
+
+    def __init__(self, date, meal, requested, remaining):
+        super().__init__(f"Only {remaining} tiffins left for {meal} on {date}, {requested} requested")
+        self.date = date
+        self.meal = meal
+        self.requested = requested
+        self.remaining = remaining
+
+
+def _seed(conn, date, meal):
+    conn.execute(_SEED_SLOT, (date, meal, date, meal, *TIFFIN_SIZES))
+
+
+def slot_demand(order):
+    """Tiffins an order books per (date, meal)"""
+    demand = {}
+    for line in order.lines:
+        if line.sku in TIFFIN_SIZES:
+            demand[(line.date, line.meal)] = demand.get((line.date, line.meal), 0) + line.qty
+    return demand
+
+
+def reserve(conn, order):
+    """
+    Book an order's tiffins against each slot's capacity using an open
+    transaction.
+
+    Each slot is one conditional UPDATE on its primary key, so the check
+    costs the same however many orders are outstanding, and two workers
+    can't both take the last places.
+
+    Raises:
+        CapacityError: A slot doesn't have room; the caller's transaction
+            should be rolled back
+    """
+    for (date, meal), qty in slot_demand(order).items():
+        _seed(conn, date, meal)
+        cursor = conn.execute(
+            "UPDATE meal_capacity SET booked = booked + ? "
+            "WHERE date = ? AND meal = ? AND booked + ? <= COALESCE(capacity, ?)",
+            (qty, date, meal, qty, DEFAULT_MEAL_CAPACITY)
+        )
+        if cursor.rowcount == 0:
+            raise CapacityError(date, meal, qty, remaining(date, meal, conn))
+
+
+def book(conn, order):
+    """Count an order that was already taken (e.g. imported from the sheet)
+    against its slots without checking capacity"""
+    for (date, meal), qty in slot_demand(order).items():
+        _seed(conn, date, meal)
+        conn.execute("UPDATE meal_capacity SET booked = booked + ? WHERE date = ? AND meal = ?",
+                     (qty, date, meal))
+
+
+def remaining(date, meal, conn=None):
+    """Tiffins still available for a date and meal"""
+    return remaining_for([date], conn).get((date, meal), DEFAULT_MEAL_CAPACITY)
+
+
+def remaining_for(dates, conn=None):
+    """
+    Tiffins still available for every meal on the given dates.
+
+    Returns:
+        dict: (date, meal) -> remaining, only for slots with orders or a limit;
+            any other slot has DEFAULT_MEAL_CAPACITY left
+    """
+    dates = list(dates)
+    if not dates:
+        return {}
+    conn = conn or connect()
+    rows = conn.execute(
+        "SELECT date, meal, COALESCE(capacity, ?) - booked AS remaining FROM meal_capacity "
+        f"WHERE date IN ({', '.join('?' * len(dates))})",
+        (DEFAULT_MEAL_CAPACITY, *dates)
+    ).fetchall()
+    slots = {(row['date'], row['meal']): max(row['remaining'], 0) for row in rows}
+    # Slots with orders from before the counters existed
+    missing = conn.execute(
+        "SELECT date, meal, SUM(qty) AS booked FROM production_counts "
+        f"WHERE date IN ({', '.join('?' * len(dates))}) "
+        f"AND sku IN ({', '.join('?' * len(TIFFIN_SIZES))}) GROUP BY date, meal",
+        (*dates, *TIFFIN_SIZES)
+    ).fetchall()
+    for row in missing:
+        slots.setdefault((row['date'], row['meal']), max(DEFAULT_MEAL_CAPACITY - row['booked'], 0))
+    return slots
+
+
+def set_capacity(date, meal, capacity):
+    """
+    Cap the tiffins taken for a date and meal (None restores the default).
+
+    A cap below what is already booked closes the slot to new orders; it
+    doesn't cancel existing ones.
+    """
+    with transaction() as conn:
+        _seed(conn, date, meal)
+        conn.execute("UPDATE meal_capacity SET capacity = ? WHERE date = ? AND meal = ?",
+                     (capacity, date, meal))
+
+
+def capacity_table(start_date, end_date):
+    """Capacity, booked and remaining tiffins per slot with a limit or orders"""
+    import pandas as pd
+    return pd.read_sql_query(
+        "SELECT date, meal, COALESCE(capacity, ?) AS capacity, booked, "
+        "MAX(COALESCE(capacity, ?) - booked, 0) AS remaining FROM meal_capacity "
+        "WHERE date BETWEEN ? AND ? ORDER BY date, meal",
+        connect(), params=(DEFAULT_MEAL_CAPACITY, DEFAULT_MEAL_CAPACITY, start_date, end_date)
+    )
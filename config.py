@@ -0,0 +1,25 @@
+import os
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+# Where orders are kept (see storage.py): 'sqlite', the local system of
+# record, or 'memory', which keeps orders in the process for tests. The
+# memory backend covers order intake only; subscriptions, production counts
+# and reports still use the local database.
+ORDER_BACKEND = os.environ.get('TIFFIN_ORDER_BACKEND', 'sqlite')
+
+# Copy stored orders to the Google Sheet in the background. Order intake
+# never waits on the sheet either way.
+SHEET_MIRROR = _flag('TIFFIN_SHEET_MIRROR', '1')
+
+# The sheet orders are mirrored to
+SPREADSHEET_NAME = os.environ.get('TIFFIN_SPREADSHEET', 'TiffinOrderSheet')
+SHEET_NAME = os.environ.get('TIFFIN_WORKSHEET', 'Sheet1')
+
+# Password for the staff pages (kitchen, metrics, menu admin, sales
+# report), if staff_password isn't set in .streamlit/secrets.toml. With
+# neither set the staff pages stay locked.
+STAFF_PASSWORD = os.environ.get('TIFFIN_STAFF_PASSWORD', '')
@@ -0,0 +1,178 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from db import connect, register_schema, transaction
+from metrics import REGISTRY
+
+
+log = logging.getLogger(__name__)
+
+
+# Most recently looked-up customers kept in memory
+MAX_CACHED = 5000
+# Another worker process may have taken a newer order since an entry was cached
+CACHE_TTL_SECONDS = 10 * 60
+
+# Indian mobile number, optionally written with +91 or a leading 0
+CONTACT_NUMBER = re.compile(r'(?:91|0)?([6-9]\d{9})')
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS customers (
+    contact TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    instructions TEXT NOT NULL DEFAULT '',
+    last_order_id TEXT NOT NULL,
+    last_order_at TEXT NOT NULL,
+    order_count INTEGER NOT NULL DEFAULT 0
+);
+""")
+
+
+def normalize_contact(contact):
+    """Return the 10-digit mobile number in a contact string, or None if it isn't one"""
+    match = CONTACT_NUMBER.fullmatch(''.join(ch for ch in contact if ch.isdigit()))
+    return match.group(1) if match else None
+
+
+def contact_key(contact):
+    """
+    Key for a contact number, so '+91 98765 43210' and '9876543210' match:
+    the 10-digit mobile number, or just the digits if it isn't one
+    """
+    return normalize_contact(contact) or ''.join(ch for ch in contact if ch.isdigit())
+
+
+class Customer:
+    """A returning customer's details as of their latest order"""
+    __slots__ = ('contact', 'name', 'address', 'instructions', 'last_order_id',
+                 'last_order_at', 'order_count')
+
+    def __init__(self, contact, name, address, instructions, last_order_id, last_order_at, order_count):
+        self.contact = contact
+        self.name = name
+        self.address = address
+        self.instructions = instructions
+        self.last_order_id = last_order_id
+        self.last_order_at = last_order_at
+        self.order_count = order_count
+
+
+_lock = threading.Lock()
+# contact key -> (Customer, cached_at), least recently used first
+_cache = OrderedDict()
+_backfilled = False
+
+
+# Details are taken from the latest order; an older one imported from the
+# sheet only adds to the count
+_LATEST = ', '.join(
+    f"{column} = CASE WHEN excluded.last_order_at >= last_order_at THEN excluded.{column} ELSE {column} END"
+    for column in ('name', 'address', 'instructions', 'last_order_id', 'last_order_at')
+)
+
+
+def record_customer(conn, order):
+    """Point the customer's entry at a newly stored order, using an open transaction"""
+    conn.execute(
+        "INSERT INTO customers (contact, name, address, instructions, last_order_id, "
+        "last_order_at, order_count) VALUES (?, ?, ?, ?, ?, ?, 1) "
+        f"ON CONFLICT (contact) DO UPDATE SET {_LATEST}, order_count = order_count + 1",
+        (contact_key(order.contact), order.name, order.address, order.instructions,
+         order.order_id, order.created_at)
+    )
+
+
+def forget(contact):
+    """Drop a cached entry after the customer's details changed"""
+    with _lock:
+        _cache.pop(contact_key(contact), None)
+
+
+def rebuild_customers():
+    """Recompute the customers table from stored orders (for backfills and repairs)"""
+    latest = {}
+    counts = {}
+    with transaction() as conn:
+        for row in conn.execute(
+                "SELECT order_id, created_at, name, contact, address, instructions "
+                "FROM orders ORDER BY created_at"):
+            key = contact_key(row['contact'])
+            latest[key] = row
+            counts[key] = counts.get(key, 0) + 1
+        conn.execute("DELETE FROM customers")
+        conn.executemany(
+            "INSERT INTO customers (contact, name, address, instructions, last_order_id, "
+            "last_order_at, order_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(key, row['name'], row['address'], row['instructions'], row['order_id'],
+              row['created_at'], counts[key]) for key, row in latest.items()]
+        )
+    with _lock:
+        _cache.clear()
+    log.info(f"Rebuilt the customer index: {len(latest)} customers")
+
+
+def verify_customer(contact, order_id):
+    """
+    Return the Customer for a contact number if order_id is the
+    confirmation ID of one of their orders, otherwise None.
+
+    Knowing a confirmation ID is what lets someone see a customer's saved
+    name and address; a contact number alone is not enough.
+    """
+    customer = lookup_customer(contact)
+    order_id = order_id.strip().upper()
+    if customer is None or not order_id:
+        return None
+    if order_id == customer.last_order_id:
+        return customer
+    row = connect().execute("SELECT contact FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+    return customer if row and contact_key(row['contact']) == customer.contact else None
+
+
+def _ensure_backfilled(conn):
+    """Index orders stored before the customers table existed, once per process"""
+    global _backfilled
+    if _backfilled:
+        return
+    _backfilled = True
+    if (conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone()
+            and not conn.execute("SELECT 1 FROM customers LIMIT 1").fetchone()):
+        rebuild_customers()
+
+
+def lookup_customer(contact):
+    """
+    Return the Customer for a contact number, or None if they haven't
+    ordered before.
+
+    Served from the in-memory LRU cache when possible, otherwise a primary
+    key lookup in the local database; never from the Google Sheet.
+    """
+    key = contact_key(contact)
+    if not key:
+        return None
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(key)
+        if cached and now - cached[1] <= CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            REGISTRY.inc('customer_cache_hits')
+            return cached[0]
+    REGISTRY.inc('customer_cache_misses')
+    conn = connect()
+    _ensure_backfilled(conn)
+    row = conn.execute("SELECT * FROM customers WHERE contact = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    customer = Customer(row['contact'], row['name'], row['address'], row['instructions'],
+                        row['last_order_id'], row['last_order_at'], row['order_count'])
+    with _lock:
+        _cache[key] = (customer, now)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return customer
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import threading
+
+
+# Local state (order outbox and friends) lives under this directory
+DATA_DIR = os.environ.get('TIFFIN_DATA_DIR', 'data')
+DB_PATH = os.environ.get('TIFFIN_DB_PATH', os.path.join(DATA_DIR, 'tiffin.sqlite3'))
+
+_schemas = []
+_columns = []
+_local = threading.local()
+
+
+def register_schema(ddl):
+    """Register CREATE ... IF NOT EXISTS statements to run on every connection"""
+    _schemas.append(ddl)
+
+
+def register_column(table, column, declaration):
+    """Register a column added after a table was first created; databases
+    created by an earlier version get it through ALTER TABLE"""
+    _columns.append((table, column, declaration))
+
+
+def _add_column(conn, table, column, declaration):
+    existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column in existing:
+        return
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    except sqlite3.OperationalError as e:
+        # Another process added it first
+        if 'duplicate column' not in str(e):
+            raise
+
+
+def connect():
+    """Return this thread's SQLite connection, creating the schema as needed.
+
+    Connections are per thread (sqlite3 objects can't be shared between
+    threads by default) and kept open for the life of the thread. WAL mode
+    lets the Streamlit sessions write while a background worker reads.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        directory = os.path.dirname(DB_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # FULL keeps every committed order on disk even if the host crashes
+        conn.execute("PRAGMA synchronous=FULL")
+        _local.conn = conn
+        _local.schema_count = 0
+        _local.column_count = 0
+    if _local.schema_count < len(_schemas):
+        for ddl in _schemas[_local.schema_count:]:
+            conn.executescript(ddl)
+        _local.schema_count = len(_schemas)
+    if _local.column_count < len(_columns):
+        for table, column, declaration in _columns[_local.column_count:]:
+            _add_column(conn, table, column, declaration)
+        _local.column_count = len(_columns)
+    return conn
+
+
+class transaction:
+    """Context manager for an explicit write transaction on this thread's
+    connection: ``with transaction() as conn: ...``"""
+
+    def __init__(self, immediate=True):
+        self.begin = "BEGIN IMMEDIATE" if immediate else "BEGIN"
+
+    def __enter__(self):
+        self.conn = connect()
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from db import connect, register_schema
+
+
+# A repeat of the same order within this window is treated as a double submit
+DEDUPE_WINDOW_SECONDS = 15 * 60
+# Most recent submissions kept in memory; older ones are looked up in SQLite
+MAX_RECENT = 10000
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS submissions (
+    fingerprint TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_fingerprint ON submissions (fingerprint, created_at);
+""")
+
+_lock = threading.Lock()
+# fingerprint -> (order_id, created_at), oldest first
+_recent = OrderedDict()
+_recent_order_ids = {}
+
+
+def order_fingerprint(contact, priced):
+    """
+    Hash of the contact number and every ordered quantity, identifying the
+    same order submitted twice regardless of its order ID.
+    """
+    digits = ''.join(ch for ch in contact if ch.isdigit())
+    lines = sorted(
+        f"{line['date_info']['full_date']}|{line['meal']}|{line['sku']}|{line['qty']}"
+        for line in priced.line_items()
+    )
+    return hashlib.sha256('\n'.join([digits] + lines).encode()).hexdigest()
+
+
+def _prune(now):
+    while _recent:
+        fingerprint, (order_id, created_at) = next(iter(_recent.items()))
+        if now - created_at <= DEDUPE_WINDOW_SECONDS and len(_recent) <= MAX_RECENT:
+            break
+        _recent.popitem(last=False)
+        _recent_order_ids.pop(order_id, None)
+
+
+def find_duplicate(order_id, fingerprint, conn=None):
+    """
+    Return the confirmation ID of an earlier submission of this order, or
+    None if it is new.
+
+    Checks the in-memory index first, then SQLite (which also covers
+    submissions made through other worker processes).
+    """
+    now = time.time()
+    with _lock:
+        _prune(now)
+        if order_id in _recent_order_ids:
+            return order_id
+        recent = _recent.get(fingerprint)
+        if recent and now - recent[1] <= DEDUPE_WINDOW_SECONDS:
+            return recent[0]
+    conn = conn or connect()
+    if conn.execute("SELECT 1 FROM orders WHERE order_id = ?", (order_id,)).fetchone():
+        return order_id
+    row = conn.execute(
+        "SELECT order_id FROM submissions WHERE fingerprint = ? AND created_at >= ? "
+        "ORDER BY created_at DESC LIMIT 1",
+        (fingerprint, now - DEDUPE_WINDOW_SECONDS)
+    ).fetchone()
+    return row['order_id'] if row else None
+
+
+def record_submission(conn, order_id, fingerprint):
+    """Persist a submission using an open transaction"""
+    conn.execute(
+        "INSERT INTO submissions (fingerprint, order_id, created_at) VALUES (?, ?, ?)",
+        (fingerprint, order_id, time.time())
+    )
+
+
+def remember(order_id, fingerprint):
+    """Add a committed submission to the in-memory index"""
+    with _lock:
+        _recent[fingerprint] = (order_id, time.time())
+        _recent.move_to_end(fingerprint)
+        _recent_order_ids[order_id] = fingerprint
@@ -0,0 +1,166 @@
+import csv
+import html
+import io
+import re
+
+from customers import contact_key
+from pricing import MEAL_LABELS, sku_label
+from storage import get_store
+
+
+# Stops one rider takes in a batch
+MAX_STOPS_PER_BATCH = 12
+
+# Common spellings folded together so the same street sorts together
+ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'ln': 'lane', 'nr': 'near', 'opp': 'opposite',
+    'apt': 'apartment', 'apts': 'apartments', 'soc': 'society', 'bldg': 'building',
+    'flr': 'floor', 'sec': 'sector', 'ngr': 'nagar', 'chs': 'society',
+}
+# Words that name the city or state rather than a locality
+CITY_WORDS = {'pune', 'pcmc', 'maharashtra', 'india', 'mh'}
+# Indian PIN code
+PINCODE = re.compile(r'\b([1-9]\d{2})\s?(\d{3})\b')
+UNZONED = 'Unzoned'
+
+
+def normalize_address(address):
+    """
+    Lowercase, punctuation-free form of an address with common
+    abbreviations expanded; equal keys mean the same delivery stop.
+    """
+    text = PINCODE.sub(r'\1\2', address.lower())
+    # Join initials, so "M.G. Road" and "MG Road" match
+    text = re.sub(r'\b([a-z])\.\s*(?=[a-z]\b)', r'\1', text)
+    words = re.findall(r'[a-z0-9]+', text)
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def address_zone(address):
+    """
+    Zone for an address: its PIN code if it has one, otherwise the last
+    comma-separated part that isn't the city.
+    """
+    match = PINCODE.search(address)
+    if match:
+        return match.group(1) + match.group(2)
+    for part in reversed(address.split(',')):
+        locality = normalize_address(part)
+        if locality and locality not in CITY_WORDS:
+            return ' '.join(word for word in locality.split() if word not in CITY_WORDS).title()
+    return UNZONED
+
+
+class Stop:
+    """One customer's delivery to one address, possibly covering several orders"""
+    __slots__ = ('address_key', 'name', 'contact', 'address', 'instructions', 'order_ids', 'items')
+
+    def __init__(self, address_key, order):
+        self.address_key = address_key
+        self.name = order.name
+        self.contact = order.contact
+        self.address = order.address
+        self.instructions = order.instructions
+        self.order_ids = []
+        # sku -> quantity
+        self.items = {}
+
+    def add(self, order):
+        self.order_ids.append(order.order_id)
+        if order.instructions and order.instructions not in self.instructions:
+            self.instructions = '; '.join(filter(None, (self.instructions, order.instructions)))
+        for line in order.lines:
+            self.items[line.sku] = self.items.get(line.sku, 0) + line.qty
+
+    def items_text(self):
+        return ', '.join(f"{sku_label(sku)} x{qty}" for sku, qty in self.items.items())
+
+
+class RoutePlan:
+    """A date and meal's deliveries grouped into zones and rider batches"""
+    __slots__ = ('date', 'meal', 'zones')
+
+    def __init__(self, date, meal, zones):
+        self.date = date
+        self.meal = meal
+        # zone -> list of batches, each a list of Stops, in route order
+        self.zones = zones
+
+    def batches(self):
+        """Yield (batch number, zone, stops) across all zones"""
+        number = 0
+        for zone, batches in self.zones.items():
+            for stops in batches:
+                number += 1
+                yield number, zone, stops
+
+
+def plan_routes(date, meal, max_stops=MAX_STOPS_PER_BATCH, store=None):
+    """
+    Group a date and meal's orders into zones and rider batches.
+
+    Reads the order store in a single pass; a customer's orders for the
+    same normalized address become one stop. Different customers at one
+    address stay separate stops, so each gets their own items. Zones are
+    sorted with the biggest first (unzoned addresses last), and stops
+    within a zone by address so the same street and building are next to
+    each other.
+    """
+    store = store or get_store()
+    zones = {}
+    for order in store.orders_for(date, meal):
+        key = normalize_address(order.address)
+        stops = zones.setdefault(address_zone(order.address), {})
+        customer = contact_key(order.contact) or order.contact
+        stop = stops.get((key, customer))
+        if stop is None:
+            stop = stops[(key, customer)] = Stop(key, order)
+        stop.add(order)
+
+    ordered = sorted(zones.items(), key=lambda item: (item[0] == UNZONED, -len(item[1]), item[0]))
+    plan = {}
+    for zone, stops in ordered:
+        route = [stops[key] for key in sorted(stops)]
+        plan[zone] = [route[i:i + max_stops] for i in range(0, len(route), max_stops)]
+    return RoutePlan(date, meal, plan)
+
+
+CSV_COLUMNS = ['batch', 'zone', 'stop', 'name', 'contact', 'address', 'items', 'instructions', 'order_ids']
+
+
+def route_csv(plan):
+    """The plan as CSV text, one row per stop in route order"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for number, zone, stops in plan.batches():
+        for position, stop in enumerate(stops, 1):
+            writer.writerow([number, zone, position, stop.name, stop.contact, stop.address,
+                             stop.items_text(), stop.instructions, ' '.join(stop.order_ids)])
+    return buffer.getvalue()
+
+
+def route_sheet_html(plan):
+    """Printable route sheets: one page per batch, with a tick column for the rider"""
+    title = f"{plan.date} {MEAL_LABELS[plan.meal]} deliveries"
+    pages = []
+    for number, zone, stops in plan.batches():
+        rows = ''.join(
+            f"<tr><td>{position}</td><td>{html.escape(stop.name)}<br>{html.escape(stop.contact)}</td>"
+            f"<td>{html.escape(stop.address)}</td><td>{html.escape(stop.items_text())}</td>"
+            f"<td>{html.escape(stop.instructions)}</td><td></td></tr>"
+            for position, stop in enumerate(stops, 1)
+        )
+        pages.append(
+            f"<section><h2>{html.escape(title)} - Batch {number} ({html.escape(zone)})</h2>"
+            "<table><tr><th>#</th><th>Customer</th><th>Address</th><th>Items</th>"
+            f"<th>Notes</th><th>Delivered</th></tr>{rows}</table></section>"
+        )
+    style = (
+        "body{font-family:sans-serif;font-size:12px}"
+        "table{border-collapse:collapse;width:100%}"
+        "td,th{border:1px solid #444;padding:4px;vertical-align:top;text-align:left}"
+        "section{page-break-after:always}"
+    )
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<style>{style}</style></head><body>{''.join(pages)}</body></html>")
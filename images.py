@@ -0,0 +1,88 @@
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+from db import DATA_DIR
+
+# Pillow is imported on first use; only pages that handle an upload need it
+
+
+SCREENSHOT_DIR = os.path.join(DATA_DIR, 'screenshots')
+
+# Longest side of a stored screenshot; plenty to read a UPI reference
+MAX_DIMENSION = 1600
+# Stored screenshots are re-encoded until they fit in this many bytes
+MAX_BYTES = 400 * 1024
+WEBP_QUALITIES = (80, 70, 60, 50)
+THUMBNAIL_SIZE = (360, 360)
+
+
+class ScreenshotError(ValueError):
+    """Raised when an upload can't be decoded as an image"""
+
+
+def _encode(image, max_bytes=MAX_BYTES):
+    """Encode as WebP, lowering quality and then size until it fits"""
+    from PIL import Image
+    while True:
+        for quality in WEBP_QUALITIES:
+            buffer = io.BytesIO()
+            # No exif= argument, so no metadata is carried over
+            image.save(buffer, format='WEBP', quality=quality, method=4)
+            if buffer.tell() <= max_bytes:
+                return buffer.getvalue()
+        if max(image.size) <= 320:
+            return buffer.getvalue()
+        image = image.resize((image.width * 3 // 4, image.height * 3 // 4), Image.LANCZOS)
+
+
+def process_screenshot(raw_bytes):
+    """
+    Decode an uploaded screenshot once and return a compact, metadata-free
+    WebP version bounded to MAX_DIMENSION and MAX_BYTES.
+    """
+    from PIL import Image, ImageOps
+    try:
+        image = Image.open(io.BytesIO(raw_bytes))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ScreenshotError(f"Could not read image: {e}") from e
+    # Apply the camera rotation before the EXIF block is dropped
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+    return _encode(image)
+
+
+def store_screenshot(raw_bytes):
+    """
+    Process an upload and store it under its content hash.
+
+    Returns:
+        str: Reference to the stored file (relative to DATA_DIR), suitable
+        for the order row
+    """
+    data = process_screenshot(raw_bytes)
+    name = hashlib.sha256(data).hexdigest() + '.webp'
+    path = os.path.join(SCREENSHOT_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return os.path.join('screenshots', name)
+
+
+@lru_cache(maxsize=128)
+def thumbnail(ref):
+    """Small JPEG preview of a stored screenshot, cached per process"""
+    from PIL import Image
+    with Image.open(os.path.join(DATA_DIR, ref)) as image:
+        image = image.convert('RGB')
+        image.thumbnail(THUMBNAIL_SIZE)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=75)
+    return buffer.getvalue()
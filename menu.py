@@ -0,0 +1,346 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from types import MappingProxyType
+
+from db import connect, register_schema, transaction
+from metrics import span
+
+
+log = logging.getLogger(__name__)
+
+
+MENU_FILE = "day-menu.yaml"
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+# Days customers can order for (see get_week_dates)
+ORDER_DAYS = WEEKDAYS[:6]
+TIFFIN_SIZES = ('full_tiffin', 'half_tiffin')
+
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS menu_versions (
+    version TEXT PRIMARY KEY,
+    first_served_at TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS menu_prices (
+    version TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (version, day, sku)
+);
+CREATE TABLE IF NOT EXISTS menu_publications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    version TEXT NOT NULL REFERENCES menu_versions (version),
+    published_at TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT ''
+);
+""")
+
+
+class MenuError(ValueError):
+    """Raised when the menu file can't be turned into a usable menu"""
+
+
+class Tiffin:
+    __slots__ = ('size', 'items', 'cost')
+
+    def __init__(self, size, items, cost):
+        self.size = size
+        self.items = tuple(items)
+        self.cost = cost
+
+
+class ExtraItem:
+    __slots__ = ('name', 'cost', 'days')
+
+    def __init__(self, name, cost, days=None):
+        self.name = name
+        self.cost = cost
+        # None means available every day
+        self.days = frozenset(days) if days else None
+
+    def available_on(self, day):
+        return self.days is None or day in self.days
+
+
+class DayMenu:
+    """Everything needed to render and price one weekday"""
+    __slots__ = ('day', 'tiffins', 'extras', 'prices')
+
+    def __init__(self, day, tiffins, extras, prices):
+        self.day = day
+        # size -> Tiffin, only for sizes served that day
+        self.tiffins = MappingProxyType(tiffins)
+        # ExtraItems available that day, in menu order
+        self.extras = tuple(extras)
+        # Unit price per SKU, aligned with CompiledMenu.skus (0 = not sold)
+        self.prices = tuple(prices)
+
+
+class CompiledMenu:
+    """
+    Read-only, indexed form of day-menu.yaml.
+
+    SKUs are the tiffin sizes followed by the extra items; every DayMenu
+    carries a price tuple in that order so pricing never walks the raw YAML.
+    """
+    __slots__ = ('days', 'extra_items', 'skus', 'sku_index', 'version', 'warnings')
+
+    def __init__(self, days, extra_items, version, warnings=()):
+        self.days = MappingProxyType(days)
+        self.extra_items = MappingProxyType(extra_items)
+        self.skus = TIFFIN_SIZES + tuple(extra_items)
+        self.sku_index = MappingProxyType({sku: i for i, sku in enumerate(self.skus)})
+        self.version = version
+        self.warnings = tuple(warnings)
+
+    def day(self, day):
+        """Return the DayMenu for a weekday name, or None if nothing is served"""
+        return self.days.get(day)
+
+
+def load_menu(filename=MENU_FILE):
+    """Parse the raw menu YAML"""
+    import yaml
+    with open(filename, 'r') as f:
+        return yaml.safe_load(f) or {}
+
+
+def _cost(value, where, errors):
+    # Prices are whole rupees: pricing multiplies them as integers
+    if (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0
+            or not float(value).is_integer()):
+        errors.append(f"{where}: cost must be a whole number of rupees, got {value!r}")
+        return 0
+    return int(value)
+
+
+def compile_menu(menu_raw, version=None):
+    """
+    Validate the raw menu dict and build a CompiledMenu.
+
+    Problems that make the menu unusable (bad costs, malformed entries)
+    raise MenuError; gaps such as a weekday with no menu are recorded in
+    CompiledMenu.warnings.
+
+    Args:
+        menu_raw (dict): Parsed day-menu.yaml
+        version (str): Identifier of this menu revision (e.g. content hash)
+
+    Returns:
+        CompiledMenu
+    """
+    if not isinstance(menu_raw, dict):
+        raise MenuError("Menu file must contain a mapping at the top level")
+    errors = []
+    warnings = []
+
+    extra_items = {}
+    for name, details in (menu_raw.get('extra_items') or {}).items():
+        if not isinstance(details, dict):
+            errors.append(f"extra_items.{name}: expected a mapping")
+            continue
+        days = details.get('days')
+        for day in days or ():
+            if day not in WEEKDAYS:
+                errors.append(f"extra_items.{name}: unknown day {day!r}")
+        extra_items[name] = ExtraItem(name, _cost(details.get('cost'), f"extra_items.{name}", errors), days)
+
+    skus = TIFFIN_SIZES + tuple(extra_items)
+    days = {}
+    for day in WEEKDAYS:
+        day_raw = menu_raw.get(day)
+        if not day_raw:
+            if day in ORDER_DAYS:
+                warnings.append(f"No menu for {day}; customers can't order tiffins that day")
+            continue
+        tiffins = {}
+        for size in TIFFIN_SIZES:
+            tiffin_raw = day_raw.get(size)
+            if tiffin_raw is None:
+                continue
+            if not isinstance(tiffin_raw, dict) or not tiffin_raw.get('items'):
+                errors.append(f"{day}.{size}: expected a mapping with 'items' and 'cost'")
+                continue
+            tiffins[size] = Tiffin(size, tiffin_raw['items'], _cost(tiffin_raw.get('cost'), f"{day}.{size}", errors))
+        extras = [extra for extra in extra_items.values() if extra.available_on(day)]
+        prices = [tiffins[size].cost if size in tiffins else 0 for size in TIFFIN_SIZES]
+        prices += [extra.cost if extra.available_on(day) else 0 for extra in extra_items.values()]
+        days[day] = DayMenu(day, tiffins, extras, prices)
+
+    unknown = [key for key in menu_raw if key not in WEEKDAYS and key not in ('defaults', 'extra_items')]
+    for key in unknown:
+        warnings.append(f"Ignoring unknown top-level key {key!r}")
+
+    if errors:
+        raise MenuError("Invalid menu: " + "; ".join(errors))
+    return CompiledMenu(days, extra_items, version, warnings)
+
+
+def menu_to_raw(menu):
+    """
+    The raw menu dict for a CompiledMenu, with every day spelled out (no
+    YAML anchors); compile_menu(menu_to_raw(menu)) gives the same menu.
+    """
+    raw = {'extra_items': {}}
+    for name, extra in menu.extra_items.items():
+        details = {'cost': extra.cost}
+        if extra.days is not None:
+            details['days'] = [day for day in WEEKDAYS if day in extra.days]
+        raw['extra_items'][name] = details
+    for day, day_menu in menu.days.items():
+        raw[day] = {size: {'items': list(tiffin.items), 'cost': tiffin.cost}
+                    for size, tiffin in day_menu.tiffins.items()}
+    return raw
+
+
+def menu_version(menu_raw):
+    """
+    Version identifier of a menu: a short hash of its canonical form, so
+    the same menu gets the same version whether it came from the YAML file
+    (with or without anchors) or was published from the admin page
+    """
+    canonical = json.dumps(menu_raw, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def menu_snapshot(menu_raw):
+    """
+    Compile a raw menu and take the snapshot recorded for its version.
+
+    Returns:
+        tuple: (CompiledMenu, snapshot JSON); the snapshot keeps the menu's
+            item order and the version is menu_version() of it
+    """
+    raw = menu_to_raw(compile_menu(menu_raw))
+    return compile_menu(raw, version=menu_version(raw)), json.dumps(raw)
+
+
+def record_version(conn, menu, content, note=''):
+    """
+    Keep a snapshot of a menu version and its per-day prices, using an open
+    transaction, so orders stamped with the version can be repriced later.
+    Recording a version that is already stored is a no-op.
+    """
+    created = conn.execute(
+        "INSERT OR IGNORE INTO menu_versions (version, first_served_at, note, content) "
+        "VALUES (?, ?, ?, ?)",
+        (menu.version, datetime.now().isoformat(timespec='seconds'), note, content)
+    ).rowcount
+    if created:
+        conn.executemany(
+            "INSERT INTO menu_prices (version, day, sku, price) VALUES (?, ?, ?, ?)",
+            [(menu.version, day, sku, price)
+             for day, day_menu in menu.days.items()
+             for sku, price in zip(menu.skus, day_menu.prices) if price]
+        )
+
+
+def published_version():
+    """Version most recently published from the admin page, or None"""
+    row = connect().execute("SELECT version FROM menu_publications ORDER BY id DESC LIMIT 1").fetchone()
+    return row['version'] if row else None
+
+
+# filename -> (stamp, file hash, CompiledMenu) for menu files, and
+# PUBLISHED -> CompiledMenu for the menu published from the admin page
+_cache = {}
+_cache_lock = threading.Lock()
+PUBLISHED = None
+
+
+def _swap(key, entry, previous_version, version):
+    """Replace a cached menu; sessions see either the old menu or the new one, never a mix"""
+    _cache[key] = entry
+    if previous_version and previous_version != version:
+        log.info(f"Menu swapped from version {previous_version} to {version}")
+
+
+def _get_published(version):
+    with _cache_lock:
+        cached = _cache.get(PUBLISHED)
+        if cached and cached.version == version:
+            return cached
+        row = connect().execute("SELECT content FROM menu_versions WHERE version = ?", (version,)).fetchone()
+        try:
+            with span('menu_compile'):
+                compiled = compile_menu(json.loads(row['content']), version=version)
+        except (MenuError, TypeError, ValueError) as e:
+            if cached is None:
+                raise MenuError(f"Published menu version {version} is unusable: {e}")
+            log.error(f"Error loading published menu {version}, keeping version {cached.version}: {e}")
+            return cached
+        _swap(PUBLISHED, compiled, cached and cached.version, version)
+        return compiled
+
+
+def _get_file_menu(filename):
+    stat = os.stat(filename)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(filename)
+        if cached and cached[0] == stamp:
+            return cached[2]
+        with open(filename, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if cached and cached[1] == digest:
+            _cache[filename] = (stamp, digest, cached[2])
+            return cached[2]
+        # Imported on first use, which the warm-up hook does in the background
+        import yaml
+        try:
+            with span('menu_compile'):
+                compiled, snapshot = menu_snapshot(yaml.safe_load(content) or {})
+        except (MenuError, yaml.YAMLError) as e:
+            if cached is None:
+                raise
+            log.error(f"Error reloading menu from '{filename}', keeping version {cached[2].version}: {e}")
+            _cache[filename] = (stamp, cached[1], cached[2])
+            return cached[2]
+        for warning in compiled.warnings:
+            log.warning(f"Menu warning ({filename}): {warning}")
+        try:
+            with transaction() as conn:
+                record_version(conn, compiled, snapshot, f"Loaded from {filename}")
+        except sqlite3.Error as e:
+            # Serving the menu matters more than its history
+            log.error(f"Couldn't record menu version {compiled.version}: {e}")
+        _swap(filename, (stamp, digest, compiled), cached and cached[2].version, compiled.version)
+        return compiled
+
+
+def get_menu(filename=MENU_FILE):
+    """
+    Return the live CompiledMenu, shared by all sessions.
+
+    A menu published from the admin page (see menu_versions.publish_menu)
+    takes precedence over day-menu.yaml; checking for one is a single
+    primary key lookup, so a publish reaches every session and worker on
+    their next rerun without a restart. A newly compiled menu replaces the
+    cached one in a single assignment.
+
+    Otherwise the file is only re-read when its mtime or size changes, and
+    only recompiled when its content hash changes. If an edited file fails
+    to compile the previous menu keeps being served. Every version served
+    is recorded with its prices (see record_version).
+    """
+    if filename == MENU_FILE:
+        try:
+            version = published_version()
+        except sqlite3.Error as e:
+            log.error(f"Couldn't check for a published menu: {e}")
+            with _cache_lock:
+                cached = _cache.get(PUBLISHED)
+            return cached or _get_file_menu(filename)
+        if version:
+            return _get_published(version)
+    return _get_file_menu(filename)
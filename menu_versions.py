@@ -0,0 +1,116 @@
+import json
+import logging
+from datetime import datetime
+
+import orders  # noqa: F401 (revenue reads orders and order_lines)
+from db import connect, transaction
+from menu import MenuError, get_menu, menu_snapshot, record_version
+
+
+log = logging.getLogger(__name__)
+
+
+def publish_menu(menu_raw, note=''):
+    """
+    Make an edited menu the live one, without a restart or redeploy.
+
+    The menu is validated first (MenuError leaves the live menu alone),
+    recorded as a version with its prices, then published; every session
+    in every worker picks it up through get_menu() on its next rerun.
+    Publishing a menu identical to an earlier one reuses that version,
+    and publishing the live menu again does nothing.
+
+    Args:
+        menu_raw (dict): Menu in the shape of day-menu.yaml
+        note (str): What changed, shown in the version history
+
+    Returns:
+        CompiledMenu: The published menu
+    """
+    compiled, content = menu_snapshot(menu_raw)
+    live = get_menu()
+    if compiled.version == live.version:
+        return live
+    with transaction() as conn:
+        record_version(conn, compiled, content, note)
+        _publish(conn, compiled.version, note)
+    log.info(f"Published menu version {compiled.version}: {note}")
+    return get_menu()
+
+
+def publish_version(version, note=''):
+    """Publish a recorded version again (a rollback); returns the live CompiledMenu"""
+    with transaction() as conn:
+        if not conn.execute("SELECT 1 FROM menu_versions WHERE version = ?", (version,)).fetchone():
+            raise MenuError(f"Unknown menu version {version!r}")
+        _publish(conn, version, note)
+    log.info(f"Republished menu version {version}: {note}")
+    return get_menu()
+
+
+def _publish(conn, version, note):
+    conn.execute("INSERT INTO menu_publications (version, published_at, note) VALUES (?, ?, ?)",
+                 (version, datetime.now().isoformat(timespec='seconds'), note))
+
+
+def list_publications():
+    """Every publish, newest first, as dicts with version, published_at and note"""
+    return [dict(row) for row in connect().execute(
+        "SELECT version, published_at, note FROM menu_publications ORDER BY id DESC")]
+
+
+def list_versions():
+    """Recorded menu versions as dicts, newest first"""
+    return [dict(row) for row in connect().execute(
+        "SELECT version, first_served_at, note FROM menu_versions ORDER BY first_served_at DESC, version")]
+
+
+def load_version(version):
+    """The raw menu dict of a recorded version, or None"""
+    row = connect().execute("SELECT content FROM menu_versions WHERE version = ?", (version,)).fetchone()
+    return json.loads(row['content']) if row else None
+
+
+def price_history():
+    """
+    Price of every SKU on every day across recorded versions, as a
+    DataFrame with columns version, first_served_at, day, sku, price.
+    """
+    import pandas as pd
+    rows = connect().execute(
+        "SELECT v.version, v.first_served_at, p.day, p.sku, p.price "
+        "FROM menu_prices p JOIN menu_versions v ON v.version = p.version "
+        "ORDER BY v.first_served_at, p.day, p.sku"
+    ).fetchall()
+    return pd.DataFrame([tuple(row) for row in rows],
+                        columns=['version', 'first_served_at', 'day', 'sku', 'price'])
+
+
+def revenue_by_version(start_date, end_date, at_version=None):
+    """
+    Revenue for delivery dates in [start_date, end_date], recomputed from
+    order lines and recorded menu prices.
+
+    Each line is priced with the menu version its order was stamped with,
+    or with at_version's prices if given (to see what another menu would
+    have earned). Lines the chosen menu has no price for keep the price
+    they were charged, and are counted in unpriced_lines.
+
+    Returns:
+        DataFrame: date, menu_version, orders, charged, recomputed, unpriced_lines
+    """
+    import pandas as pd
+    price_version = "?" if at_version else "o.menu_version"
+    params = ([at_version] if at_version else []) + [start_date, end_date]
+    rows = connect().execute(
+        "SELECT l.date, o.menu_version, COUNT(DISTINCT l.order_id) AS orders, "
+        "SUM(l.qty * l.unit_price) AS charged, "
+        "SUM(l.qty * COALESCE(p.price, l.unit_price)) AS recomputed, "
+        "SUM(p.price IS NULL) AS unpriced_lines "
+        "FROM order_lines l JOIN orders o ON o.order_id = l.order_id "
+        f"LEFT JOIN menu_prices p ON p.version = {price_version} AND p.day = l.day AND p.sku = l.sku "
+        "WHERE l.date BETWEEN ? AND ? GROUP BY l.date, o.menu_version ORDER BY l.date, o.menu_version",
+        params
+    ).fetchall()
+    return pd.DataFrame([tuple(row) for row in rows],
+                        columns=['date', 'menu_version', 'orders', 'charged', 'recomputed', 'unpriced_lines'])
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+log = logging.getLogger(__name__)
+
+# Percentiles are computed over this many most recent samples per span
+RESERVOIR_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+# Spans slower than this are logged at WARNING even when debug logging is off
+SLOW_SPAN_SECONDS = float(os.environ.get('TIFFIN_SLOW_SPAN_SECONDS', '2.0'))
+
+SPAN_METRIC = 'tiffin_span_seconds'
+
+
+class Histogram:
+    """Count, sum and a sliding window of samples for one span"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.samples.append(value)
+
+    def snapshot(self):
+        """Return count, sum and the QUANTILES over the recent samples"""
+        with self._lock:
+            samples = sorted(self.samples)
+            count, total = self.count, self.sum
+        result = {'count': count, 'sum': total}
+        for q in QUANTILES:
+            result[q] = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+        return result
+
+
+class MetricsRegistry:
+    """In-process store of span histograms and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """Span stats keyed by span name, and a copy of the counters"""
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        return {name: h.snapshot() for name, h in sorted(histograms.items())}, counters
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        spans, counters = self.snapshot()
+        lines = [
+            f"# HELP {SPAN_METRIC} Duration of instrumented code paths",
+            f"# TYPE {SPAN_METRIC} summary",
+        ]
+        for name, stats in spans.items():
+            for q in QUANTILES:
+                lines.append(f'{SPAN_METRIC}{{span="{name}",quantile="{q}"}} {stats[q]:.6f}')
+            lines.append(f'{SPAN_METRIC}_sum{{span="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'{SPAN_METRIC}_count{{span="{name}"}} {stats["count"]}')
+        for name, value in sorted(counters.items()):
+            metric = f"tiffin_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time a block and record it under name: ``with span('pricing'): ...``
+
+    Each span costs a couple of perf_counter calls and a lock; the JSON log
+    line is only built when debug logging is on or the span was slow.
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        REGISTRY.histogram(name).observe(elapsed)
+        if error:
+            REGISTRY.inc(f"{name}_errors")
+        slow = elapsed >= SLOW_SPAN_SECONDS
+        if slow or log.isEnabledFor(logging.DEBUG):
+            record = dict(fields, span=name, seconds=round(elapsed, 6))
+            if error:
+                record['error'] = error
+            log.log(logging.WARNING if slow else logging.DEBUG, json.dumps(record))
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_metrics_exporter(port=None):
+    """
+    Serve /metrics for Prometheus on port (or TIFFIN_METRICS_PORT) in a
+    daemon thread. Does nothing if no port is configured.
+    """
+    global _exporter
+    port = port or os.environ.get('TIFFIN_METRICS_PORT')
+    if not port:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            try:
+                _exporter = ThreadingHTTPServer(('', int(port)), _MetricsHandler)
+            except OSError as e:
+                log.error(f"Could not start metrics exporter on port {port}: {e}")
+                return None
+            threading.Thread(target=_exporter.serve_forever, name="metrics-exporter", daemon=True).start()
+        return _exporter
@@ -0,0 +1,54 @@
+import streamlit as st
+
+from menu import TIFFIN_SIZES, get_menu
+from pricing import price_order
+
+
+class OrderState:
+    """
+    The session's in-progress order, shared by the per-meal fragments.
+
+    Each meal panel writes its own quantities here when it reruns, and
+    main() prices the order from here, so no part of the page has to
+    re-render another panel to learn its quantities.
+    """
+
+    def __init__(self):
+        # full_date -> meal -> sku -> quantity
+        self.quantities = {}
+        # date_info dicts currently selected, in display order
+        self.selected_days = []
+
+    def set_meal(self, full_date, meal, counts):
+        self.quantities.setdefault(full_date, {})[meal] = dict(counts)
+
+    def per_date_tiffin(self):
+        """Quantities for the selected dates only"""
+        selected = {d['full_date'] for d in self.selected_days}
+        return {full_date: meals for full_date, meals in self.quantities.items() if full_date in selected}
+
+    def select_days(self, selected_days):
+        self.selected_days = list(selected_days)
+        # Forget dates the customer removed so they can't leak into the total
+        selected = {d['full_date'] for d in self.selected_days}
+        for full_date in list(self.quantities):
+            if full_date not in selected:
+                del self.quantities[full_date]
+
+    def price(self, menu=None):
+        return price_order(menu or get_menu(), self.selected_days, self.per_date_tiffin())
+
+
+def quantity_key(meal, sku, full_date):
+    """Session state key of the number input for one SKU, date and meal"""
+    if sku in TIFFIN_SIZES:
+        # full_tiffin -> lunch_full_tiffins_2025-06-16
+        return f"{meal}_{sku}s_{full_date}"
+    return f"{meal}_extra_{sku}_{full_date}"
+
+
+def get_order_state():
+    """Return this session's OrderState"""
+    if 'order_state' not in st.session_state:
+        st.session_state['order_state'] = OrderState()
+    return st.session_state['order_state']
@@ -0,0 +1,305 @@
+from datetime import datetime
+
+from capacity import CapacityError, book, reserve
+from customers import forget, record_customer
+from dedupe import find_duplicate, record_submission, remember
+from db import connect, register_column, register_schema, transaction
+from metrics import REGISTRY, span
+from outbox import enqueue_order, new_order_id, queue_rows
+from production import add_order_counts
+from reports import add_sales
+
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    name TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    address TEXT NOT NULL,
+    instructions TEXT NOT NULL DEFAULT '',
+    total_price INTEGER NOT NULL,
+    payment_screenshot TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_contact ON orders (contact);
+
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id TEXT NOT NULL REFERENCES orders (order_id),
+    date TEXT NOT NULL,
+    day TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    unit_price INTEGER NOT NULL,
+    PRIMARY KEY (order_id, date, meal, sku)
+);
+CREATE INDEX IF NOT EXISTS idx_order_lines_date ON order_lines (date, meal);
+CREATE INDEX IF NOT EXISTS idx_order_lines_sku ON order_lines (sku, date);
+""")
+# Menu version (content hash, see menu.record_version) the order was priced
+# with; empty for orders stored before versions were recorded
+register_column('orders', 'menu_version', "TEXT NOT NULL DEFAULT ''")
+
+
+class OrderLine:
+    """Quantity of one SKU for one date and meal"""
+    __slots__ = ('date', 'day', 'meal', 'sku', 'qty', 'unit_price')
+
+    def __init__(self, date, day, meal, sku, qty, unit_price):
+        self.date = date
+        self.day = day
+        self.meal = meal
+        self.sku = sku
+        self.qty = qty
+        self.unit_price = unit_price
+
+    @property
+    def total(self):
+        return self.qty * self.unit_price
+
+
+class Order:
+    """
+    An order header plus its lines.
+
+    tiffin_details is the human-readable summary kept for the sheet export;
+    it is not stored locally since it can be rebuilt from the lines.
+    menu_version identifies the menu whose prices the lines carry.
+    """
+    __slots__ = ('order_id', 'created_at', 'name', 'contact', 'address', 'instructions',
+                 'total_price', 'payment_screenshot', 'lines', 'tiffin_details', 'menu_version')
+
+    def __init__(self, order_id, created_at, name, contact, address, instructions,
+                 total_price, payment_screenshot, lines, tiffin_details='', menu_version=''):
+        self.order_id = order_id
+        self.created_at = created_at
+        self.name = name
+        self.contact = contact
+        self.address = address
+        self.instructions = instructions
+        self.total_price = total_price
+        self.payment_screenshot = payment_screenshot
+        self.lines = list(lines)
+        self.tiffin_details = tiffin_details
+        self.menu_version = menu_version
+
+    @classmethod
+    def from_priced(cls, priced, name, contact, address, instructions='',
+                    payment_screenshot='', order_id=None, created_at=None):
+        """Build an order from a PricedOrder and the customer's details"""
+        lines = [
+            OrderLine(line['date_info']['full_date'], line['date_info']['day'], line['meal'],
+                      line['sku'], line['qty'], line['unit_price'])
+            for line in priced.line_items()
+        ]
+        return cls(
+            order_id or new_order_id(),
+            created_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            name, contact, address, instructions or '',
+            priced.total, payment_screenshot or '', lines,
+            '; '.join(priced.tiffin_details()), priced.menu.version or ''
+        )
+
+    def weekly_template(self):
+        """
+        The order as weekday -> meal -> sku -> quantity. If it covers a
+        weekday more than once, the latest of those dates wins.
+        """
+        by_date = {}
+        for line in self.lines:
+            by_date.setdefault((line.date, line.day), {}).setdefault(line.meal, {})[line.sku] = line.qty
+        return {day: meals for (_, day), meals in sorted(by_date.items())}
+
+    def sheet_row(self):
+        """Denormalized row for the Google Sheet export"""
+        return {
+            'Timestamp': self.created_at,
+            'Name': self.name,
+            'Contact Number': self.contact,
+            'Address': self.address,
+            'Tiffin Details': self.tiffin_details,
+            'Special Instructions': self.instructions,
+            'Total Price': self.total_price,
+            'Payment Screenshot': self.payment_screenshot
+        }
+
+
+def save_order(conn, order):
+    """
+    Insert an order and its lines using an open transaction.
+
+    Returns:
+        bool: False if the order ID was already stored (nothing is written)
+    """
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO orders (order_id, created_at, name, contact, address, "
+        "instructions, total_price, payment_screenshot, menu_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (order.order_id, order.created_at, order.name, order.contact, order.address,
+         order.instructions, order.total_price, order.payment_screenshot, order.menu_version)
+    )
+    if cursor.rowcount == 0:
+        return False
+    conn.executemany(
+        "INSERT INTO order_lines (order_id, date, day, meal, sku, qty, unit_price) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(order.order_id, line.date, line.day, line.meal, line.sku, line.qty, line.unit_price)
+         for line in order.lines]
+    )
+    return True
+
+
+def submit_order(order, fingerprint=None, mirror=True):
+    """
+    Store an order locally and queue its sheet row, atomically.
+
+    If the same order ID, or an order with the same fingerprint, was
+    submitted within the dedupe window, nothing is written and the earlier
+    confirmation ID is returned.
+
+    Args:
+        order (Order): The order to store
+        fingerprint (str): order_fingerprint() of the order, if deduplicating
+        mirror (bool): Also queue the order for the Google Sheet
+
+    Returns:
+        tuple: (confirmation ID, True if this call created the order)
+
+    Raises:
+        CapacityError: A date and meal in the order is fully booked;
+            nothing is stored
+    """
+    if fingerprint:
+        # Cheap check outside the write lock; repeated clicks stop here
+        duplicate = find_duplicate(order.order_id, fingerprint)
+        if duplicate:
+            REGISTRY.inc('orders_deduplicated')
+            return duplicate, False
+    with span('order_store'), transaction() as conn:
+        if fingerprint:
+            # Check again under the write lock in case another worker won the race
+            duplicate = find_duplicate(order.order_id, fingerprint, conn)
+            if duplicate:
+                REGISTRY.inc('orders_deduplicated')
+                return duplicate, False
+            record_submission(conn, order.order_id, fingerprint)
+        if not save_order(conn, order):
+            return order.order_id, False
+        reserve(conn, order)
+        add_order_counts(conn, order)
+        add_sales(conn, order)
+        record_customer(conn, order)
+        if mirror:
+            enqueue_order(order.sheet_row(), order.order_id)
+        REGISTRY.inc('orders_submitted')
+    if fingerprint:
+        remember(order.order_id, fingerprint)
+    forget(order.contact)
+    return order.order_id, True
+
+
+def store_orders(orders, mirror=True):
+    """
+    Store a batch of orders and queue their sheet rows (if mirror) in one
+    transaction.
+
+    Each order is written under its own savepoint: one that is already
+    stored, or that no longer fits a slot's capacity, is skipped without
+    affecting the rest.
+
+    Returns:
+        tuple: (IDs of orders created, {order ID: CapacityError} for orders skipped as full)
+    """
+    created, rejected = [], {}
+    with span('order_store_batch'), transaction() as conn:
+        for order in orders:
+            conn.execute("SAVEPOINT store_order")
+            try:
+                if save_order(conn, order):
+                    reserve(conn, order)
+                    add_order_counts(conn, order)
+                    add_sales(conn, order)
+                    record_customer(conn, order)
+                    created.append(order)
+            except CapacityError as e:
+                conn.execute("ROLLBACK TO store_order")
+                rejected[order.order_id] = e
+            conn.execute("RELEASE store_order")
+        if mirror:
+            queue_rows(conn, {order.order_id: order.sheet_row() for order in created})
+        REGISTRY.inc('orders_submitted', len(created))
+    for order in created:
+        forget(order.contact)
+    return [order.order_id for order in created], rejected
+
+
+def load_order(order_id):
+    """Return a stored Order with its lines, or None"""
+    conn = connect()
+    row = conn.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+    if row is None:
+        return None
+    lines = [
+        OrderLine(line['date'], line['day'], line['meal'], line['sku'], line['qty'], line['unit_price'])
+        for line in conn.execute(
+            "SELECT date, day, meal, sku, qty, unit_price FROM order_lines "
+            "WHERE order_id = ? ORDER BY date, meal", (order_id,)
+        )
+    ]
+    return Order(row['order_id'], row['created_at'], row['name'], row['contact'], row['address'],
+                 row['instructions'], row['total_price'], row['payment_screenshot'], lines,
+                 menu_version=row['menu_version'])
+
+
+def iter_orders_for(date, meal):
+    """
+    Yield the orders to deliver for a date and meal, each with only that
+    date and meal's lines.
+
+    Rows are read straight off one cursor (idx_order_lines_date) and
+    grouped as they arrive, so memory doesn't grow with the day's volume.
+    """
+    cursor = connect().execute(
+        "SELECT o.order_id, o.created_at, o.name, o.contact, o.address, o.instructions, "
+        "o.total_price, o.payment_screenshot, o.menu_version, l.date, l.day, l.meal, l.sku, l.qty, l.unit_price "
+        "FROM order_lines l JOIN orders o ON o.order_id = l.order_id "
+        "WHERE l.date = ? AND l.meal = ? ORDER BY l.order_id",
+        (date, meal)
+    )
+    order = None
+    for row in cursor:
+        if order is None or row['order_id'] != order.order_id:
+            if order is not None:
+                yield order
+            order = Order(row['order_id'], row['created_at'], row['name'], row['contact'],
+                          row['address'], row['instructions'], row['total_price'],
+                          row['payment_screenshot'], [], menu_version=row['menu_version'])
+        order.lines.append(OrderLine(row['date'], row['day'], row['meal'], row['sku'],
+                                     row['qty'], row['unit_price']))
+    if order is not None:
+        yield order
+
+
+def import_orders(orders):
+    """
+    Store orders read back from the sheet, skipping IDs already stored.
+
+    Unlike submit_order() nothing is queued for the sheet, since the rows
+    are already there.
+
+    Returns:
+        int: Number of orders stored
+    """
+    stored = []
+    with transaction() as conn:
+        for order in orders:
+            if save_order(conn, order):
+                # Already taken, so booked even past a slot's capacity
+                book(conn, order)
+                add_order_counts(conn, order)
+                add_sales(conn, order)
+                record_customer(conn, order)
+                stored.append(order)
+    for order in stored:
+        forget(order.contact)
+    return len(stored)
@@ -0,0 +1,240 @@
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+from datetime import datetime
+
+from config import SHEET_NAME, SPREADSHEET_NAME
+from db import connect, register_schema, transaction
+from metrics import REGISTRY, span
+from sheets import get_worksheet
+
+
+log = logging.getLogger(__name__)
+
+
+# Sheet column holding the order ID, used to skip rows that already landed
+ORDER_ID_HEADER = 'Order ID'
+
+BATCH_SIZE = 50
+POLL_INTERVAL_SECONDS = 5
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS outbox (
+    order_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+""")
+
+
+def new_order_id():
+    """Return a short, human-friendly confirmation ID like HFB-250612-3FA9C1"""
+    return f"HFB-{datetime.now():%y%m%d}-{secrets.token_hex(3).upper()}"
+
+
+def enqueue_order(data_dict, order_id=None):
+    """
+    Durably queue an order row for the sheet and return its confirmation ID.
+
+    This is a single local SQLite write; the background OutboxWorker appends
+    the row to the sheet later. Enqueuing the same order ID twice is a no-op.
+
+    Args:
+        data_dict (dict): Sheet row keyed by column header
+        order_id (str): Order ID to use; a new one is generated if omitted
+
+    Returns:
+        str: The order ID
+    """
+    order_id = order_id or new_order_id()
+    payload = dict(data_dict, **{ORDER_ID_HEADER: order_id})
+    connect().execute(
+        "INSERT OR IGNORE INTO outbox (order_id, created_at, payload) VALUES (?, ?, ?)",
+        (order_id, datetime.now().isoformat(timespec='seconds'), json.dumps(payload))
+    )
+    worker = _worker
+    if worker is not None:
+        worker.wake.set()
+    return order_id
+
+
+def queue_rows(conn, data_dicts_by_id):
+    """Queue several orders using an open transaction.
+
+    Args:
+        data_dicts_by_id (dict): order_id -> sheet row
+    """
+    created_at = datetime.now().isoformat(timespec='seconds')
+    conn.executemany(
+        "INSERT OR IGNORE INTO outbox (order_id, created_at, payload) VALUES (?, ?, ?)",
+        [(order_id, created_at, json.dumps(dict(data, **{ORDER_ID_HEADER: order_id})))
+         for order_id, data in data_dicts_by_id.items()]
+    )
+    worker = _worker
+    if worker is not None:
+        worker.wake.set()
+
+
+def pending_count():
+    """Number of orders not yet written to the sheet"""
+    return connect().execute(
+        "SELECT COUNT(*) FROM outbox WHERE status != 'sent'"
+    ).fetchone()[0]
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with full jitter, capped at BACKOFF_MAX_SECONDS"""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempts))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def recover_in_flight():
+    """Return batches left 'sending' by a crashed worker to the queue.
+
+    They may or may not have reached the sheet, so attempts is bumped to make
+    the next drain check the sheet for their order IDs before appending.
+    """
+    connect().execute(
+        "UPDATE outbox SET status = 'pending', attempts = attempts + 1 WHERE status = 'sending'"
+    )
+
+
+def _release(rows, now, error, attempted=True):
+    """Return a claimed batch to the queue, due again after a backoff"""
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE outbox SET status = 'pending', attempts = attempts + ?, "
+            "next_attempt_at = ?, last_error = ? WHERE order_id = ?",
+            [(1 if attempted else 0, now + backoff_delay(row['attempts']), error, row['order_id'])
+             for row in rows]
+        )
+
+
+def drain_once(spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME, batch_size=BATCH_SIZE):
+    """
+    Append one batch of due orders to the sheet.
+
+    Returns:
+        int: Number of orders written (0 if nothing was due or the write failed)
+    """
+    now = time.time()
+    with transaction() as conn:
+        rows = conn.execute(
+            "SELECT order_id, payload, attempts FROM outbox "
+            "WHERE status = 'pending' AND next_attempt_at <= ? "
+            "ORDER BY created_at LIMIT ?",
+            (now, batch_size)
+        ).fetchall()
+        if not rows:
+            return 0
+        conn.executemany(
+            "UPDATE outbox SET status = 'sending' WHERE order_id = ?",
+            [(row['order_id'],) for row in rows]
+        )
+
+    order_ids = [row['order_id'] for row in rows]
+    payloads = [json.loads(row['payload']) for row in rows]
+    retrying = any(row['attempts'] > 0 for row in rows)
+    try:
+        worksheet = get_worksheet(spreadsheet_name, sheet_name)
+        if not retrying:
+            # Columns go in before a batch's first append, so a retry can
+            # always look for its order IDs
+            worksheet.add_headers(list(dict.fromkeys(key for payload in payloads for key in payload)))
+    except Exception as e:
+        # Nothing was appended, so the next try needn't look for these rows
+        log.error(f"Error preparing the sheet for {len(rows)} queued orders: {e}")
+        REGISTRY.inc('outbox_failed_batches')
+        _release(rows, now, str(e), attempted=False)
+        return 0
+
+    try:
+        to_send = payloads
+        if retrying:
+            # A previous attempt may have landed before failing; don't append twice
+            existing = worksheet.column_values(ORDER_ID_HEADER)
+            if existing is None:
+                # Removed since the last attempt: its rows can't be told
+                # apart, so wait for the column rather than append again
+                log.warning(f"'{sheet_name}' has no '{ORDER_ID_HEADER}' column; holding {len(rows)} "
+                            f"queued orders that may already be in the sheet until it is added back")
+                REGISTRY.inc('outbox_held_batches')
+                _release(rows, now, f"No '{ORDER_ID_HEADER}' column to check for rows already written")
+                return 0
+            existing = set(existing)
+            to_send = [payload for payload in payloads if payload[ORDER_ID_HEADER] not in existing]
+        if to_send:
+            worksheet.append_rows(to_send)
+    except Exception as e:
+        log.error(f"Error writing {len(rows)} queued orders to Google Sheets: {e}")
+        REGISTRY.inc('outbox_failed_batches')
+        _release(rows, now, str(e))
+        return 0
+
+    sent_at = datetime.now().isoformat(timespec='seconds')
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE order_id = ?",
+            [(sent_at, order_id) for order_id in order_ids]
+        )
+    log.info(f"Successfully appended {len(order_ids)} queued orders to '{spreadsheet_name}' - '{sheet_name}'")
+    REGISTRY.inc('outbox_sent_orders', len(order_ids))
+    return len(order_ids)
+
+
+class OutboxWorker(threading.Thread):
+    """Background thread that drains the outbox into the sheet in batches"""
+
+    def __init__(self, spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME,
+                 batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL_SECONDS):
+        super().__init__(name="order-outbox-worker", daemon=True)
+        self.spreadsheet_name = spreadsheet_name
+        self.sheet_name = sheet_name
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        recover_in_flight()
+        while not self.stopped.is_set():
+            self.wake.clear()
+            try:
+                # Keep going while full batches are coming back
+                while True:
+                    with span('outbox_drain'):
+                        sent = drain_once(self.spreadsheet_name, self.sheet_name, self.batch_size)
+                    if sent < self.batch_size:
+                        break
+            except Exception as e:
+                log.exception(f"Error draining order outbox: {e}")
+            self.wake.wait(self.poll_interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_outbox_worker():
+    """Start the process-wide OutboxWorker if it isn't running yet"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = OutboxWorker()
+            _worker.start()
+        return _worker
@@ -0,0 +1,56 @@
+import pandas as pd
+import streamlit as st
+
+from admission import limiter_stats
+from metrics import QUANTILES, REGISTRY
+from sheet_sync import sync_status
+from staff import require_staff
+
+
+def main():
+    st.markdown("### 📈 Performance Metrics")
+    st.caption("Timings since this worker process started, over the most recent samples per span.")
+
+    if st.button('🔄 Refresh'):
+        st.rerun()
+
+    spans, counters = REGISTRY.snapshot()
+    if spans:
+        rows = []
+        for name, stats in spans.items():
+            row = {'span': name, 'count': stats['count']}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)} (ms)"] = round(stats[q] * 1000, 2)
+            row['mean (ms)'] = round(stats['sum'] / stats['count'] * 1000, 2) if stats['count'] else 0.0
+            rows.append(row)
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    else:
+        st.info("No spans recorded yet.")
+
+    if counters:
+        st.markdown("**Counters**")
+        st.dataframe(pd.DataFrame(sorted(counters.items()), columns=['counter', 'value']),
+                     hide_index=True, use_container_width=True)
+
+    tracked = limiter_stats()
+    st.caption(f"Rate limiter is tracking {tracked['contact']} contact numbers and "
+               f"{tracked['session']} sessions; rejections are counted under admission_*.")
+
+    sync = sync_status()
+    st.markdown("**Sheet import**")
+    if sync['lag_seconds'] is None:
+        st.info("The order sheet hasn't been imported yet.")
+    else:
+        stats = sync['stats']
+        st.caption(f"Last {stats.get('mode', '')} sync {sync['lag_seconds']:.0f}s ago: "
+                   f"{stats.get('rows_fetched', 0)} rows read, {stats.get('imported', 0)} orders imported, "
+                   f"{stats.get('api_calls', 0)} API calls in {stats.get('seconds', 0):.2f}s")
+
+    text = REGISTRY.prometheus_text()
+    st.download_button('Download Prometheus metrics', text, file_name='metrics.txt', mime='text/plain')
+    with st.expander("Prometheus text"):
+        st.code(text, language='text')
+
+
+require_staff()
+main()
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from capacity import DEFAULT_MEAL_CAPACITY, capacity_table, set_capacity
+from pricing import MEAL_LABELS, MEALS
+from deliveries import MAX_STOPS_PER_BATCH, plan_routes, route_csv, route_sheet_html
+from production import production_summary
+from staff import require_staff
+
+
+# Many staff may keep this page open; cached results are shared between them
+CACHE_TTL_SECONDS = 30
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_production_summary(start_date, end_date):
+    return production_summary(start_date, end_date)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_route_exports(date, meal):
+    """(stops table, CSV, printable HTML) for one date and meal"""
+    plan = plan_routes(date, meal)
+    stops = [
+        {'batch': number, 'zone': zone, 'stop': position, 'name': stop.name,
+         'contact': stop.contact, 'address': stop.address, 'items': stop.items_text(),
+         'instructions': stop.instructions}
+        for number, zone, stops in plan.batches() for position, stop in enumerate(stops, 1)
+    ]
+    return stops, route_csv(plan), route_sheet_html(plan)
+
+
+def render_capacity(start, end):
+    """Booked tiffins per slot and a form to cap a slot"""
+    st.markdown("### 🪑 Capacity")
+    st.caption(f"Each meal takes up to {DEFAULT_MEAL_CAPACITY} tiffins unless capped here.")
+    with st.form('capacity_form'):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            date = st.date_input('Date', value=start)
+        with col2:
+            meal = st.selectbox('Meal', MEALS, format_func=MEAL_LABELS.get)
+        with col3:
+            limit = st.number_input('Tiffins', min_value=0, value=DEFAULT_MEAL_CAPACITY, step=10)
+        if st.form_submit_button('Set capacity'):
+            set_capacity(date.isoformat(), meal, int(limit))
+            st.success(f"{MEAL_LABELS[meal]} on {date:%d %b} capped at {int(limit)} tiffins.")
+
+    # Not cached: the numbers customers see must match what staff see
+    table = capacity_table(start.isoformat(), end.isoformat())
+    if not table.empty:
+        table['meal'] = table['meal'].map(MEAL_LABELS)
+        st.dataframe(table, hide_index=True, use_container_width=True)
+
+
+def main():
+    st.markdown("### 🍳 Kitchen Production")
+    st.caption(f"Counts refresh every {CACHE_TTL_SECONDS} seconds.")
+
+    today = datetime.now().date()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        dates = st.date_input(
+            'Delivery dates',
+            value=(today, today + timedelta(days=6)),
+        )
+    with col2:
+        if st.button('🔄 Refresh now'):
+            cached_production_summary.clear()
+            cached_route_exports.clear()
+
+    # The range picker returns a single date while the end is being chosen
+    start, end = (dates[0], dates[-1]) if dates else (today, today)
+
+    summary = cached_production_summary(start.isoformat(), end.isoformat())
+    render_capacity(start, end)
+    if summary.empty:
+        st.info("No orders for these dates yet.")
+        return
+
+    display = summary.copy()
+    display['meal'] = display['meal'].map(MEAL_LABELS)
+    st.dataframe(display, hide_index=True, use_container_width=True)
+
+    st.markdown("### 🚚 Deliveries")
+    st.caption(f"Grouped into zones by PIN code or locality, in batches of up to {MAX_STOPS_PER_BATCH} stops.")
+    for date in summary['date'].unique():
+        day = datetime.strptime(date, '%Y-%m-%d')
+        for meal in MEALS:
+            if not ((summary['date'] == date) & (summary['meal'] == meal)).any():
+                continue
+            with st.expander(f"📅 {day:%d %b} ({day:%A}) - {MEAL_LABELS[meal]}"):
+                stops, csv_text, sheet_html = cached_route_exports(date, meal)
+                name = f"routes-{date}-{meal}"
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button('⬇️ CSV', csv_text, file_name=f"{name}.csv",
+                                       mime='text/csv', key=f"{name}-csv")
+                with col2:
+                    st.download_button('🖨️ Printable route sheets', sheet_html,
+                                       file_name=f"{name}.html", mime='text/html', key=f"{name}-html")
+                st.dataframe(stops, hide_index=True, use_container_width=True)
+
+
+require_staff()
+main()
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from menu import TIFFIN_SIZES, WEEKDAYS, MenuError, get_menu, menu_to_raw
+from menu_versions import (list_publications, list_versions, load_version, price_history,
+                           publish_menu, publish_version, revenue_by_version)
+from pricing import TIFFIN_LABELS, sku_label
+from staff import require_staff
+
+
+# Separates a tiffin's items, and an extra's days, in the editor cells
+ITEM_SEPARATOR = '; '
+DAY_SEPARATOR = ', '
+
+
+def tiffin_rows(menu_raw):
+    return pd.DataFrame(
+        [{'day': day, 'size': size, 'items': ITEM_SEPARATOR.join(tiffin['items']), 'cost': tiffin['cost']}
+         for day in WEEKDAYS for size, tiffin in (menu_raw.get(day) or {}).items()],
+        columns=['day', 'size', 'items', 'cost']
+    )
+
+
+def extra_rows(menu_raw):
+    return pd.DataFrame(
+        [{'item': name, 'cost': details['cost'], 'days': DAY_SEPARATOR.join(details.get('days') or ())}
+         for name, details in (menu_raw.get('extra_items') or {}).items()],
+        columns=['item', 'cost', 'days']
+    )
+
+
+def menu_from_rows(tiffins, extras):
+    """The raw menu dict for the edited tables; blank rows are skipped"""
+    menu_raw = {'extra_items': {}}
+    for row in extras.to_dict('records'):
+        name = (row['item'] or '').strip()
+        if not name:
+            continue
+        details = {'cost': row['cost']}
+        days = [day.strip().title() for day in (row['days'] or '').split(',') if day.strip()]
+        if days:
+            details['days'] = days
+        menu_raw['extra_items'][name] = details
+    for row in tiffins.to_dict('records'):
+        items = [item.strip() for item in (row['items'] or '').split(ITEM_SEPARATOR.strip()) if item.strip()]
+        if not row['day'] or not row['size']:
+            continue
+        menu_raw.setdefault(row['day'], {})[row['size']] = {'items': items, 'cost': row['cost']}
+    return menu_raw
+
+
+def render_editor(menu):
+    st.markdown("### ✏️ Edit Menu")
+    st.caption(f"Live version **{menu.version}**. Separate a tiffin's items with '{ITEM_SEPARATOR.strip()}'; "
+               "leave an extra's days blank to sell it every day. Publishing takes effect for every "
+               "customer on their next click, with no restart.")
+    menu_raw = menu_to_raw(menu)
+    with st.form('menu_form'):
+        tiffins = st.data_editor(
+            tiffin_rows(menu_raw), num_rows='dynamic', hide_index=True, use_container_width=True,
+            column_config={
+                'day': st.column_config.SelectboxColumn('Day', options=WEEKDAYS, required=True),
+                'size': st.column_config.SelectboxColumn('Size', options=TIFFIN_SIZES, required=True,
+                                                         format_func=TIFFIN_LABELS.get),
+                'items': st.column_config.TextColumn('Items', width='large'),
+                'cost': st.column_config.NumberColumn('Cost (₹)', min_value=0, step=1, format='%d',
+                                                      required=True),
+            },
+            key='menu_tiffins',
+        )
+        extras = st.data_editor(
+            extra_rows(menu_raw), num_rows='dynamic', hide_index=True, use_container_width=True,
+            column_config={
+                'item': st.column_config.TextColumn('Extra item', required=True),
+                'cost': st.column_config.NumberColumn('Cost (₹)', min_value=0, step=1, format='%d',
+                                                      required=True),
+                'days': st.column_config.TextColumn('Days'),
+            },
+            key='menu_extras',
+        )
+        note = st.text_input('What changed?', key='menu_note')
+        if st.form_submit_button('Publish menu'):
+            try:
+                published = publish_menu(menu_from_rows(tiffins, extras), note.strip())
+            except MenuError as e:
+                st.error(str(e))
+            else:
+                if published.version == menu.version:
+                    st.info("Nothing changed; the live menu is unchanged.")
+                else:
+                    st.success(f"Published version {published.version}.")
+                for warning in published.warnings:
+                    st.warning(warning)
+
+
+def render_history(menu):
+    st.markdown("### 🕘 Versions")
+    publications = list_publications()
+    if publications:
+        st.dataframe(publications, hide_index=True, use_container_width=True)
+    else:
+        st.caption("Nothing published yet; the menu comes from day-menu.yaml.")
+
+    versions = list_versions()
+    with st.form('rollback_form'):
+        version = st.selectbox(
+            'Publish an earlier version', [v['version'] for v in versions],
+            format_func=lambda v: next(f"{v} ({row['first_served_at']}) {row['note']}"
+                                       for row in versions if row['version'] == v),
+        )
+        if st.form_submit_button('Publish this version') and version:
+            if version == menu.version:
+                st.info("That version is already live.")
+            else:
+                publish_version(version, f"Rollback to {version}")
+                st.success(f"Version {version} is live again.")
+
+    history = price_history()
+    if not history.empty:
+        st.markdown("**Price history**")
+        history['item'] = history['sku'].map(sku_label)
+        table = history.pivot_table(index=['item', 'day'], columns='version', values='price')
+        # Versions left to right in the order they were first served
+        table = table[list(dict.fromkeys(history['version']))]
+        # Only rows where the price changed at some point
+        changed = table[table.nunique(axis=1, dropna=False) > 1]
+        if changed.empty:
+            st.caption("No price has changed across recorded versions.")
+        else:
+            st.dataframe(changed, use_container_width=True)
+    if version and st.toggle('Show selected version as recorded'):
+        st.json(load_version(version))
+
+
+def render_revenue():
+    st.markdown("### 💰 Revenue by Menu Version")
+    st.caption("Recomputed from order lines and each order's menu version. Pick a version to "
+               "see what the same orders would have earned at its prices.")
+    today = datetime.now().date()
+    col1, col2 = st.columns(2)
+    with col1:
+        dates = st.date_input('Delivery dates', value=(today - timedelta(days=27), today), key='revenue_dates')
+    with col2:
+        at_version = st.selectbox('Price with', [None] + [v['version'] for v in list_versions()],
+                                  format_func=lambda v: v or "Each order's own version")
+    start, end = (dates[0], dates[-1]) if dates else (today, today)
+    revenue = revenue_by_version(start.isoformat(), end.isoformat(), at_version)
+    if revenue.empty:
+        st.info("No orders for these dates.")
+        return
+    st.metric('Recomputed revenue', f"₹{revenue['recomputed'].sum():,.0f}",
+              delta=f"{revenue['recomputed'].sum() - revenue['charged'].sum():,.0f} vs charged")
+    st.dataframe(revenue, hide_index=True, use_container_width=True)
+
+
+def main():
+    menu = get_menu()
+    render_editor(menu)
+    render_history(menu)
+    render_revenue()
+
+
+require_staff()
+main()
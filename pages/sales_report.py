@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from pricing import MEAL_LABELS, sku_label
+from reports import FORECAST_WEEKS, daily_revenue, forecast_demand, weekday_counts, weekly_counts
+from staff import require_staff
+
+
+# Reports read small pre-aggregated tables; a short cache keeps reruns instant
+CACHE_TTL_SECONDS = 60
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_reports(start_date, end_date):
+    return (daily_revenue(start_date, end_date), weekly_counts(start_date, end_date),
+            weekday_counts(start_date, end_date))
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_forecast(target_week, weeks):
+    forecast = forecast_demand(target_week, weeks)
+    if forecast.empty:
+        return forecast, forecast
+    forecast['meal'] = forecast['meal'].map(MEAL_LABELS)
+    forecast['sku'] = forecast['sku'].map(sku_label)
+    totals = (forecast.groupby('sku', sort=False)[['forecast', 'booked', 'plan']].sum()
+              .reset_index().rename(columns={'sku': 'item'}))
+    return forecast, totals
+
+
+def render_forecast(today):
+    st.markdown("### 🔮 Next Week's Demand")
+    next_monday = today - timedelta(days=today.weekday()) + timedelta(weeks=1)
+    weeks = st.slider('Weeks of history', 1, 12, FORECAST_WEEKS)
+    st.caption(f"Week of {next_monday:%d %b}: each weekday is the average of the same weekday over the "
+               f"last {weeks} weeks, rounded up. Plan is the larger of the forecast and orders already booked.")
+    forecast, totals = cached_forecast(next_monday.isoformat(), weeks)
+    if forecast.empty:
+        st.info("Not enough order history to forecast yet.")
+        return
+    st.dataframe(totals, hide_index=True, use_container_width=True)
+    with st.expander('By day and meal'):
+        st.dataframe(forecast, hide_index=True, use_container_width=True)
+
+
+def main():
+    st.markdown("### 📈 Sales")
+    st.caption(f"Figures refresh every {CACHE_TTL_SECONDS} seconds.")
+
+    today = datetime.now().date()
+    dates = st.date_input('Delivery dates', value=(today - timedelta(weeks=12), today))
+    # The range picker returns a single date while the end is being chosen
+    start, end = (dates[0], dates[-1]) if dates else (today, today)
+
+    revenue, weekly, weekdays = cached_reports(start.isoformat(), end.isoformat())
+    if revenue.empty:
+        st.info("No orders for these dates yet.")
+    else:
+        col1, col2 = st.columns(2)
+        col1.metric('Revenue', f"₹{revenue['revenue'].sum():,}")
+        col2.metric('Deliveries', f"{revenue['orders'].sum():,}")
+        st.line_chart(revenue, x='date', y='revenue')
+
+        st.markdown("**Per week**")
+        st.dataframe(weekly, hide_index=True, use_container_width=True)
+
+        st.markdown("**Per day of week**")
+        weekdays['meal'] = weekdays['meal'].map(MEAL_LABELS)
+        st.dataframe(weekdays, hide_index=True, use_container_width=True)
+
+    render_forecast(today)
+
+
+require_staff()
+main()
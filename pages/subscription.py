@@ -0,0 +1,55 @@
+import secrets
+
+import streamlit as st
+
+from admission import RateLimited, admit_lookup
+from pricing import MEAL_LABELS, MEALS, sku_label
+from storage import get_store
+from subscriptions import cancel_subscription, get_subscription
+
+
+def main():
+    st.markdown("### 🔁 Weekly Subscription")
+    st.markdown("Tick *Repeat this order every week* when placing an order to subscribe. "
+                "Each week's order uses the current menu prices, and items not served "
+                "on a day are left out.")
+
+    contact = st.session_state.get('subscription_contact')
+    if not contact:
+        with st.form('subscription_lookup'):
+            st.caption("Enter your contact number and the confirmation ID of any of your orders.")
+            number = st.text_input('Contact Number', max_chars=20)
+            confirmation = st.text_input('Confirmation ID', max_chars=20)
+            if not st.form_submit_button('Show my subscription') or not (number and confirmation):
+                return
+        session_id = st.session_state.setdefault('session_id', secrets.token_hex(8))
+        try:
+            admit_lookup(number, session_id)
+        except RateLimited as e:
+            st.error(f"Too many attempts. Please try again in {e.retry_after:.0f} seconds.")
+            return
+        customer = get_store().verify_customer(number, confirmation)
+        if customer is None:
+            st.error("We couldn't match that number and confirmation ID.")
+            return
+        st.session_state['subscription_contact'] = customer.contact
+        st.rerun()
+    subscription = get_subscription(contact)
+    if subscription is None:
+        st.info("No active subscription for this number.")
+        return
+
+    st.markdown(f"**{subscription['name']}**, {subscription['address']}")
+    for day, meals in subscription['template'].items():
+        summary = '; '.join(
+            f"{MEAL_LABELS[meal]}: " + ', '.join(f"{sku_label(sku)} x{qty}" for sku, qty in meals[meal].items())
+            for meal in MEALS if meals.get(meal)
+        )
+        st.markdown(f"• **{day}** - {summary}")
+
+    if st.button('Cancel subscription'):
+        cancel_subscription(contact)
+        st.success("Subscription cancelled. Orders already generated are not affected.")
+
+
+main()
@@ -0,0 +1,146 @@
+import numpy as np
+
+from metrics import timed
+
+
+MEALS = ('lunch', 'dinner')
+MEAL_LABELS = {'lunch': 'Lunch', 'dinner': 'Dinner'}
+TIFFIN_LABELS = {'full_tiffin': 'Full Tiffin', 'half_tiffin': 'Half Tiffin'}
+
+# Minimum order value in rupees
+MINIMUM_ORDER_VALUE = 100
+
+
+def sku_label(sku):
+    return TIFFIN_LABELS.get(sku, sku)
+
+
+class PricedOrder:
+    """
+    A week's order priced in one pass.
+
+    quantities has shape (dates, meals, SKUs) and unit_prices (dates, SKUs);
+    every other total is derived from their product.
+    """
+    __slots__ = ('menu', 'dates', 'quantities', 'unit_prices', 'line_totals',
+                 'meal_totals', 'day_totals', 'total')
+
+    def __init__(self, menu, dates, quantities, unit_prices):
+        self.menu = menu
+        self.dates = dates
+        self.quantities = quantities
+        self.unit_prices = unit_prices
+        self.line_totals = quantities * unit_prices[:, None, :]
+        self.meal_totals = self.line_totals.sum(axis=2)
+        self.day_totals = self.meal_totals.sum(axis=1)
+        self.total = int(self.day_totals.sum())
+
+    def line_items(self, date_index=None, meal=None):
+        """
+        Yield ordered (non-zero) lines as dicts with date_info, meal, sku,
+        label, qty, unit_price and total, optionally for one date and meal.
+        """
+        nonzero = np.argwhere(self.quantities > 0)
+        meal_index = MEALS.index(meal) if meal else None
+        for d, m, s in nonzero:
+            if date_index is not None and d != date_index:
+                continue
+            if meal_index is not None and m != meal_index:
+                continue
+            sku = self.menu.skus[s]
+            yield {
+                'date_info': self.dates[d],
+                'meal': MEALS[m],
+                'sku': sku,
+                'label': sku_label(sku),
+                'qty': int(self.quantities[d, m, s]),
+                'unit_price': int(self.unit_prices[d, s]),
+                'total': int(self.line_totals[d, m, s]),
+            }
+
+    def meal_total(self, date_index, meal):
+        return int(self.meal_totals[date_index, MEALS.index(meal)])
+
+    def day_total(self, date_index):
+        return int(self.day_totals[date_index])
+
+    def meets_minimum(self):
+        return self.total >= MINIMUM_ORDER_VALUE
+
+    def tiffin_details(self):
+        """Human-readable per-date summary strings (the sheet's 'Tiffin Details')"""
+        skus = self.menu.skus
+        half = skus.index('half_tiffin')
+        full = skus.index('full_tiffin')
+        details = []
+        for d, date_info in enumerate(self.dates):
+            meal_summaries = []
+            for m, meal in enumerate(MEALS):
+                qty = self.quantities[d, m]
+                summary = f"{MEAL_LABELS[meal]}: {int(qty[half])} half, {int(qty[full])} full"
+                extras = ', '.join(f'{skus[s]} x{int(qty[s])}'
+                                   for s in range(len(skus)) if s not in (half, full) and qty[s] > 0)
+                if extras:
+                    summary += f", Extras: {extras}"
+                meal_summaries.append(summary)
+            details.append(f"{date_info['date']} ({date_info['day']}): " + '; '.join(meal_summaries))
+        return details
+
+
+def price_table(menu, dates):
+    """Unit prices per date and SKU, shape (dates, SKUs)"""
+    zeros = (0,) * len(menu.skus)
+    return np.array(
+        [menu.day(d['day']).prices if menu.day(d['day']) else zeros for d in dates],
+        dtype=np.int64
+    ).reshape(len(dates), len(menu.skus))
+
+
+def quantity_array(menu, dates, per_date_tiffin):
+    """
+    Dense quantity array of shape (dates, meals, SKUs).
+
+    Args:
+        menu (CompiledMenu): Menu whose SKU order is used
+        dates (list): date_info dicts from get_week_dates
+        per_date_tiffin (dict): full_date -> meal -> sku -> quantity
+    """
+    quantities = np.zeros((len(dates), len(MEALS), len(menu.skus)), dtype=np.int64)
+    sku_index = menu.sku_index
+    for d, date_info in enumerate(dates):
+        for m, meal in enumerate(MEALS):
+            for sku, qty in per_date_tiffin.get(date_info['full_date'], {}).get(meal, {}).items():
+                if qty and sku in sku_index:
+                    quantities[d, m, sku_index[sku]] = qty
+    return quantities
+
+
+def template_quantities(menu, dates, template):
+    """
+    Apply a weekly template (weekday -> meal -> sku -> quantity) to dates,
+    keeping only what the menu serves that day (tiffin sizes on the menu,
+    extras sold on that weekday).
+
+    Returns:
+        dict: full_date -> meal -> sku -> quantity, as price_order expects
+    """
+    per_date_tiffin = {}
+    for date_info in dates:
+        day_menu = menu.day(date_info['day'])
+        day_template = template.get(date_info['day'])
+        if day_menu is None or not day_template:
+            continue
+        for meal in MEALS:
+            counts = {
+                sku: qty for sku, qty in day_template.get(meal, {}).items()
+                if qty and sku in menu.sku_index and day_menu.prices[menu.sku_index[sku]] > 0
+            }
+            if counts:
+                per_date_tiffin.setdefault(date_info['full_date'], {})[meal] = counts
+    return per_date_tiffin
+
+
+@timed('pricing')
+def price_order(menu, dates, per_date_tiffin):
+    """Price a week's order; SKUs not sold on a date are priced at 0"""
+    return PricedOrder(menu, list(dates), quantity_array(menu, dates, per_date_tiffin), price_table(menu, dates))
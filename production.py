@@ -0,0 +1,63 @@
+from db import connect, register_schema, transaction
+from menu import TIFFIN_SIZES
+from pricing import sku_label
+
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS production_counts (
+    date TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    qty INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, meal, sku)
+);
+""")
+
+
+def add_order_counts(conn, order):
+    """Add an order's lines to the running per date/meal/SKU totals.
+
+    Called in the same transaction that stores the order, so the totals
+    never disagree with order_lines.
+    """
+    conn.executemany(
+        "INSERT INTO production_counts (date, meal, sku, qty) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (date, meal, sku) DO UPDATE SET qty = qty + excluded.qty",
+        [(line.date, line.meal, line.sku, line.qty) for line in order.lines]
+    )
+
+
+def rebuild_counts():
+    """Recompute production_counts from order_lines (for backfills and repairs)"""
+    with transaction() as conn:
+        conn.execute("DELETE FROM production_counts")
+        conn.execute(
+            "INSERT INTO production_counts (date, meal, sku, qty) "
+            "SELECT date, meal, sku, SUM(qty) FROM order_lines GROUP BY date, meal, sku"
+        )
+
+
+def production_summary(start_date, end_date=None):
+    """
+    Items to prepare per date and meal, one column per SKU.
+
+    Reads only the pre-aggregated production_counts table.
+    """
+    import pandas as pd
+    query = "SELECT date, meal, sku, qty FROM production_counts WHERE date >= ? AND qty > 0"
+    params = [start_date]
+    if end_date:
+        query += " AND date <= ?"
+        params.append(end_date)
+    counts = pd.read_sql_query(query, connect(), params=params)
+    if counts.empty:
+        return counts
+    table = counts.pivot_table(index=['date', 'meal'], columns='sku', values='qty',
+                               aggfunc='sum', fill_value=0)
+    # Tiffins first, then extras in alphabetical order
+    skus = [sku for sku in TIFFIN_SIZES if sku in table.columns]
+    skus += sorted(sku for sku in table.columns if sku not in TIFFIN_SIZES)
+    table = table[skus].rename(columns=sku_label)
+    table.columns.name = None
+    return table.reset_index()
+
@@ -0,0 +1,221 @@
+from datetime import date as Date, timedelta
+
+import production  # noqa: F401 (forecasts read production_counts)
+from db import connect, register_schema, transaction
+from menu import TIFFIN_SIZES, WEEKDAYS
+from metrics import timed
+from pricing import MEALS, sku_label
+
+
+# Past weeks averaged for each weekday's forecast
+FORECAST_WEEKS = 4
+
+# Per-SKU daily counts are production_counts (see production.py); these
+# add revenue per day and per-week counts keyed by day of week
+register_schema("""
+CREATE TABLE IF NOT EXISTS sales_daily (
+    date TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL DEFAULT 0,
+    revenue INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_weekly (
+    week TEXT NOT NULL,
+    day TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    qty INTEGER NOT NULL DEFAULT 0,
+    revenue INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (week, day, meal, sku)
+);
+""")
+
+
+def monday_of(full_date):
+    """Monday of the calendar week a 'YYYY-MM-DD' date falls in, as 'YYYY-MM-DD'"""
+    day = Date.fromisoformat(full_date)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def add_sales(conn, order):
+    """Add an order to the daily revenue and weekly count tables.
+
+    Called in the same transaction that stores the order, alongside
+    production.add_order_counts, so reports never disagree with order_lines.
+    """
+    daily = {}
+    weekly = {}
+    for line in order.lines:
+        daily[line.date] = daily.get(line.date, 0) + line.total
+        key = (monday_of(line.date), line.day, line.meal, line.sku)
+        qty, revenue = weekly.get(key, (0, 0))
+        weekly[key] = (qty + line.qty, revenue + line.total)
+    conn.executemany(
+        "INSERT INTO sales_daily (date, orders, revenue) VALUES (?, 1, ?) "
+        "ON CONFLICT (date) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue",
+        list(daily.items())
+    )
+    conn.executemany(
+        "INSERT INTO sales_weekly (week, day, meal, sku, qty, revenue) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (week, day, meal, sku) DO UPDATE SET qty = qty + excluded.qty, "
+        "revenue = revenue + excluded.revenue",
+        [key + totals for key, totals in weekly.items()]
+    )
+
+
+def rebuild_sales():
+    """Recompute sales_daily and sales_weekly from order_lines (for backfills and repairs)"""
+    # Registers order_lines; imported here since orders imports this module
+    import orders  # noqa: F401
+    with transaction() as conn:
+        conn.execute("DELETE FROM sales_daily")
+        conn.execute("DELETE FROM sales_weekly")
+        conn.execute(
+            "INSERT INTO sales_daily (date, orders, revenue) "
+            "SELECT date, COUNT(DISTINCT order_id), SUM(qty * unit_price) FROM order_lines GROUP BY date"
+        )
+        # 'weekday 0' moves to the week's Sunday, so six days earlier is its Monday
+        conn.execute(
+            "INSERT INTO sales_weekly (week, day, meal, sku, qty, revenue) "
+            "SELECT date(date, 'weekday 0', '-6 days'), day, meal, sku, SUM(qty), SUM(qty * unit_price) "
+            "FROM order_lines GROUP BY 1, day, meal, sku"
+        )
+
+
+_backfilled = False
+
+
+def _report_connection():
+    """This thread's connection, after indexing orders stored before the
+    sales tables existed (checked once per process)"""
+    global _backfilled
+    import orders  # noqa: F401
+    conn = connect()
+    if not _backfilled:
+        _backfilled = True
+        if (conn.execute("SELECT 1 FROM order_lines LIMIT 1").fetchone()
+                and not conn.execute("SELECT 1 FROM sales_daily LIMIT 1").fetchone()):
+            rebuild_sales()
+    return conn
+
+
+def _ordered_skus(skus):
+    """Tiffins first, then extras in alphabetical order"""
+    return [sku for sku in TIFFIN_SIZES if sku in skus] + sorted(sku for sku in skus if sku not in TIFFIN_SIZES)
+
+
+@timed('report_daily_revenue')
+def daily_revenue(start_date, end_date):
+    """Orders and revenue per delivery date in [start_date, end_date], as a DataFrame"""
+    import pandas as pd
+    return pd.read_sql_query(
+        "SELECT date, orders, revenue FROM sales_daily WHERE date BETWEEN ? AND ? ORDER BY date",
+        _report_connection(), params=[start_date, end_date]
+    )
+
+
+@timed('report_weekly_counts')
+def weekly_counts(start_date, end_date):
+    """
+    Quantity sold per week, one column per SKU, plus the week's revenue,
+    for weeks starting in [start_date, end_date].
+    """
+    import pandas as pd
+    counts = pd.read_sql_query(
+        "SELECT week, sku, SUM(qty) AS qty, SUM(revenue) AS revenue FROM sales_weekly "
+        "WHERE week BETWEEN ? AND ? GROUP BY week, sku",
+        _report_connection(), params=[monday_of(start_date), end_date]
+    )
+    if counts.empty:
+        return counts
+    table = counts.pivot_table(index='week', columns='sku', values='qty', aggfunc='sum', fill_value=0)
+    table = table[_ordered_skus(set(table.columns))].rename(columns=sku_label)
+    table['Revenue'] = counts.groupby('week')['revenue'].sum()
+    table.columns.name = None
+    return table.reset_index()
+
+
+@timed('report_weekday_counts')
+def weekday_counts(start_date, end_date):
+    """
+    Quantity per day of week, meal and SKU summed over weeks starting in
+    [start_date, end_date], one column per SKU.
+    """
+    import pandas as pd
+    counts = pd.read_sql_query(
+        "SELECT day, meal, sku, SUM(qty) AS qty FROM sales_weekly "
+        "WHERE week BETWEEN ? AND ? GROUP BY day, meal, sku",
+        _report_connection(), params=[monday_of(start_date), end_date]
+    )
+    if counts.empty:
+        return counts
+    table = counts.pivot_table(index=['day', 'meal'], columns='sku', values='qty', aggfunc='sum', fill_value=0)
+    table = table[_ordered_skus(set(table.columns))].rename(columns=sku_label)
+    table = table.reindex(sorted(table.index, key=lambda key: (WEEKDAYS.index(key[0]), MEALS.index(key[1]))))
+    table.columns.name = None
+    return table.reset_index()
+
+
+@timed('report_forecast')
+def forecast_demand(target_week, weeks=FORECAST_WEEKS):
+    """
+    Forecast a week's demand per weekday, meal and SKU.
+
+    A seasonal moving average: each weekday gets the mean of the same
+    weekday over the `weeks` weeks before the current one (weeks with no
+    orders count as zero), rounded up to whole items. Orders already
+    booked for the target week are included, and the plan is whichever is
+    larger.
+
+    Args:
+        target_week (str): Monday of the week to forecast, 'YYYY-MM-DD'
+        weeks (int): Number of past weeks to average
+
+    Returns:
+        DataFrame: date, day, meal, sku, forecast, booked, plan
+    """
+    import numpy as np
+    import pandas as pd
+
+    target = Date.fromisoformat(monday_of(target_week))
+    this_week = Date.today() - timedelta(days=Date.today().weekday())
+    # Only weeks that are fully delivered, and never the target week itself
+    history_end = min(this_week, target)
+    history_start = history_end - timedelta(weeks=weeks)
+    conn = _report_connection()
+    history = conn.execute(
+        "SELECT week, day, meal, sku, qty FROM sales_weekly WHERE week >= ? AND week < ?",
+        (history_start.isoformat(), history_end.isoformat())
+    ).fetchall()
+    target_dates = [(target + timedelta(days=i)).isoformat() for i in range(7)]
+    booked_rows = conn.execute(
+        "SELECT date, meal, sku, qty FROM production_counts WHERE date BETWEEN ? AND ?",
+        (target_dates[0], target_dates[-1])
+    ).fetchall()
+
+    skus = _ordered_skus({row['sku'] for row in history} | {row['sku'] for row in booked_rows})
+    sku_index = {sku: i for i, sku in enumerate(skus)}
+    day_index = {day: i for i, day in enumerate(WEEKDAYS)}
+    meal_index = {meal: i for i, meal in enumerate(MEALS)}
+    week_offsets = {(history_start + timedelta(weeks=i)).isoformat(): i for i in range(weeks)}
+
+    counts = np.zeros((weeks, len(WEEKDAYS), len(MEALS), len(skus)))
+    for row in history:
+        counts[week_offsets[row['week']], day_index[row['day']], meal_index[row['meal']],
+               sku_index[row['sku']]] += row['qty']
+    booked = np.zeros(counts.shape[1:])
+    for row in booked_rows:
+        booked[target_dates.index(row['date']), meal_index[row['meal']], sku_index[row['sku']]] += row['qty']
+
+    forecast = np.ceil(counts.mean(axis=0)) if weeks else np.zeros(booked.shape)
+    plan = np.maximum(forecast, booked)
+    days, meals, sku_ids = np.nonzero(plan)
+    return pd.DataFrame({
+        'date': [target_dates[d] for d in days],
+        'day': [WEEKDAYS[d] for d in days],
+        'meal': [MEALS[m] for m in meals],
+        'sku': [skus[s] for s in sku_ids],
+        'forecast': forecast[days, meals, sku_ids].astype(int),
+        'booked': booked[days, meals, sku_ids].astype(int),
+        'plan': plan[days, meals, sku_ids].astype(int),
+    })
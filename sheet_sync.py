@@ -0,0 +1,277 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+
+from config import SHEET_NAME, SPREADSHEET_NAME
+from db import connect, register_schema
+from menu import get_menu
+from metrics import span
+from orders import Order, OrderLine, import_orders
+from outbox import ORDER_ID_HEADER
+from sheets import get_worksheet
+
+
+log = logging.getLogger(__name__)
+
+# Delta syncs only see rows below the last synced one; re-read everything
+# this often so deleted or re-sorted rows don't leave new orders unseen
+FULL_SYNC_INTERVAL_SECONDS = 6 * 60 * 60
+SYNC_INTERVAL_SECONDS = 5 * 60
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS sheet_sync (
+    sheet TEXT PRIMARY KEY,
+    headers TEXT NOT NULL,
+    last_row INTEGER NOT NULL,
+    last_sync_at REAL,
+    last_full_sync_at REAL,
+    stats TEXT NOT NULL DEFAULT '{}'
+);
+""")
+
+# "06 Jan (Monday): " starts each date in the Tiffin Details column
+DATE_RE = re.compile(r'(\d{1,2} [A-Z][a-z]{2}) \((\w+)\): ')
+MEAL_RE = re.compile(r'(Lunch|Dinner): (\d+) half, (\d+) full(?:, Extras: (.*?))?(?:; |$)')
+EXTRA_RE = re.compile(r'(.+) x(\d+)$')
+
+
+def _last_column(n_columns):
+    """Column letter for the n-th column (1 -> 'A', 27 -> 'AA')"""
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, n_columns).rstrip('0123456789')
+
+
+def _order_date(day_month, placed_at):
+    """Resolve '06 Jan' to the date nearest the order's timestamp"""
+    candidates = []
+    for year in (placed_at.year - 1, placed_at.year, placed_at.year + 1):
+        try:
+            candidates.append(datetime.strptime(f"{day_month} {year}", '%d %b %Y'))
+        except ValueError:
+            pass
+    return min(candidates, key=lambda d: abs(d - placed_at))
+
+
+def parse_tiffin_details(details, placed_at, menu):
+    """
+    Turn a 'Tiffin Details' cell back into OrderLines.
+
+    Unit prices come from the current menu; items it doesn't know are kept
+    with a price of 0 so the kitchen counts still include them.
+
+    Args:
+        details (str): Cell text as written by the order form
+        placed_at (datetime): Order timestamp, used to infer each date's year
+        menu (CompiledMenu): Menu to price the lines with
+
+    Returns:
+        list: OrderLine per date, meal and item ordered
+    """
+    lines = []
+    starts = list(DATE_RE.finditer(details))
+    for i, start in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(details)
+        date = _order_date(start.group(1), placed_at).strftime('%Y-%m-%d')
+        day = start.group(2)
+        day_menu = menu.day(day)
+        for meal in MEAL_RE.finditer(details[start.end():end].strip()):
+            quantities = {'half_tiffin': int(meal.group(2)), 'full_tiffin': int(meal.group(3))}
+            for extra in (meal.group(4) or '').split(', '):
+                match = EXTRA_RE.match(extra.strip())
+                if match:
+                    quantities[match.group(1)] = int(match.group(2))
+            for sku, qty in quantities.items():
+                if qty <= 0:
+                    continue
+                index = menu.sku_index.get(sku)
+                price = day_menu.prices[index] if day_menu is not None and index is not None else 0
+                lines.append(OrderLine(date, day, meal.group(1).lower(), sku, qty, price))
+    return lines
+
+
+def _int(value):
+    digits = re.sub(r'[^\d.]', '', value or '')
+    return int(float(digits)) if digits else None
+
+
+def _sheet_order_id(record):
+    """Stable ID for a row the app didn't write, so re-reading it is a no-op"""
+    key = '|'.join(record.get(h, '') for h in ('Timestamp', 'Contact Number', 'Tiffin Details', 'Total Price'))
+    return 'SHEET-' + hashlib.sha1(key.encode()).hexdigest()[:12].upper()
+
+
+def row_to_order(record, menu):
+    """
+    Build an Order from a sheet row (dict keyed by header).
+
+    Returns:
+        Order: The order, or None if the row can't be read as one
+    """
+    try:
+        placed_at = datetime.strptime(record.get('Timestamp', '').strip(), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    lines = parse_tiffin_details(record.get('Tiffin Details', ''), placed_at, menu)
+    if not lines:
+        return None
+    total = _int(record.get('Total Price'))
+    return Order(
+        record.get(ORDER_ID_HEADER, '').strip() or _sheet_order_id(record),
+        placed_at.strftime('%Y-%m-%d %H:%M:%S'),
+        record.get('Name', ''), record.get('Contact Number', ''), record.get('Address', ''),
+        record.get('Special Instructions', ''),
+        total if total is not None else sum(line.total for line in lines),
+        record.get('Payment Screenshot', ''), lines, record.get('Tiffin Details', ''),
+        menu.version or ''
+    )
+
+
+def _written_by_app(conn, record):
+    """True for a row without an order ID that the app itself stored"""
+    if record.get(ORDER_ID_HEADER, '').strip():
+        return False
+    return conn.execute(
+        "SELECT 1 FROM orders WHERE created_at = ? AND contact = ?",
+        (record.get('Timestamp', '').strip(), record.get('Contact Number', ''))
+    ).fetchone() is not None
+
+
+class SheetSync:
+    """
+    Imports orders from the Google Sheet into the local database.
+
+    The first sync (and a periodic full refresh) reads the whole sheet;
+    after that a sync reads only the range below the last synced row. Rows
+    are stored through orders.import_orders(), so rows already stored
+    locally, including those the app wrote itself, are skipped.
+    """
+
+    def __init__(self, spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME):
+        self.spreadsheet_name = spreadsheet_name
+        self.sheet_name = sheet_name
+        self.key = f"{spreadsheet_name}/{sheet_name}"
+        self._lock = threading.Lock()
+
+    def state(self):
+        """Stored sync state for this sheet, or None before the first sync"""
+        row = connect().execute("SELECT * FROM sheet_sync WHERE sheet = ?", (self.key,)).fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        state['headers'] = json.loads(state['headers'])
+        state['stats'] = json.loads(state['stats'])
+        return state
+
+    def sync(self, full=False):
+        """
+        Import any rows added to the sheet since the last sync.
+
+        Returns:
+            dict: Stats for this sync (mode, rows fetched, orders imported,
+            API calls, seconds)
+        """
+        with self._lock, span('sheet_sync'):
+            started = time.perf_counter()
+            state = self.state()
+            handle = get_worksheet(self.spreadsheet_name, self.sheet_name)
+            headers = handle.headers(refresh=True)
+            api_calls = 1
+            now = time.time()
+            full_due = (state is None or state['last_full_sync_at'] is None
+                        or now - state['last_full_sync_at'] > FULL_SYNC_INTERVAL_SECONDS)
+            if full or full_due or headers != state['headers']:
+                values = handle.get_values()
+                rows, last_row = values[1:], len(values)
+                mode, last_full_sync_at = 'full', now
+            else:
+                range_name = f"A{state['last_row'] + 1}:{_last_column(len(headers))}"
+                rows = handle.get_values(range_name)
+                last_row = state['last_row'] + len(rows)
+                mode, last_full_sync_at = 'delta', state['last_full_sync_at']
+            api_calls += 1
+
+            menu = get_menu()
+            conn = connect()
+            orders = []
+            for row in rows:
+                # The API drops trailing empty cells
+                record = dict(zip(headers, list(row) + [''] * (len(headers) - len(row))))
+                if _written_by_app(conn, record):
+                    continue
+                order = row_to_order(record, menu)
+                if order is not None:
+                    orders.append(order)
+            imported = import_orders(orders)
+
+            stats = {
+                'mode': mode,
+                'rows_fetched': len(rows),
+                'imported': imported,
+                'api_calls': api_calls,
+                'seconds': round(time.perf_counter() - started, 3),
+            }
+            conn.execute(
+                "INSERT OR REPLACE INTO sheet_sync (sheet, headers, last_row, last_sync_at, "
+                "last_full_sync_at, stats) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key, json.dumps(headers), last_row, now, last_full_sync_at, json.dumps(stats))
+            )
+            return stats
+
+    def lag_seconds(self):
+        """Seconds since the last successful sync (None if never synced)"""
+        state = self.state()
+        if state is None or state['last_sync_at'] is None:
+            return None
+        return time.time() - state['last_sync_at']
+
+
+class SheetSyncWorker(threading.Thread):
+    """Background thread that imports new sheet rows every few minutes"""
+
+    def __init__(self, interval=SYNC_INTERVAL_SECONDS):
+        super().__init__(name="sheet-sync-worker", daemon=True)
+        self.sheet_sync = SheetSync()
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                stats = self.sheet_sync.sync()
+                if stats['imported']:
+                    log.info(f"Imported {stats['imported']} orders from the sheet ({stats['mode']} sync)")
+            except Exception as e:
+                log.error(f"Error syncing orders from the sheet: {e}")
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_sheet_sync_worker():
+    """Start the process-wide SheetSyncWorker if it isn't running yet"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = SheetSyncWorker()
+            _worker.start()
+        return _worker
+
+
+def sync_status():
+    """Lag and last sync stats for the order sheet import"""
+    sheet_sync = SheetSync()
+    state = sheet_sync.state()
+    return {
+        'lag_seconds': sheet_sync.lag_seconds(),
+        'last_row': state['last_row'] if state else None,
+        'stats': state['stats'] if state else {},
+    }
@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from metrics import span
+
+# gspread and google-auth are imported on first use: together they take a
+# few hundred milliseconds to import, and most page views never touch the
+# sheet
+
+
+log = logging.getLogger(__name__)
+
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Service account key used for local development when the
+# GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable is not set
+DEFAULT_CREDENTIALS_FILE = os.environ.get('TIFFIN_CREDENTIALS_FILE', "ambient-polymer-465105-h1-aeb54163f0c7.json")
+
+# How long a cached header row is trusted before it is fetched again
+HEADER_TTL_SECONDS = 300
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Status codes that mean the session (not the request) is broken
+AUTH_ERROR_CODES = (401, 403)
+
+
+def load_credentials(credentials_file=DEFAULT_CREDENTIALS_FILE):
+    """Build service account credentials from the environment or a key file"""
+    from google.oauth2.service_account import Credentials
+    if 'GOOGLE_APPLICATION_CREDENTIALS_JSON' in os.environ:
+        # For cloud deployment - use environment variable
+        service_account_info = json.loads(os.environ['GOOGLE_APPLICATION_CREDENTIALS_JSON'])
+        return Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+    # For local development - use service account file
+    return Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+
+
+def authorize(credentials_file=DEFAULT_CREDENTIALS_FILE):
+    """Return (credentials, authorized gspread client)"""
+    import gspread
+    creds = load_credentials(credentials_file)
+    return creds, gspread.authorize(creds)
+
+
+def is_auth_error(error):
+    """Return True if the error means the client has to be re-authorized"""
+    import gspread
+    from google.auth.exceptions import RefreshError, TransportError
+    if isinstance(error, (RefreshError, TransportError)):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        response = getattr(error, 'response', None)
+        return getattr(response, 'status_code', None) in AUTH_ERROR_CODES
+    return False
+
+
+class _TokenRefresher(threading.Thread):
+    """Daemon thread that refreshes the access token before it expires,
+    so no user request pays for the refresh round trip."""
+
+    def __init__(self, pool):
+        super().__init__(name="gsheet-token-refresher", daemon=True)
+        self.pool = pool
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            delay = self.pool.refresh_token_if_needed()
+            self.stopped.wait(delay)
+
+
+class SheetClientPool:
+    """Process-wide cache of the authorized gspread client and opened
+    worksheets.
+
+    Streamlit re-executes the app script on every rerun but keeps imported
+    modules alive, so a pool held at module level survives reruns and is
+    shared by all sessions in the worker process.
+    """
+
+    def __init__(self, credentials_file=DEFAULT_CREDENTIALS_FILE, authorize=authorize):
+        self.credentials_file = credentials_file
+        self.authorize = authorize
+        self._lock = threading.RLock()
+        self._creds = None
+        self._client = None
+        self._worksheets = {}
+        self._refresher = None
+
+    def client(self):
+        """Return the authorized client, authorizing on first use"""
+        with self._lock:
+            if self._client is None:
+                with span('sheets_authorize'):
+                    self._creds, self._client = self.authorize(self.credentials_file)
+                if self._creds is not None:
+                    self._start_refresher()
+            return self._client
+
+    def worksheet(self, spreadsheet_name, sheet_name):
+        """Return a cached WorksheetHandle for the given spreadsheet and tab"""
+        key = (spreadsheet_name, sheet_name)
+        with self._lock:
+            handle = self._worksheets.get(key)
+            if handle is None:
+                handle = WorksheetHandle(self, spreadsheet_name, sheet_name)
+                self._worksheets[key] = handle
+            return handle
+
+    def reset(self):
+        """Drop the client and every opened worksheet so the next call
+        re-authorizes from scratch"""
+        with self._lock:
+            self._creds = None
+            self._client = None
+            for handle in self._worksheets.values():
+                handle.forget()
+
+    def refresh_token_if_needed(self):
+        """Refresh the token when it is close to expiry.
+
+        Returns:
+            float: Seconds to wait before checking again
+        """
+        with self._lock:
+            creds = self._creds
+        if creds is None:
+            return 60
+        expiry = creds.expiry
+        if expiry is not None:
+            # google-auth stores expiry as a naive UTC datetime
+            expiry = expiry.replace(tzinfo=timezone.utc)
+            remaining = expiry - datetime.now(timezone.utc)
+            if remaining > TOKEN_REFRESH_MARGIN:
+                return (remaining - TOKEN_REFRESH_MARGIN).total_seconds()
+        from google.auth.transport.requests import Request
+        try:
+            with span('sheets_token_refresh'):
+                creds.refresh(Request())
+        except Exception as e:
+            log.error(f"Error refreshing Google credentials: {e}")
+            self.reset()
+            return 60
+        return 60
+
+    def _start_refresher(self):
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = _TokenRefresher(self)
+            self._refresher.start()
+
+
+class WorksheetHandle:
+    """An opened worksheet plus its cached header row.
+
+    The spreadsheet is looked up (a Drive search) once and the header row is
+    fetched at most every HEADER_TTL_SECONDS, so a write is a single API call
+    in the common case.
+    """
+
+    def __init__(self, pool, spreadsheet_name, sheet_name):
+        self.pool = pool
+        self.spreadsheet_name = spreadsheet_name
+        self.sheet_name = sheet_name
+        self._lock = threading.RLock()
+        self._worksheet = None
+        self._headers = None
+        self._headers_fetched_at = 0.0
+        # Row keys known to have no column, so they don't trigger a refetch
+        self._missing_keys = set()
+
+    def worksheet(self):
+        """Return the gspread Worksheet, opening it on first use"""
+        with self._lock:
+            if self._worksheet is None:
+                client = self.pool.client()
+                with span('sheets_open'):
+                    spreadsheet = client.open(self.spreadsheet_name)
+                    self._worksheet = spreadsheet.worksheet(self.sheet_name)
+            return self._worksheet
+
+    def headers(self, refresh=False):
+        """Return the header row, fetching it when stale or on request"""
+        with self._lock:
+            age = time.monotonic() - self._headers_fetched_at
+            if refresh or self._headers is None or age > HEADER_TTL_SECONDS:
+                worksheet = self.worksheet()
+                with span('sheets_row_values'):
+                    self._headers = worksheet.row_values(1)
+                self._headers_fetched_at = time.monotonic()
+                self._missing_keys = set()
+            return self._headers
+
+    def invalidate_headers(self):
+        """Forget the cached header row"""
+        with self._lock:
+            self._headers = None
+
+    def forget(self):
+        """Forget the opened worksheet and headers (used after auth errors)"""
+        with self._lock:
+            self._worksheet = None
+            self._headers = None
+
+    def rows_for(self, data_dicts):
+        """Lay out dicts as rows in the sheet's column order.
+
+        If a dict carries a key the cached headers don't know about, the
+        sheet schema may have changed (a column was added), so the headers
+        are fetched once more before building the rows.
+        """
+        headers = self.headers()
+        known = set(headers) | self._missing_keys
+        unknown = {key for data in data_dicts for key in data if key not in known}
+        if unknown:
+            headers = self.headers(refresh=True)
+            self._missing_keys = unknown - set(headers)
+        rows = []
+        for data in data_dicts:
+            row = []
+            for header in headers:
+                value = data.get(header, "")
+                # Convert None to empty string
+                if value is None:
+                    value = ""
+                row.append(str(value))
+            rows.append(row)
+        return headers, rows
+
+    def add_headers(self, names):
+        """Give every name a column, adding header cells after the last one.
+
+        Existing columns and rows are left where they are, so a sheet laid
+        out before a column existed keeps working. Returns the header row.
+        """
+        return self._with_reconnect(self._add_headers, names)
+
+    def _add_headers(self, names):
+        with self._lock:
+            headers = self.headers()
+            if all(name in headers for name in names):
+                return headers
+            headers = list(self.headers(refresh=True))
+            if not headers:
+                raise ValueError("No headers found in the first row")
+            missing = [name for name in names if name not in headers]
+            if missing:
+                worksheet = self.worksheet()
+                with span('sheets_add_headers', columns=len(missing)):
+                    for name in missing:
+                        worksheet.update_cell(1, len(headers) + 1, name)
+                        headers.append(name)
+                log.info(f"Added columns {', '.join(missing)} to '{self.spreadsheet_name}' - '{self.sheet_name}'")
+                self._headers = headers
+                self._missing_keys = set()
+            return headers
+
+    def column_values(self, header):
+        """Return the values below a header, or None if the column is missing"""
+        return self._with_reconnect(self._column_values, header)
+
+    def _column_values(self, header):
+        headers = self.headers()
+        if header not in headers:
+            headers = self.headers(refresh=True)
+            if header not in headers:
+                return None
+        worksheet = self.worksheet()
+        with span('sheets_col_values'):
+            return worksheet.col_values(headers.index(header) + 1)[1:]
+
+    def get_values(self, range_name=None):
+        """Return cell values for an A1 range (the whole sheet if omitted)"""
+        return self._with_reconnect(self._get_values, range_name)
+
+    def _get_values(self, range_name):
+        worksheet = self.worksheet()
+        with span('sheets_get_values'):
+            if range_name is None:
+                return worksheet.get_all_values()
+            return [list(row) for row in worksheet.get(range_name)]
+
+    def append_rows(self, data_dicts):
+        """Append dicts as rows, adding a column for any key the sheet lacks
+        and re-authorizing once on an auth error"""
+        return self._with_reconnect(self._append_rows, data_dicts)
+
+    def _append_rows(self, data_dicts):
+        # Keys without a column would otherwise be dropped from the rows
+        self._add_headers(list(dict.fromkeys(key for data in data_dicts for key in data)))
+        headers, rows = self.rows_for(data_dicts)
+        worksheet = self.worksheet()
+        with span('sheets_append_rows', rows=len(rows)):
+            if len(rows) == 1:
+                worksheet.append_row(rows[0])
+            else:
+                worksheet.append_rows(rows)
+
+    def _with_reconnect(self, func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            if not is_auth_error(e):
+                raise
+            log.warning(f"Google Sheets session expired, reconnecting: {e}")
+            self.pool.reset()
+            return func(*args)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide SheetClientPool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SheetClientPool()
+        return _pool
+
+
+def use_client_factory(factory):
+    """
+    Replace the process-wide pool with one whose clients come from factory.
+
+    factory(credentials_file) must return (credentials or None, client),
+    where client offers gspread's open() -> spreadsheet.worksheet() surface.
+    Used to run the app against a local stand-in (see benchmarks/).
+    """
+    global _pool
+    with _pool_lock:
+        _pool = SheetClientPool(authorize=factory)
+        return _pool
+
+
+def get_worksheet(spreadsheet_name, sheet_name='Sheet1'):
+    """Return the shared WorksheetHandle for a spreadsheet tab"""
+    return get_pool().worksheet(spreadsheet_name, sheet_name)
@@ -0,0 +1,46 @@
+import hmac
+import secrets
+
+import streamlit as st
+
+from admission import RateLimited, admit_staff_attempt
+from config import STAFF_PASSWORD
+
+
+def staff_password():
+    """The staff password from st.secrets, else TIFFIN_STAFF_PASSWORD ('' if neither is set)"""
+    try:
+        password = st.secrets.get('staff_password')
+    except Exception:
+        # No secrets.toml
+        password = None
+    return password or STAFF_PASSWORD
+
+
+def require_staff():
+    """
+    Stop the page unless this session has entered the staff password.
+
+    Call before rendering anything: the pages in pages/ are listed in every
+    visitor's sidebar, including customers'.
+    """
+    if st.session_state.get('staff_verified'):
+        return
+    password = staff_password()
+    if not password:
+        st.error("This page is for staff. Set staff_password in .streamlit/secrets.toml "
+                 "or TIFFIN_STAFF_PASSWORD to open it.")
+        st.stop()
+    entered = st.text_input('Staff password', type='password', key='staff_password_input')
+    if entered:
+        try:
+            admit_staff_attempt(st.session_state.setdefault('session_id', secrets.token_hex(8)))
+        except RateLimited as e:
+            st.error(f"Too many attempts. Please try again in {e.retry_after:.0f} seconds.")
+            st.stop()
+        if hmac.compare_digest(entered.encode('utf-8'), password.encode('utf-8')):
+            st.session_state['staff_verified'] = True
+            del st.session_state['staff_password_input']
+            st.rerun()
+        st.error("Wrong password.")
+    st.stop()
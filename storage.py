@@ -0,0 +1,249 @@
+import logging
+import threading
+
+import capacity
+import customers
+from capacity import DEFAULT_MEAL_CAPACITY, CapacityError, slot_demand
+from config import ORDER_BACKEND, SHEET_MIRROR
+from customers import Customer, contact_key
+from dedupe import find_duplicate
+from metrics import REGISTRY
+from orders import Order, iter_orders_for, load_order, store_orders, submit_order
+from outbox import start_outbox_worker
+from sheet_sync import start_sheet_sync_worker
+
+
+log = logging.getLogger(__name__)
+
+
+class OrderStore:
+    """
+    Where submitted orders are kept.
+
+    Backends store orders durably (or not, for tests) without touching the
+    Google Sheet; a backend that mirrors to the sheet does so in the
+    background, so intake keeps working when the Sheets API is slow or down.
+
+    The order form reads capacity and returning customers through the store
+    too, so they always agree with the orders it has taken.
+    """
+    name = None
+
+    def start(self):
+        """Start any background work the backend needs; safe to call on every rerun"""
+
+    def submit(self, order, fingerprint=None):
+        """
+        Store one order, deduplicating by order ID and fingerprint.
+
+        Returns:
+            tuple: (confirmation ID, True if this call created the order)
+
+        Raises:
+            CapacityError: A date and meal in the order is fully booked
+        """
+        raise NotImplementedError
+
+    def find_duplicate(self, order_id, fingerprint):
+        """Confirmation ID of an earlier submission of this order, or None if it is new"""
+        raise NotImplementedError
+
+    def store_many(self, orders):
+        """
+        Store a batch of orders in one write.
+
+        Returns:
+            tuple: (IDs of orders created, {order ID: CapacityError} for orders skipped as full)
+        """
+        raise NotImplementedError
+
+    def get(self, order_id):
+        """Return a stored Order, or None"""
+        raise NotImplementedError
+
+    def orders_for(self, date, meal):
+        """Iterate over the orders delivered on a date and meal, with only those lines"""
+        raise NotImplementedError
+
+    def remaining(self, date, meal):
+        """Tiffins still available for a date and meal"""
+        raise NotImplementedError
+
+    def lookup_customer(self, contact):
+        """The Customer for a contact number as of their latest order, or None"""
+        raise NotImplementedError
+
+    def verify_customer(self, contact, order_id):
+        """
+        The Customer for a contact number if order_id is the confirmation
+        ID of one of their orders, otherwise None.
+        """
+        raise NotImplementedError
+
+
+class SQLiteOrderStore(OrderStore):
+    """
+    The local SQLite database (WAL mode) as the system of record, optionally
+    mirrored to the Google Sheet through the outbox.
+    """
+    name = 'sqlite'
+
+    def __init__(self, mirror=SHEET_MIRROR):
+        self.mirror = mirror
+
+    def start(self):
+        if self.mirror:
+            start_outbox_worker()
+            start_sheet_sync_worker()
+
+    def submit(self, order, fingerprint=None):
+        return submit_order(order, fingerprint, mirror=self.mirror)
+
+    def find_duplicate(self, order_id, fingerprint):
+        return find_duplicate(order_id, fingerprint)
+
+    def store_many(self, orders):
+        return store_orders(orders, mirror=self.mirror)
+
+    def get(self, order_id):
+        return load_order(order_id)
+
+    def orders_for(self, date, meal):
+        return iter_orders_for(date, meal)
+
+    def remaining(self, date, meal):
+        return capacity.remaining(date, meal)
+
+    def lookup_customer(self, contact):
+        return customers.lookup_customer(contact)
+
+    def verify_customer(self, contact, order_id):
+        return customers.verify_customer(contact, order_id)
+
+
+class MemoryOrderStore(OrderStore):
+    """
+    Orders kept in this process only, for tests and benchmarks.
+
+    Covers order intake: submitting, deduplicating, capacity and customer
+    lookup. Subscriptions, production counts, sales reports and menu
+    versions always use the local database, so it is still created.
+    """
+    name = 'memory'
+
+    def __init__(self, capacity=DEFAULT_MEAL_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.orders = {}
+        # fingerprint -> order ID
+        self.fingerprints = {}
+        # (date, meal) -> tiffins booked
+        self.booked = {}
+
+    def _store(self, order):
+        """Store one order with self._lock held; returns False if it already exists"""
+        if order.order_id in self.orders:
+            return False
+        demand = slot_demand(order)
+        for (date, meal), qty in demand.items():
+            left = self.capacity - self.booked.get((date, meal), 0)
+            if qty > left:
+                raise CapacityError(date, meal, qty, max(left, 0))
+        for slot, qty in demand.items():
+            self.booked[slot] = self.booked.get(slot, 0) + qty
+        self.orders[order.order_id] = order
+        return True
+
+    def submit(self, order, fingerprint=None):
+        with self._lock:
+            duplicate = self.fingerprints.get(fingerprint) if fingerprint else None
+            if duplicate or order.order_id in self.orders:
+                REGISTRY.inc('orders_deduplicated')
+                return duplicate or order.order_id, False
+            self._store(order)
+            if fingerprint:
+                self.fingerprints[fingerprint] = order.order_id
+        REGISTRY.inc('orders_submitted')
+        return order.order_id, True
+
+    def find_duplicate(self, order_id, fingerprint):
+        with self._lock:
+            if order_id in self.orders:
+                return order_id
+            return self.fingerprints.get(fingerprint)
+
+    def store_many(self, orders):
+        created, rejected = [], {}
+        with self._lock:
+            for order in orders:
+                try:
+                    if self._store(order):
+                        created.append(order.order_id)
+                except CapacityError as e:
+                    rejected[order.order_id] = e
+        REGISTRY.inc('orders_submitted', len(created))
+        return created, rejected
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def orders_for(self, date, meal):
+        with self._lock:
+            orders = sorted(self.orders.values(), key=lambda order: order.order_id)
+        for order in orders:
+            lines = [line for line in order.lines if line.date == date and line.meal == meal]
+            if lines:
+                yield Order(order.order_id, order.created_at, order.name, order.contact,
+                            order.address, order.instructions, order.total_price,
+                            order.payment_screenshot, lines, menu_version=order.menu_version)
+
+    def remaining(self, date, meal):
+        with self._lock:
+            return max(self.capacity - self.booked.get((date, meal), 0), 0)
+
+    def lookup_customer(self, contact):
+        key = contact_key(contact)
+        with self._lock:
+            orders = [order for order in self.orders.values() if contact_key(order.contact) == key]
+        if not key or not orders:
+            return None
+        # max() keeps the first of equal timestamps, so reverse for the latest stored
+        latest = max(reversed(orders), key=lambda order: order.created_at)
+        return Customer(key, latest.name, latest.address, latest.instructions,
+                        latest.order_id, latest.created_at, len(orders))
+
+    def verify_customer(self, contact, order_id):
+        order = self.orders.get(order_id.strip().upper())
+        if order is None or contact_key(order.contact) != contact_key(contact):
+            return None
+        return self.lookup_customer(contact)
+
+
+BACKENDS = {
+    'sqlite': SQLiteOrderStore,
+    'memory': MemoryOrderStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide OrderStore selected by TIFFIN_ORDER_BACKEND"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if ORDER_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown TIFFIN_ORDER_BACKEND {ORDER_BACKEND!r}; "
+                                 f"expected one of {', '.join(BACKENDS)}")
+            _store = BACKENDS[ORDER_BACKEND]()
+            log.info(f"Storing orders with the {_store.name} backend"
+                     + (", mirrored to Google Sheets" if getattr(_store, 'mirror', False) else ""))
+        return _store
+
+
+def use_store(store):
+    """Replace the process-wide OrderStore (for tests and benchmarks)"""
+    global _store
+    with _store_lock:
+        _store = store
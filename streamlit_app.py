@@ -1,11 +1,31 @@
-from datetime import datetime, timedelta
 import streamlit as st
-from PIL import Image
-import yaml
-import gspread
-from google.oauth2.service_account import Credentials
 import os
-import json
+import logging
+import secrets
+
+from admission import RateLimited, admit, admit_lookup, validate_order
+from capacity import CapacityError
+from customers import contact_key, normalize_contact
+from metrics import REGISTRY, span, start_metrics_exporter, timed
+from dedupe import order_fingerprint
+from images import ScreenshotError, store_screenshot, thumbnail
+from menu import get_menu
+from week_calendar import ADVANCE_WEEKS, ORDER_DAYS_PER_WEEK, get_week_view
+from pricing import MEAL_LABELS, MEALS, TIFFIN_LABELS, template_quantities
+from order_state import get_order_state, quantity_key
+from orders import Order
+from outbox import new_order_id
+from storage import get_store
+from subscriptions import save_subscription, start_subscription_scheduler, template_from_priced
+from warmup import start_warmup
+
+
+# No-op after the first run: basicConfig only configures an unconfigured root logger
+logging.basicConfig(
+    level=os.environ.get('TIFFIN_LOG_LEVEL', 'INFO'),
+    format='%(asctime)s %(levelname)s %(name)s %(message)s'
+)
+log = logging.getLogger(__name__)
 
 
 # st.title("🎈 My new app v2")
@@ -14,543 +34,397 @@ import json
 # )
 
 
+def get_screenshot_ref(uploaded_file):
+    """Store an uploaded screenshot once per upload and return its reference"""
+    refs = st.session_state.setdefault('screenshot_refs', {})
+    if uploaded_file.file_id not in refs:
+        try:
+            refs[uploaded_file.file_id] = store_screenshot(uploaded_file.getvalue())
+        except ScreenshotError as e:
+            log.warning(f"Error processing uploaded screenshot: {e}")
+            refs[uploaded_file.file_id] = None
+    return refs[uploaded_file.file_id]
 
-def get_week_dates():
-    """Get dates for the current week"""
-    today = datetime.now()
-    if today.weekday() > 2:  # Wednesday is 2
-        days_until_monday = (7 - today.weekday()) % 7
-        start_date = today + timedelta(days=days_until_monday)
-    else:
-        days_since_monday = today.weekday()
-        start_date = today - timedelta(days=days_since_monday)
-    
-    dates = []
-    for i in range(6):  # Monday to Saturday
-        current_date = start_date + timedelta(days=i)
-        dates.append({
-            'date': current_date.strftime('%d %b'),
-            'day': current_date.strftime('%A'),
-            'full_date': current_date.strftime('%Y-%m-%d')
-        })
-    return dates
-
-def append_to_gsheet_test(data_dict, sheet_name='Sheet1'):
-    # Use streamlit_gsheets connection
-    # Define the scope
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    
-    # Use environment variable for cloud deployment
-    if 'GOOGLE_APPLICATION_CREDENTIALS_JSON' in os.environ:
-        # Parse JSON from environment variable
-        service_account_info = json.loads(os.environ['GOOGLE_APPLICATION_CREDENTIALS_JSON'])
-        creds = Credentials.from_service_account_info(service_account_info, scopes=scope)
-    else:
-        # Fallback to file for local development
-        creds = Credentials.from_service_account_file("psychic-rush-459809-t8-a81dbb6aa47b.json", scopes=scope)
-    
-    client = gspread.authorize(creds)
-    
-    # Open the Google Sheet (replace with your sheet name or URL)
-    sheet = client.open("Test").worksheet(sheet_name)
-    
-    # Prepare the row in the correct order
-    headers = sheet.row_values(1)
-    row = [data_dict.get(h, "") for h in headers]
-    sheet.append_row(row)
-    print("Data appended to Google Sheet")
-
-def append_to_gsheet_gspread(data_dict, spreadsheet_name="TiffinOrderSheet", sheet_name='Sheet1'):
+
+def prefill_customer(customer, contact):
+    """Fill the order form with a returning customer's details, once per number"""
+    if st.session_state.get('prefilled_contact') == customer.contact:
+        return
+    st.session_state['prefilled_contact'] = customer.contact
+    st.session_state['form_name'] = customer.name
+    st.session_state['form_contact'] = contact
+    st.session_state['form_address'] = customer.address
+    st.session_state['form_instructions'] = customer.instructions
+
+
+def repeat_last_order(customer):
     """
-    Append data to Google Sheets using gspread with better error handling
-    
-    Args:
-        data_dict (dict): Dictionary containing the data to append
-        spreadsheet_name (str): Name of the Google Spreadsheet
-        sheet_name (str): Name of the worksheet within the spreadsheet
-    
-    Returns:
-        bool: True if successful, False otherwise
+    Button callback: select the coming week's dates and quantities from the
+    customer's last order, by weekday, at today's menu.
     """
-    try:
-        # Define the scope for Google Sheets API
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
-        # Initialize credentials
-        if 'GOOGLE_APPLICATION_CREDENTIALS_JSON' in os.environ:
-            # For cloud deployment - use environment variable
-            service_account_info = json.loads(os.environ['GOOGLE_APPLICATION_CREDENTIALS_JSON'])
-            creds = Credentials.from_service_account_info(service_account_info, scopes=scope)
-        else:
-            # For local development - use service account file
-            creds = Credentials.from_service_account_file("ambient-polymer-465105-h1-aeb54163f0c7.json", scopes=scope)
-        
-        # Authorize the client
-        client = gspread.authorize(creds)
-        
-        # Open the spreadsheet
-        try:
-            spreadsheet = client.open(spreadsheet_name)
-        except gspread.SpreadsheetNotFound:
-            print(f"Error: Spreadsheet '{spreadsheet_name}' not found")
-            return False
-        
-        # Open the worksheet
+    order = get_store().get(customer.last_order_id)
+    if order is None:
+        st.session_state['reorder_message'] = "We couldn't find your last order."
+        return
+    menu = get_menu()
+    week_view = get_week_view()
+    week = week_view.dates[:ORDER_DAYS_PER_WEEK]
+    per_date_tiffin = template_quantities(menu, week, order.weekly_template())
+    if not per_date_tiffin:
+        st.session_state['reorder_message'] = "Nothing from your last order is on this week's menu."
+        return
+    dates = [d for d in week if d['full_date'] in per_date_tiffin]
+    st.session_state['selected_dates'] = [
+        label for label in week_view.date_options if week_view.date_map[label] in dates
+    ]
+    for date_info in dates:
+        day_menu = menu.day(date_info['day'])
+        skus = list(day_menu.tiffins) + [extra.name for extra in day_menu.extras]
+        for meal in MEALS:
+            ordered = per_date_tiffin[date_info['full_date']].get(meal, {})
+            for sku in skus:
+                st.session_state[quantity_key(meal, sku, date_info['full_date'])] = ordered.get(sku, 0)
+    st.session_state['reorder_message'] = None
+
+
+def render_customer_lookup():
+    """
+    Recognise a returning customer from the orders the store holds. They
+    must give a confirmation ID from an earlier order as well as their
+    number, so nobody can pull up someone else's address from a phone number.
+    """
+    st.markdown("### 👋 Ordered Before?")
+    verified = st.session_state.get('verified_contact')
+    customer = get_store().lookup_customer(verified) if verified else None
+    if customer is None:
+        with st.form('lookup_form'):
+            st.caption("Enter your contact number and the confirmation ID of any earlier order "
+                       "(like HFB-250106-1A2B3C) to fill in your details.")
+            col1, col2 = st.columns(2)
+            with col1:
+                lookup = st.text_input("Contact Number", max_chars=20, key='lookup_contact')
+            with col2:
+                confirmation = st.text_input("Earlier confirmation ID", max_chars=20, key='lookup_order_id')
+            if not st.form_submit_button("Find my details"):
+                return
+        if not contact_key(lookup) or not confirmation.strip():
+            st.caption("Please enter both your contact number and a confirmation ID.")
+            return
         try:
-            worksheet = spreadsheet.worksheet(sheet_name)
-        except gspread.WorksheetNotFound:
-            print(f"Error: Worksheet '{sheet_name}' not found in spreadsheet '{spreadsheet_name}'")
-            return False
-        
-        # Get headers from the first row
-        headers = worksheet.row_values(1)
-        
-        if not headers:
-            print("Error: No headers found in the first row")
-            return False
-        
-        # Prepare the row data in the correct order based on headers
-        row_data = []
-        for header in headers:
-            value = data_dict.get(header, "")
-            # Convert None to empty string
-            if value is None:
-                value = ""
-            row_data.append(str(value))
-        
-        # Append the row to the worksheet
-        worksheet.append_row(row_data)
-        
-        print(f"Successfully appended data to '{spreadsheet_name}' - '{sheet_name}'")
-        return True
-        
-    except json.JSONDecodeError as e:
-        print(f"Error parsing Google credentials JSON: {e}")
-        return False
-    except Exception as e:
-        print(f"Error appending to Google Sheets: {e}")
-        return False
-
-# def append_to_gsheet(data_dict, sheet_name='Sheet1'):
-#     conn = st.connection("gsheets", type=GSheetsConnection)
-#     data = conn.read()
-#     print(data)
-#     st.dataframe(data)
-    
-#     # Check if sheet is empty
-#     if data.empty:
-#         print("Sheet is empty, adding data_dict...")
-#         # Create DataFrame from data_dict and update the sheet
-#         df = pd.DataFrame([data_dict])
-#         conn.update(data=df, worksheet=sheet_name)
-#         print("Data added to empty sheet")
-#     else:
-#         print("Sheet is not empty, appending new data...")
-#         # Create DataFrame from new data_dict
-#         new_df = pd.DataFrame([data_dict])
-#         # Combine existing data with new data
-#         combined_df = pd.concat([data, new_df], ignore_index=True)
-#         # Update the sheet with combined data
-#         conn.update(data=combined_df, worksheet=sheet_name)
-#         print("New data appended to existing data")
-#         print("Combined data:")
-#         print(combined_df)
-
-def load_menu(filename="day-menu.yaml"):
-    with open(filename, 'r') as f:
-        menu_raw = yaml.safe_load(f)
-    # Handle duplicate days: keep only the first occurrence for each day
-    menu = {}
-    for day, items in menu_raw.items():
-        if day not in menu:
-            menu[day] = items
-    return menu
+            admit_lookup(lookup, get_session_id())
+        except RateLimited as e:
+            st.error(f"Too many attempts. Please try again in {e.retry_after:.0f} seconds.")
+            return
+        with span('customer_lookup'):
+            customer = get_store().verify_customer(lookup, confirmation)
+        if customer is None:
+            # The same answer whether or not the number has ordered before
+            st.caption("We couldn't match that number and confirmation ID; please fill in the form below.")
+            return
+        st.session_state['verified_contact'] = customer.contact
+    prefill_customer(customer, customer.contact)
+    st.success(f"Welcome back, {customer.name}! We've filled in your details below.")
+    st.button("🔁 Repeat last week's order", on_click=repeat_last_order, args=(customer,),
+              help="Selects the same days and quantities for the coming week, at today's prices")
+    message = st.session_state.get('reorder_message')
+    if message:
+        st.warning(message)
 
-def main():
 
-    st.markdown("### 🍱 Place Your Tiffin Order")
-    st.markdown("Healthy Food Bank's (HFB) Vishmukt Tiffin Service - Head Chef- Dr. Pratibha Kolte Tai | Communication - Shubham Shelke (8484846121)")
-    st.markdown("Fill out the form below to place your tiffin order for the week.")
-
-    st.markdown("### Select Dates for Tiffin Service *")
-    st.markdown("Choose the dates you want tiffin service. You can select multiple dates.")
-    week_dates = get_week_dates()
-    date_options = [f"{d['date']} ({d['day']})" for d in week_dates]
-    date_map = {f"{d['date']} ({d['day']})": d for d in week_dates}
-    selected_date_labels = st.multiselect(
-        'Select Dates',
-        options=date_options,
-    )
-    selected_days = [date_map[label] for label in selected_date_labels]
-
-    menu = load_menu()
-
-    per_date_tiffin = {}
-
-    if selected_days:
-        st.markdown("### Tiffin Preferences for Each Date")
-        for date_info in selected_days:
-            with st.expander(f"📅 {date_info['date']} ({date_info['day']})", expanded=False):
-                day_menu = menu.get(date_info['day'], None)
-                
-                if day_menu:
-                    # Create tabs for Lunch and Dinner
-                    lunch_tab, dinner_tab = st.tabs(["🍽️ Lunch", "🌙 Dinner"])
-                    
-                    # Lunch Tab
-                    with lunch_tab:
-                        st.markdown("**Lunch Options:**")
-                        # 2x2 grid for tiffin menus and inputs
-                        grid_cols = st.columns(2)
-                        # First row: menus
-                        with grid_cols[0]:
-                            if 'full_tiffin' in day_menu:
-                                st.markdown(f"<b>Full Tiffin (₹{day_menu['full_tiffin']['cost']}):</b>", unsafe_allow_html=True)
-                                st.markdown("\n".join([f"- {item}" for item in day_menu['full_tiffin']['items']]))
-                        with grid_cols[1]:
-                            if 'half_tiffin' in day_menu:
-                                st.markdown(f"<b>Half Tiffin (₹{day_menu['half_tiffin']['cost']}):</b>", unsafe_allow_html=True)
-                                st.markdown("\n".join([f"- {item}" for item in day_menu['half_tiffin']['items']]))
-                        
-                        # Second row: number inputs
-                        grid_cols2 = st.columns(2)
-                        with grid_cols2[0]:
-                            if 'full_tiffin' in day_menu:
-                                lunch_full_tiffin_count = st.number_input(
-                                    f"Number of Full Tiffins for Lunch",
-                                    min_value=0, max_value=20, step=1,
-                                    key=f"lunch_full_tiffins_{date_info['full_date']}"
-                                )
-                            else:
-                                lunch_full_tiffin_count = 0
-                        with grid_cols2[1]:
-                            if 'half_tiffin' in day_menu:
-                                lunch_half_tiffin_count = st.number_input(
-                                    f"Number of Half Tiffins for Lunch",
-                                    min_value=0, max_value=20, step=1,
-                                    key=f"lunch_half_tiffins_{date_info['full_date']}"
-                                )
-                            else:
-                                lunch_half_tiffin_count = 0
-                        
-                        # Extra items for lunch
-                        extra_items = menu.get('extra_items', {})
-                        if extra_items:
-                            st.markdown("**Extra Items for Lunch:**")
-                            extra_item_counts_lunch = {}
-                            extra_item_list = []
-                            for item, details in extra_items.items():
-                                # Only show item if 'days' is not present or if this day is in 'days'
-                                if not details.get('days') or date_info['day'] in details['days']:
-                                    extra_item_list.append((item, details))
-                            n_cols = 3
-                            n_rows = 2
-                            for row in range(n_rows):
-                                cols = st.columns(n_cols)
-                                for col_idx in range(n_cols):
-                                    item_idx = row * n_cols + col_idx
-                                    if item_idx < len(extra_item_list):
-                                        item, details = extra_item_list[item_idx]
-                                        with cols[col_idx]:
-                                            qty = st.number_input(
-                                                f"{item} (₹{details['cost']} each)",
-                                                min_value=0, max_value=20, step=1,
-                                                key=f"lunch_extra_{item}_{date_info['full_date']}"
-                                            )
-                                            extra_item_counts_lunch[item] = qty
-                        else:
-                            extra_item_counts_lunch = {}
-                    
-                    # Dinner Tab
-                    with dinner_tab:
-                        st.markdown("**Dinner Options:**")
-                        # 2x2 grid for tiffin menus and inputs
-                        grid_cols = st.columns(2)
-                        # First row: menus
-                        with grid_cols[0]:
-                            if 'full_tiffin' in day_menu:
-                                st.markdown(f"<b>Full Tiffin (₹{day_menu['full_tiffin']['cost']}):</b>", unsafe_allow_html=True)
-                                st.markdown("\n".join([f"- {item}" for item in day_menu['full_tiffin']['items']]))
-                        with grid_cols[1]:
-                            if 'half_tiffin' in day_menu:
-                                st.markdown(f"<b>Half Tiffin (₹{day_menu['half_tiffin']['cost']}):</b>", unsafe_allow_html=True)
-                                st.markdown("\n".join([f"- {item}" for item in day_menu['half_tiffin']['items']]))
-                        
-                        # Second row: number inputs
-                        grid_cols2 = st.columns(2)
-                        with grid_cols2[0]:
-                            if 'full_tiffin' in day_menu:
-                                dinner_full_tiffin_count = st.number_input(
-                                    f"Number of Full Tiffins for Dinner",
-                                    min_value=0, max_value=20, step=1,
-                                    key=f"dinner_full_tiffins_{date_info['full_date']}"
-                                )
-                            else:
-                                dinner_full_tiffin_count = 0
-                        with grid_cols2[1]:
-                            if 'half_tiffin' in day_menu:
-                                dinner_half_tiffin_count = st.number_input(
-                                    f"Number of Half Tiffins for Dinner",
-                                    min_value=0, max_value=20, step=1,
-                                    key=f"dinner_half_tiffins_{date_info['full_date']}"
-                                )
-                            else:
-                                dinner_half_tiffin_count = 0
-                        
-                        # Extra items for dinner
-                        if extra_items:
-                            st.markdown("**Extra Items for Dinner:**")
-                            extra_item_counts_dinner = {}
-                            extra_item_list = []
-                            for item, details in extra_items.items():
-                                # Only show item if 'days' is not present or if this day is in 'days'
-                                if not details.get('days') or date_info['day'] in details['days']:
-                                    extra_item_list.append((item, details))
-                            n_cols = 3
-                            n_rows = 2
-                            for row in range(n_rows):
-                                cols = st.columns(n_cols)
-                                for col_idx in range(n_cols):
-                                    item_idx = row * n_cols + col_idx
-                                    if item_idx < len(extra_item_list):
-                                        item, details = extra_item_list[item_idx]
-                                        with cols[col_idx]:
-                                            qty = st.number_input(
-                                                f"{item} (₹{details['cost']} each)",
-                                                min_value=0, max_value=20, step=1,
-                                                key=f"dinner_extra_{item}_{date_info['full_date']}"
-                                            )
-                                            extra_item_counts_dinner[item] = qty
-                        else:
-                            extra_item_counts_dinner = {}
-                    
-                    # Store data for both lunch and dinner
-                    per_date_tiffin[date_info['full_date']] = {
-                        'lunch': {
-                            'half_tiffin_count': lunch_half_tiffin_count if 'half_tiffin' in day_menu else 0,
-                            'full_tiffin_count': lunch_full_tiffin_count if 'full_tiffin' in day_menu else 0,
-                            'extra_items': extra_item_counts_lunch
-                        },
-                        'dinner': {
-                            'half_tiffin_count': dinner_half_tiffin_count if 'half_tiffin' in day_menu else 0,
-                            'full_tiffin_count': dinner_full_tiffin_count if 'full_tiffin' in day_menu else 0,
-                            'extra_items': extra_item_counts_dinner
-                        }
-                    }
-                else:
-                    st.markdown(":grey_question: Menu not available for this day.")
-        
-        
+def get_session_id():
+    """Random ID for this browser session, used as its rate-limit key"""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = secrets.token_hex(8)
+    return st.session_state['session_id']
 
-    with st.form('tiffin_form'):
-        # Per-date tiffin options
-        full_price = 120
-        half_price = 70
-        
 
-        # Calculate live total price and create detailed summary
-        total_tiffin_price = 0
-        tiffin_details = []
-        order_summary = []
-        
-        if selected_days:
-            for date_info in selected_days:
-                pd = per_date_tiffin.get(date_info['full_date'], {})
-                
-                # Lunch calculations
-                lunch_data = pd.get('lunch', {})
-                lunch_half_tiffin_count = lunch_data.get('half_tiffin_count', 0)
-                lunch_full_tiffin_count = lunch_data.get('full_tiffin_count', 0)
-                lunch_extra_items = lunch_data.get('extra_items', {})
-                
-                # Dinner calculations
-                dinner_data = pd.get('dinner', {})
-                dinner_half_tiffin_count = dinner_data.get('half_tiffin_count', 0)
-                dinner_full_tiffin_count = dinner_data.get('full_tiffin_count', 0)
-                dinner_extra_items = dinner_data.get('extra_items', {})
-                
-                # Calculate tiffin price for lunch
-                lunch_half_price = lunch_half_tiffin_count * (menu.get(date_info['day'], {}).get('half_tiffin', {}).get('cost', 0))
-                lunch_full_price = lunch_full_tiffin_count * (menu.get(date_info['day'], {}).get('full_tiffin', {}).get('cost', 0))
-                total_tiffin_price += lunch_half_price + lunch_full_price
-                
-                # Calculate tiffin price for dinner
-                dinner_half_price = dinner_half_tiffin_count * (menu.get(date_info['day'], {}).get('half_tiffin', {}).get('cost', 0))
-                dinner_full_price = dinner_full_tiffin_count * (menu.get(date_info['day'], {}).get('full_tiffin', {}).get('cost', 0))
-                total_tiffin_price += dinner_half_price + dinner_full_price
-                
-                # Calculate extra items price for lunch
-                lunch_extras_price = 0
-                for item, qty in lunch_extra_items.items():
-                    item_cost = menu.get('extra_items', {}).get(item, {}).get('cost', 0)
-                    lunch_extras_price += qty * item_cost
-                    total_tiffin_price += qty * item_cost
-                
-                # Calculate extra items price for dinner
-                dinner_extras_price = 0
-                for item, qty in dinner_extra_items.items():
-                    item_cost = menu.get('extra_items', {}).get(item, {}).get('cost', 0)
-                    dinner_extras_price += qty * item_cost
-                    total_tiffin_price += qty * item_cost
-                
-                # Create detailed summary for order submission
-                lunch_summary = f"Lunch: {lunch_half_tiffin_count} half, {lunch_full_tiffin_count} full"
-                dinner_summary = f"Dinner: {dinner_half_tiffin_count} half, {dinner_full_tiffin_count} full"
-                
-                lunch_extras = ', '.join([f'{item} x{qty}' for item, qty in lunch_extra_items.items() if qty > 0])
-                dinner_extras = ', '.join([f'{item} x{qty}' for item, qty in dinner_extra_items.items() if qty > 0])
-                
-                if lunch_extras:
-                    lunch_summary += f", Extras: {lunch_extras}"
-                if dinner_extras:
-                    dinner_summary += f", Extras: {dinner_extras}"
-                
-                tiffin_details.append(
-                    f"{date_info['date']} ({date_info['day']}): {lunch_summary}; {dinner_summary}"
+def show_running_total(placeholder, priced):
+    placeholder.info(f"🧾 **Running total: ₹{priced.total}**")
+
+
+@st.fragment
+@timed('render_meal_panel')
+def render_meal_panel(date_info, meal, running_total):
+    """
+    Menu, tiffin counts and extra items for one date and meal.
+
+    Runs as a fragment: changing a quantity reruns only this panel, which
+    records its counts in the session's OrderState and refreshes the
+    running total, instead of re-rendering every date on the page.
+    """
+    menu = get_menu()
+    day_menu = menu.day(date_info['day'])
+    day_view = get_week_view().day_view(date_info['day'])
+    if day_menu is None or day_view is None:
+        return
+    meal_label = MEAL_LABELS[meal]
+    full_date = date_info['full_date']
+
+    st.markdown(f"**{meal_label} Options:**")
+    # 2x2 grid for tiffin menus and inputs
+    grid_cols = st.columns(2)
+    # First row: menus
+    for col, size in zip(grid_cols, ('full_tiffin', 'half_tiffin')):
+        with col:
+            if size in day_view.tiffin_headings:
+                st.markdown(day_view.tiffin_headings[size], unsafe_allow_html=True)
+                st.markdown(day_view.tiffin_items[size])
+
+    # Second row: number inputs
+    counts = {}
+    grid_cols2 = st.columns(2)
+    for col, size in zip(grid_cols2, ('full_tiffin', 'half_tiffin')):
+        with col:
+            if size in day_menu.tiffins:
+                counts[size] = st.number_input(
+                    f"Number of {TIFFIN_LABELS[size]}s for {meal_label}",
+                    min_value=0, max_value=20, step=1,
+                    key=quantity_key(meal, size, full_date)
                 )
-                
-                # Create detailed order summary for display
-                day_total = lunch_half_price + lunch_full_price + dinner_half_price + dinner_full_price + lunch_extras_price + dinner_extras_price
-                if day_total > 0:
-                    order_summary.append({
-                        'date': f"{date_info['date']} ({date_info['day']})",
-                        'lunch': {
-                            'half': lunch_half_tiffin_count,
-                            'full': lunch_full_tiffin_count,
-                            'extras': lunch_extra_items,
-                            'price': lunch_half_price + lunch_full_price + lunch_extras_price
-                        },
-                        'dinner': {
-                            'half': dinner_half_tiffin_count,
-                            'full': dinner_full_tiffin_count,
-                            'extras': dinner_extra_items,
-                            'price': dinner_half_price + dinner_full_price + dinner_extras_price
-                        },
-                        'day_total': day_total
-                    })
-
-        # Display Order Summary
-        if order_summary:
-            st.markdown("### 📋 Order Summary")
-            st.markdown("Here's a breakdown of your selections:")
-            
-            for day_order in order_summary:
-                with st.expander(f"📅 {day_order['date']} - ₹{day_order['day_total']}", expanded=False):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.markdown("**🍽️ Lunch**")
-                        lunch = day_order['lunch']
-                        if lunch['half'] > 0 or lunch['full'] > 0:
-                            if lunch['half'] > 0:
-                                st.markdown(f"• Half Tiffin: {lunch['half']} × ₹{menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('half_tiffin', {}).get('cost', 0)} = ₹{lunch['half'] * menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('half_tiffin', {}).get('cost', 0)}")
-                            if lunch['full'] > 0:
-                                st.markdown(f"• Full Tiffin: {lunch['full']} × ₹{menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('full_tiffin', {}).get('cost', 0)} = ₹{lunch['full'] * menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('full_tiffin', {}).get('cost', 0)}")
-                        else:
-                            st.markdown("• No lunch ordered")
-                        
-                        # Show lunch extras
-                        lunch_extras_list = [f"{item} × {qty} × ₹{menu.get('extra_items', {}).get(item, {}).get('cost', 0)} = ₹{qty * menu.get('extra_items', {}).get(item, {}).get('cost', 0)}" 
-                                           for item, qty in lunch['extras'].items() if qty > 0]
-                        if lunch_extras_list:
-                            st.markdown("**Extra Items:**")
-                            for extra in lunch_extras_list:
-                                st.markdown(f"• {extra}")
-                        
-                        if lunch['price'] > 0:
-                            st.markdown(f"**Lunch Total: ₹{lunch['price']}**")
-                    
-                    with col2:
-                        st.markdown("**🌙 Dinner**")
-                        dinner = day_order['dinner']
-                        if dinner['half'] > 0 or dinner['full'] > 0:
-                            if dinner['half'] > 0:
-                                st.markdown(f"• Half Tiffin: {dinner['half']} × ₹{menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('half_tiffin', {}).get('cost', 0)} = ₹{dinner['half'] * menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('half_tiffin', {}).get('cost', 0)}")
-                            if dinner['full'] > 0:
-                                st.markdown(f"• Full Tiffin: {dinner['full']} × ₹{menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('full_tiffin', {}).get('cost', 0)} = ₹{dinner['full'] * menu.get(day_order['date'].split(' (')[1].rstrip(')'), {}).get('full_tiffin', {}).get('cost', 0)}")
+
+    # Extra items available this day
+    extra_labels = day_view.extra_labels
+    if extra_labels:
+        st.markdown(f"**Extra Items for {meal_label}:**")
+        n_cols = 3
+        for row_start in range(0, len(extra_labels), n_cols):
+            cols = st.columns(n_cols)
+            for col, (item, label) in zip(cols, extra_labels[row_start:row_start + n_cols]):
+                with col:
+                    counts[item] = st.number_input(
+                        label,
+                        min_value=0, max_value=20, step=1,
+                        key=quantity_key(meal, item, full_date)
+                    )
+
+    order_state = get_order_state()
+    order_state.set_meal(full_date, meal, counts)
+
+    # Read on every panel rerun, so the count reflects orders placed meanwhile
+    tiffins_left = get_store().remaining(full_date, meal)
+    tiffins_wanted = sum(counts.get(size, 0) for size in TIFFIN_LABELS)
+    if tiffins_left == 0:
+        st.warning(f"{meal_label} is fully booked for this day.")
+    elif tiffins_wanted > tiffins_left:
+        st.warning(f"Only {tiffins_left} tiffins left for {meal_label} on this day.")
+    else:
+        st.caption(f"{tiffins_left} tiffins left for {meal_label}.")
+
+    meal_total = sum(qty * day_menu.prices[menu.sku_index[sku]] for sku, qty in counts.items())
+    if meal_total > 0:
+        st.markdown(f"**{meal_label} Total: ₹{meal_total}**")
+
+    # On a full rerun main() prices the order once after all panels ran
+    if not st.session_state.get('_in_full_run'):
+        show_running_total(running_total, order_state.price(menu))
+
+
+@timed('render_page')
+def main():
+    start_warmup()
+    get_store().start()
+    start_subscription_scheduler()
+    start_metrics_exporter()
+    st.session_state['_in_full_run'] = True
+    try:
+        st.markdown("### 🍱 Place Your Tiffin Order")
+        st.markdown("Healthy Food Bank's (HFB) Vishmukt Tiffin Service - Head Chef- Dr. Pratibha Kolte Tai | Communication - Shubham Shelke (8484846121)")
+        st.markdown("Fill out the form below to place your tiffin order for the coming weeks.")
+
+        render_customer_lookup()
+
+        st.markdown("### Select Dates for Tiffin Service *")
+        st.markdown("Choose the dates you want tiffin service. You can select multiple dates, "
+                    f"up to {ADVANCE_WEEKS} weeks ahead.")
+        week_view = get_week_view()
+        selected_date_labels = st.multiselect(
+            'Select Dates',
+            options=week_view.date_options,
+            key='selected_dates',
+        )
+        selected_days = [week_view.date_map[label] for label in selected_date_labels if label in week_view.date_map]
+
+        with span('menu_load'):
+            menu = get_menu()
+
+        order_state = get_order_state()
+        order_state.select_days(selected_days)
+
+        with span('render_date_panels'):
+            if selected_days:
+                st.markdown("### Tiffin Preferences for Each Date")
+                running_total = st.empty()
+                for date_info in selected_days:
+                    with st.expander(f"📅 {date_info['date']} ({date_info['day']})", expanded=False):
+                        if menu.day(date_info['day']):
+                            # Create tabs for Lunch and Dinner
+                            lunch_tab, dinner_tab = st.tabs(["🍽️ Lunch", "🌙 Dinner"])
+                            with lunch_tab:
+                                render_meal_panel(date_info, 'lunch', running_total)
+                            with dinner_tab:
+                                render_meal_panel(date_info, 'dinner', running_total)
                         else:
-                            st.markdown("• No dinner ordered")
-                        
-                        # Show dinner extras
-                        dinner_extras_list = [f"{item} × {qty} × ₹{menu.get('extra_items', {}).get(item, {}).get('cost', 0)} = ₹{qty * menu.get('extra_items', {}).get(item, {}).get('cost', 0)}" 
-                                            for item, qty in dinner['extras'].items() if qty > 0]
-                        if dinner_extras_list:
-                            st.markdown("**Extra Items:**")
-                            for extra in dinner_extras_list:
-                                st.markdown(f"• {extra}")
-                        
-                        if dinner['price'] > 0:
-                            st.markdown(f"**Dinner Total: ₹{dinner['price']}**")
-                    
-                    st.markdown(f"**Day Total: ₹{day_order['day_total']}**")
-        else:
-            st.info("📋 **No orders selected yet.** Please select dates and choose your tiffin preferences above.")
-
-        st.info(f"**Total Price: ₹{total_tiffin_price}**")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            name = st.text_input('Full Name *', max_chars=100)
-            contact = st.text_input('Contact Number *', max_chars=20)
-            address = st.text_area('Delivery Address *', max_chars=300, 
-                                 help="Please provide complete address for delivery")
-        
-        with col2:
-            instructions = st.text_area('Special Instructions', max_chars=500,
-                                      help="Any special dietary requirements or delivery instructions")
+                            st.markdown(":grey_question: Menu not available for this day.")
 
+        # Price the whole week once; the summary, minimum-order check and
+        # stored total all come from this
+        priced = order_state.price(menu)
+        total_tiffin_price = priced.total
+        if selected_days:
+            show_running_total(running_total, priced)
+    finally:
+        # Cleared even if the run stops early, or the panels' own reruns
+        # would never show the running total again
+        st.session_state['_in_full_run'] = False
 
-        uploaded_file = st.file_uploader("Upload a screenshot", type=["png", "jpg", "jpeg"])
+    # Every form instance carries its own order ID, so a repeated click
+    # on "Submit Order" is recognised as the same order
+    if 'form_order_id' not in st.session_state:
+        st.session_state['form_order_id'] = new_order_id()
+    form_order_id = st.session_state['form_order_id']
 
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Screenshot", use_container_width=True)
+    with span('render_order_form'):
+        with st.form('tiffin_form'):
+            # Display Order Summary
+            if priced.total > 0:
+                st.markdown("### 📋 Order Summary")
+                st.markdown("Here's a breakdown of your selections:")
+                st.caption("The running total above updates as you change quantities; "
+                           "this breakdown refreshes when you change dates or submit.")
 
-        st.markdown("---")
-        st.markdown("* Required fields")
+                for date_index, date_info in enumerate(priced.dates):
+                    day_total = priced.day_total(date_index)
+                    if day_total <= 0:
+                        continue
+                    with st.expander(f"📅 {date_info['date']} ({date_info['day']}) - ₹{day_total}", expanded=False):
+                        for col, meal, heading in zip(st.columns(2), MEALS, ("**🍽️ Lunch**", "**🌙 Dinner**")):
+                            with col:
+                                st.markdown(heading)
+                                lines = list(priced.line_items(date_index, meal))
+                                tiffins = [line for line in lines if line['sku'] in TIFFIN_LABELS]
+                                extras = [line for line in lines if line['sku'] not in TIFFIN_LABELS]
+                                if tiffins:
+                                    # Half before full, as on the order form
+                                    for line in sorted(tiffins, key=lambda line: line['sku'] != 'half_tiffin'):
+                                        st.markdown(f"• {line['label']}: {line['qty']} × ₹{line['unit_price']} = ₹{line['total']}")
+                                else:
+                                    st.markdown(f"• No {meal} ordered")
 
-        submitted = st.form_submit_button('Submit Order')
+                                if extras:
+                                    st.markdown("**Extra Items:**")
+                                    for line in extras:
+                                        st.markdown(f"• {line['label']} × {line['qty']} × ₹{line['unit_price']} = ₹{line['total']}")
 
-    if submitted:
-        missing_fields = []
-        if not name:
-            missing_fields.append("Name")
-        if not contact:
-            missing_fields.append("Contact Number")
-        if not address:
-            missing_fields.append("Address")
-        if not selected_days:
-            missing_fields.append("Dates")
-        for date_info in selected_days:
-            pd = per_date_tiffin.get(date_info['full_date'], {})
+                                meal_total = priced.meal_total(date_index, meal)
+                                if meal_total > 0:
+                                    st.markdown(f"**{MEAL_LABELS[meal]} Total: ₹{meal_total}**")
+
+                        st.markdown(f"**Day Total: ₹{day_total}**")
+            else:
+                st.info("📋 **No orders selected yet.** Please select dates and choose your tiffin preferences above.")
+
+            st.info(f"**Total Price: ₹{total_tiffin_price}**")
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                name = st.text_input('Full Name *', max_chars=100, key='form_name')
+                contact = st.text_input('Contact Number *', max_chars=20, key='form_contact')
+                address = st.text_area('Delivery Address *', max_chars=300, key='form_address',
+                                     help="Please provide complete address for delivery")
         
-        # Check minimum order value
-        if total_tiffin_price < 100:
-            st.error(f'❌ **Minimum order value is ₹100.** Your current total is ₹{total_tiffin_price}. Please add more items to your order.')
-        elif missing_fields:
-            st.error(f'Please fill all required fields marked with *: {", ".join(missing_fields)}')
-        else:
-            # Prepare data
-            data = {
-                'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'Name': name,
-                'Contact Number': contact,
-                'Address': address,
-                'Tiffin Details': '; '.join(tiffin_details),
-                'Special Instructions': instructions,
-                'Total Price': total_tiffin_price
-            }
-
-            # Show loading spinner while submitting
-            with st.spinner("🔄 Submitting your order to the kitchen..."):
-                if append_to_gsheet_gspread(data):
-                    st.success("✅ Order submitted successfully! Your tiffin order has been sent to the kitchen.")
+            with col2:
+                instructions = st.text_area('Special Instructions', max_chars=500, key='form_instructions',
+                                          help="Any special dietary requirements or delivery instructions")
+
+
+            repeat_weekly = st.checkbox(
+                '🔁 Repeat this order every week',
+                help="We'll place the same order for you each week at the current menu prices, "
+                     "skipping items not served that day. You can cancel any time."
+            )
+
+            uploaded_file = st.file_uploader("Upload a screenshot", type=["png", "jpg", "jpeg"])
+
+            screenshot_ref = None
+            if uploaded_file is not None:
+                screenshot_ref = get_screenshot_ref(uploaded_file)
+                if screenshot_ref:
+                    st.image(thumbnail(screenshot_ref), caption="Uploaded Screenshot")
                 else:
+                    st.error("❌ Could not read the screenshot. Please upload a PNG or JPEG image.")
+
+            st.markdown("---")
+            st.markdown("* Required fields")
+
+            submitted = st.form_submit_button('Submit Order')
+
+    if submitted:
+        with span('submit'):
+            # Rejections below stop before anything is fingerprinted, stored or queued
+            errors = validate_order(name, contact, address, priced,
+                                    {d['full_date'] for d in week_view.dates})
+            order = fingerprint = duplicate = None
+            if not errors:
+                order = Order.from_priced(
+                    priced, name, normalize_contact(contact), address, instructions,
+                    payment_screenshot=screenshot_ref,
+                    order_id=form_order_id
+                )
+                fingerprint = order_fingerprint(order.contact, priced)
+                # A repeated submit gets its original confirmation without
+                # spending a rate-limit token
+                duplicate = get_store().find_duplicate(order.order_id, fingerprint)
+                if duplicate:
+                    REGISTRY.inc('orders_deduplicated')
+            try:
+                if not errors and not duplicate:
+                    admit(contact, get_session_id())
+            except RateLimited as e:
+                errors = [f"You're submitting orders too quickly. Please try again in {e.retry_after:.0f} seconds."]
+            if errors:
+                for error in errors:
+                    st.error(f"❌ {error}")
+            else:
+                # Stored by the configured backend; the sheet, if mirrored, is
+                # written in the background
+                try:
+                    if duplicate:
+                        order_id, created = duplicate, False
+                    else:
+                        order_id, created = get_store().submit(order, fingerprint)
+                except CapacityError as e:
+                    day = next(d for d in priced.dates if d['full_date'] == e.date)
+                    left = "fully booked" if e.remaining == 0 else f"down to {e.remaining} tiffins"
+                    st.error(f"❌ **{MEAL_LABELS[e.meal]} on {day['date']} ({day['day']}) is {left}.** "
+                             "Please reduce the quantity or choose another date.")
+                except Exception as e:
+                    log.exception(f"Error storing order: {e}")
                     st.error("❌ Failed to submit order. Please try again or contact support if the problem persists.")
+                else:
+                    if created:
+                        st.success(f"✅ Order submitted successfully! Your confirmation ID is **{order_id}**. "
+                                   "Your tiffin order has been sent to the kitchen.")
+                    else:
+                        st.success(f"✅ We already received this order. Your confirmation ID is **{order_id}**.")
+                    if repeat_weekly:
+                        last_date = max(d['full_date'] for d in priced.dates)
+                        # Only a customer who looked themselves up with a
+                        # confirmation ID may change an existing subscription
+                        verified = st.session_state.get('verified_contact')
+                        saved = save_subscription(contact, name, address, instructions,
+                                                  template_from_priced(priced), last_date=last_date,
+                                                  replace=bool(verified) and verified == contact_key(contact))
+                        if saved:
+                            st.info("🔁 This order will repeat every week after the last date you picked. "
+                                    "Manage it on the Subscription page.")
+                        else:
+                            st.warning("This number already has a weekly subscription, so it wasn't changed. "
+                                       "To replace it, find your details under *Ordered Before?* with a "
+                                       "confirmation ID first.")
+                    # A new order from this session gets a new ID; resubmitting
+                    # the same one is still caught by its fingerprint
+                    st.session_state['form_order_id'] = new_order_id()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from db import connect, register_schema, transaction
+from menu import get_menu
+from metrics import REGISTRY, span
+from orders import Order
+from customers import contact_key
+from pricing import price_order, template_quantities
+from storage import get_store
+from week_calendar import get_week_dates, next_rollover, week_start
+
+
+log = logging.getLogger(__name__)
+
+
+# How often the scheduler checks for subscriptions due, at most; it also
+# wakes at each weekly rollover
+POLL_INTERVAL_SECONDS = 15 * 60
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS subscriptions (
+    contact TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    instructions TEXT NOT NULL DEFAULT '',
+    template TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    last_week TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_due ON subscriptions (active, last_week);
+""")
+
+
+def template_from_priced(priced):
+    """
+    Weekly template from a priced order: weekday -> meal -> sku -> quantity.
+
+    If the order covers the same weekday more than once (several weeks
+    ahead), the last of those dates is used.
+    """
+    template = {}
+    for date_index, date_info in enumerate(priced.dates):
+        day = {}
+        for line in priced.line_items(date_index):
+            day.setdefault(line['meal'], {})[line['sku']] = line['qty']
+        if day:
+            template[date_info['day']] = day
+    return template
+
+
+def save_subscription(contact, name, address, instructions, template, last_date=None, today=None,
+                      replace=False):
+    """
+    Create the subscription for a contact number, or replace theirs.
+
+    Orders are generated from the week after the later of the current
+    ordering week and the week of last_date, so the order just placed
+    through the form (which may cover several weeks) isn't duplicated.
+
+    Args:
+        last_date (str): Latest delivery date of that order, 'YYYY-MM-DD'
+        replace (bool): Overwrite (or restart, if cancelled) an existing
+            subscription; only for a customer who has proved the number is theirs
+
+    Returns:
+        bool: False if the number already has a subscription and replace
+        wasn't given (nothing is changed)
+    """
+    now = datetime.now().isoformat(timespec='seconds')
+    current_week = week_start(today).strftime('%Y-%m-%d')
+    if last_date:
+        last_day = datetime.strptime(last_date, '%Y-%m-%d')
+        current_week = max(current_week, (last_day - timedelta(days=last_day.weekday())).strftime('%Y-%m-%d'))
+    on_conflict = (
+        "UPDATE SET name = excluded.name, address = excluded.address, "
+        "instructions = excluded.instructions, template = excluded.template, active = 1, "
+        "updated_at = excluded.updated_at, last_week = MAX(last_week, excluded.last_week)"
+    ) if replace else "NOTHING"
+    cursor = connect().execute(
+        "INSERT INTO subscriptions (contact, name, address, instructions, template, active, "
+        f"created_at, updated_at, last_week) VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?) ON CONFLICT (contact) DO {on_conflict}",
+        (contact_key(contact), name, address, instructions or '', json.dumps(template),
+         now, now, current_week)
+    )
+    return cursor.rowcount > 0
+
+
+def get_subscription(contact):
+    """The active subscription for a contact number as a dict, or None"""
+    row = connect().execute(
+        "SELECT * FROM subscriptions WHERE contact = ? AND active = 1", (contact_key(contact),)
+    ).fetchone()
+    if row is None:
+        return None
+    subscription = dict(row)
+    subscription['template'] = json.loads(subscription['template'])
+    return subscription
+
+
+def cancel_subscription(contact):
+    """Stop generating orders for a contact number; returns False if none was active"""
+    cursor = connect().execute(
+        "UPDATE subscriptions SET active = 0, updated_at = ? WHERE contact = ? AND active = 1",
+        (datetime.now().isoformat(timespec='seconds'), contact_key(contact))
+    )
+    return cursor.rowcount > 0
+
+
+def subscription_order_id(contact, week):
+    """
+    Deterministic confirmation ID for a subscription's order in a week, so
+    a second scheduler run (or another worker process) can't create it twice.
+    """
+    digest = hashlib.sha256(f"{contact}|{week}".encode()).hexdigest()[:6].upper()
+    return f"HFB-{datetime.strptime(week, '%Y-%m-%d'):%y%m%d}-{digest}"
+
+
+def build_orders(week, subscriptions, menu=None):
+    """
+    Priced orders for one week from subscription rows, at current menu
+    prices and availability.
+
+    Returns:
+        list: Orders; subscriptions with nothing orderable (or below the
+            minimum order value) that week are left out
+    """
+    menu = menu or get_menu()
+    dates = get_week_dates(datetime.strptime(week, '%Y-%m-%d'))
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    orders = []
+    for subscription in subscriptions:
+        template = json.loads(subscription['template'])
+        priced = price_order(menu, dates, template_quantities(menu, dates, template))
+        if not priced.meets_minimum():
+            log.info(f"Subscription {subscription['contact']} has nothing to order for {week}")
+            REGISTRY.inc('subscriptions_skipped')
+            continue
+        orders.append(Order.from_priced(
+            priced, subscription['name'], subscription['contact'], subscription['address'],
+            subscription['instructions'],
+            order_id=subscription_order_id(subscription['contact'], week),
+            created_at=created_at
+        ))
+    return orders
+
+
+def materialize_week(today=None):
+    """
+    Generate the current ordering week's orders for every subscription that
+    doesn't have one yet, storing them all in one bulk write.
+
+    Returns:
+        int: Number of orders created
+    """
+    week = week_start(today).strftime('%Y-%m-%d')
+    with span('subscriptions_materialize'):
+        subscriptions = connect().execute(
+            "SELECT * FROM subscriptions WHERE active = 1 AND last_week < ?", (week,)
+        ).fetchall()
+        if not subscriptions:
+            return 0
+        created, rejected = get_store().store_many(build_orders(week, subscriptions))
+        for order_id, error in rejected.items():
+            log.warning(f"Subscription order {order_id} skipped: {error}")
+        REGISTRY.inc('subscriptions_skipped', len(rejected))
+        # Every subscription looked at is done for this week, whether or not
+        # it produced an order
+        with transaction() as conn:
+            conn.executemany(
+                "UPDATE subscriptions SET last_week = ? WHERE contact = ? AND last_week < ?",
+                [(week, row['contact'], week) for row in subscriptions]
+            )
+    log.info(f"Generated {len(created)} subscription orders for the week of {week}")
+    REGISTRY.inc('subscription_orders', len(created))
+    return len(created)
+
+
+class SubscriptionScheduler(threading.Thread):
+    """Background thread that generates subscription orders each week"""
+
+    def __init__(self, poll_interval=POLL_INTERVAL_SECONDS):
+        super().__init__(name="subscription-scheduler", daemon=True)
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                materialize_week()
+            except Exception as e:
+                log.exception(f"Error generating subscription orders: {e}")
+            # Wake just after the rollover, or at the next poll if that's sooner
+            until_rollover = (next_rollover() - datetime.now()).total_seconds() + 1
+            self.stopped.wait(max(1, min(self.poll_interval, until_rollover)))
+
+    def stop(self):
+        self.stopped.set()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_subscription_scheduler():
+    """Start the process-wide SubscriptionScheduler if it isn't running yet"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = SubscriptionScheduler()
+            _scheduler.start()
+        return _scheduler
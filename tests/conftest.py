@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Keep the app's local state out of the working tree; set before any app
+# module is imported, since db.py reads it at import time
+os.environ['TIFFIN_DATA_DIR'] = tempfile.mkdtemp(prefix='tiffin-tests-')
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def menu():
+    from menu import get_menu
+    return get_menu(os.path.join(ROOT, 'day-menu.yaml'))
+
+
+@pytest.fixture
+def dates():
+    """date_info dicts for Monday 6 to Saturday 11 January 2025"""
+    days = [datetime(2025, 1, 6) + timedelta(days=i) for i in range(6)]
+    return [{'date': day.strftime('%d %b'), 'day': day.strftime('%A'), 'full_date': day.strftime('%Y-%m-%d')}
+            for day in days]
+
+
+@pytest.fixture
+def store():
+    """A MemoryOrderStore with room for 2 tiffins per meal, installed as the process-wide store"""
+    from storage import MemoryOrderStore, get_store, use_store
+    previous = get_store()
+    store = MemoryOrderStore(capacity=2)
+    use_store(store)
+    yield store
+    use_store(previous)
+
+
+@pytest.fixture
+def place_order(menu, dates):
+    """Build an Order from {full_date: {meal: {sku: qty}}} for a customer"""
+    from orders import Order
+    from pricing import price_order
+
+    def place(per_date_tiffin, contact='9876543210', order_id=None):
+        priced = price_order(menu, dates, per_date_tiffin)
+        return Order.from_priced(priced, 'Asha', contact, '12 MG Road, Pune 411001', order_id=order_id)
+    return place
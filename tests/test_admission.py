@@ -0,0 +1,131 @@
+import itertools
+import threading
+
+import pytest
+
+import admission
+from admission import (CONTACT_BURST, LOOKUP_BURST, SESSION_BURST, STAFF_SESSION_BURST, RateLimited,
+                       RateLimiter, admit, admit_lookup, admit_staff_attempt, contact_limiter, staff_limiter,
+                       validate_order)
+from pricing import MINIMUM_ORDER_VALUE, price_order
+
+MONDAY = '2025-01-06'
+
+# admit() shares its limiters across the process, so each test uses new keys
+_numbers = itertools.count(9000000000)
+
+
+def new_contact():
+    return str(next(_numbers))
+
+
+def test_bucket_refills():
+    limiter = RateLimiter('test', burst=2, refill_seconds=10)
+    limiter.take('a', now=100.0)
+    limiter.take('a', now=100.0)
+    with pytest.raises(RateLimited) as excinfo:
+        limiter.take('a', now=105.0)
+    assert excinfo.value.retry_after == pytest.approx(5.0)
+    # Other keys have their own bucket
+    limiter.take('b', now=105.0)
+    limiter.take('a', now=110.0)
+    assert limiter.retry_after('a', now=110.0) == pytest.approx(10.0)
+
+
+def test_contact_limit_across_sessions():
+    contact = new_contact()
+    for n in range(CONTACT_BURST):
+        admit(contact, f"session-{contact}-{n}")
+    with pytest.raises(RateLimited) as excinfo:
+        admit(contact, f"session-{contact}-new")
+    assert excinfo.value.scope == 'contact'
+
+
+def test_session_limit_spares_contact_tokens():
+    session = f"session-{new_contact()}"
+    for _ in range(SESSION_BURST):
+        admit(new_contact(), session)
+    contact = new_contact()
+    with pytest.raises(RateLimited) as excinfo:
+        admit(contact, session)
+    assert excinfo.value.scope == 'session'
+    assert contact_limiter.retry_after(contact) == 0
+
+
+def test_limited_contact_spares_session_tokens():
+    contact = new_contact()
+    for n in range(CONTACT_BURST):
+        admit(contact, f"session-{contact}-{n}")
+    session = f"session-{new_contact()}"
+    for _ in range(SESSION_BURST + 1):
+        with pytest.raises(RateLimited) as excinfo:
+            admit(contact, session)
+        assert excinfo.value.scope == 'contact'
+    admit(new_contact(), session)
+
+
+def test_last_token_goes_to_one_caller():
+    buckets = ((RateLimiter('test_session', 1, 60), 'session'), (RateLimiter('test_contact', 1, 60), 'contact'))
+    admitted = []
+    start = threading.Barrier(8)
+
+    def submit():
+        start.wait()
+        try:
+            admission._take_all(buckets)
+            admitted.append(True)
+        except RateLimited:
+            pass
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert admitted == [True]
+
+
+def test_lookup_limit_per_contact():
+    contact = new_contact()
+    for n in range(LOOKUP_BURST):
+        admit_lookup(contact, f"session-{contact}-{n}")
+    with pytest.raises(RateLimited) as excinfo:
+        admit_lookup(contact, f"session-{contact}-new")
+    assert excinfo.value.scope == 'lookup_contact'
+    # Lookups don't spend order tokens
+    admit(contact, f"session-{contact}-order")
+
+
+def test_staff_attempts_limited_per_session():
+    session = f"session-{new_contact()}"
+    for _ in range(STAFF_SESSION_BURST):
+        admit_staff_attempt(session)
+    with pytest.raises(RateLimited) as excinfo:
+        admit_staff_attempt(session)
+    assert excinfo.value.scope == 'staff_session'
+    # Other sessions can still sign in
+    admit_staff_attempt(f"session-{new_contact()}")
+
+
+def test_staff_attempts_capped_across_sessions(monkeypatch):
+    monkeypatch.setattr(staff_limiter, 'burst', 2)
+    monkeypatch.setattr(staff_limiter, '_buckets', {})
+    admit_staff_attempt(f"session-{new_contact()}")
+    admit_staff_attempt(f"session-{new_contact()}")
+    with pytest.raises(RateLimited) as excinfo:
+        admit_staff_attempt(f"session-{new_contact()}")
+    assert excinfo.value.scope == 'staff'
+
+
+def test_validate_order(menu, dates):
+    allowed = {d['full_date'] for d in dates}
+    priced = price_order(menu, dates, {MONDAY: {'lunch': {'half_tiffin': 1}}})
+    assert validate_order('Asha', '9876543210', '12 MG Road', priced, allowed) == []
+
+    assert validate_order('', '9876543210', '', priced, allowed) == [
+        'Please fill all required fields marked with *: Name, Address']
+    errors = validate_order('Asha', '12345', '12 MG Road', priced, allowed - {MONDAY})
+    assert errors[0] == "Please enter a valid 10-digit mobile number."
+    assert errors[1].startswith("Orders are closed for 06 Jan (Monday)")
+
+    small = price_order(menu, dates, {MONDAY: {'lunch': {'Chapati': 1}}})
+    assert f"₹{MINIMUM_ORDER_VALUE}" in validate_order('Asha', '9876543210', '12 MG Road', small, allowed)[0]
@@ -0,0 +1,56 @@
+import pytest
+
+from capacity import CapacityError, remaining, set_capacity
+from db import connect, transaction
+from orders import import_orders, save_order, submit_order
+from production import add_order_counts, production_summary
+
+WEDNESDAY, THURSDAY = '2025-01-08', '2025-01-09'
+
+
+def stored(contact):
+    return connect().execute("SELECT COUNT(*) FROM orders WHERE contact = ?", (contact,)).fetchone()[0]
+
+
+def test_reserve_counts_tiffins_only(place_order):
+    set_capacity(WEDNESDAY, 'lunch', 2)
+    submit_order(place_order({WEDNESDAY: {'lunch': {'full_tiffin': 1, 'Chapati': 4}}}, contact='9811300001'))
+    assert remaining(WEDNESDAY, 'lunch') == 1
+
+
+def test_full_slot_rolls_back_the_whole_order(place_order):
+    set_capacity(WEDNESDAY, 'dinner', 2)
+    set_capacity(THURSDAY, 'dinner', 2)
+    submit_order(place_order({WEDNESDAY: {'dinner': {'full_tiffin': 1, 'half_tiffin': 1}}}, contact='9811300002'))
+    assert remaining(WEDNESDAY, 'dinner') == 0
+
+    rejected = place_order({THURSDAY: {'dinner': {'half_tiffin': 1}}, WEDNESDAY: {'dinner': {'half_tiffin': 1}}},
+                           contact='9811300003')
+    with pytest.raises(CapacityError) as excinfo:
+        submit_order(rejected)
+    assert (excinfo.value.date, excinfo.value.meal, excinfo.value.remaining) == (WEDNESDAY, 'dinner', 0)
+    # Nothing of the rejected order is kept, including the slot that had room
+    assert remaining(THURSDAY, 'dinner') == 2
+    assert stored('9811300003') == 0
+    assert connect().execute("SELECT COUNT(*) FROM outbox WHERE order_id = ?",
+                             (rejected.order_id,)).fetchone()[0] == 0
+    thursday = production_summary(THURSDAY, THURSDAY)
+    assert thursday.empty or 'dinner' not in set(thursday['meal'])
+
+
+def test_slots_are_seeded_from_earlier_orders(place_order):
+    # An order stored before capacity limits existed
+    order = place_order({THURSDAY: {'lunch': {'full_tiffin': 3}}}, contact='9811300004')
+    with transaction() as conn:
+        save_order(conn, order)
+        add_order_counts(conn, order)
+    set_capacity(THURSDAY, 'lunch', 4)
+    assert remaining(THURSDAY, 'lunch') == 1
+    with pytest.raises(CapacityError):
+        submit_order(place_order({THURSDAY: {'lunch': {'full_tiffin': 2}}}, contact='9811300005'))
+
+
+def test_imported_orders_are_booked_past_capacity(place_order):
+    import_orders([place_order({THURSDAY: {'lunch': {'half_tiffin': 2}}}, contact='9811300006')])
+    assert remaining(THURSDAY, 'lunch') == 0
+    assert stored('9811300006') == 1
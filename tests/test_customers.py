@@ -0,0 +1,33 @@
+from customers import lookup_customer, verify_customer
+from orders import import_orders, store_orders, submit_order
+
+MONDAY = '2025-01-06'
+
+
+def test_lookup_needs_confirmation_id(place_order):
+    first = place_order({MONDAY: {'lunch': {'full_tiffin': 1}}}, contact='9811600001')
+    submit_order(first)
+    latest = place_order({MONDAY: {'dinner': {'half_tiffin': 1}}}, contact='9811600001')
+    latest.created_at = '2099-01-01 00:00:00'
+    store_orders([latest])
+
+    customer = lookup_customer('98116 00001')
+    assert (customer.contact, customer.name, customer.last_order_id, customer.order_count) == (
+        '9811600001', 'Asha', latest.order_id, 2)
+
+    assert verify_customer('98116-00001', first.order_id.lower()).last_order_id == latest.order_id
+    assert verify_customer('9811600001', 'HFB-250106-FFFFFF') is None
+    assert verify_customer('9811600002', first.order_id) is None
+    assert lookup_customer('9811600002') is None
+
+
+def test_older_imported_orders_keep_the_latest_details(place_order):
+    latest = place_order({MONDAY: {'lunch': {'full_tiffin': 1}}}, contact='9811600003')
+    submit_order(latest)
+    older = place_order({MONDAY: {'lunch': {'half_tiffin': 1}}}, contact='9811600003')
+    older.created_at, older.address = '2024-06-01 09:00:00', 'Old address'
+    import_orders([older])
+
+    customer = lookup_customer('9811600003')
+    assert (customer.last_order_id, customer.address, customer.order_count) == (
+        latest.order_id, latest.address, 2)
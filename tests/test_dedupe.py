@@ -0,0 +1,61 @@
+import pytest
+
+import dedupe
+from db import connect
+from dedupe import find_duplicate, order_fingerprint
+from orders import submit_order
+from pricing import price_order
+
+MONDAY = '2025-01-06'
+WEEK = {MONDAY: {'lunch': {'full_tiffin': 1}}}
+
+
+@pytest.fixture
+def other_worker():
+    """Forget in-memory submissions, as a different worker process would"""
+    def forget():
+        with dedupe._lock:
+            dedupe._recent.clear()
+            dedupe._recent_order_ids.clear()
+    return forget
+
+
+def test_fingerprint_ignores_order_id(menu, dates):
+    fingerprint = order_fingerprint('9876543210', price_order(menu, dates, WEEK))
+    assert fingerprint == order_fingerprint('98765 43210', price_order(menu, dates, WEEK))
+    assert fingerprint != order_fingerprint('9123456780', price_order(menu, dates, WEEK))
+    assert fingerprint != order_fingerprint(
+        '9876543210', price_order(menu, dates, {MONDAY: {'lunch': {'full_tiffin': 2}}}))
+
+
+def test_double_submit_returns_first_order(place_order, menu, dates):
+    fingerprint = order_fingerprint('9811200001', price_order(menu, dates, WEEK))
+    first, second = place_order(WEEK, contact='9811200001'), place_order(WEEK, contact='9811200001')
+    assert first.order_id != second.order_id
+
+    assert submit_order(first, fingerprint) == (first.order_id, True)
+    assert submit_order(second, fingerprint) == (first.order_id, False)
+    assert connect().execute("SELECT COUNT(*) FROM orders WHERE contact = '9811200001'").fetchone()[0] == 1
+
+
+def test_submissions_from_other_workers_are_found_in_sqlite(place_order, menu, dates, other_worker):
+    fingerprint = order_fingerprint('9811200002', price_order(menu, dates, WEEK))
+    first = place_order(WEEK, contact='9811200002')
+    submit_order(first, fingerprint)
+    other_worker()
+
+    assert find_duplicate('HFB-OTHER-ID', fingerprint) == first.order_id
+    assert find_duplicate(first.order_id, 'unrelated fingerprint') == first.order_id
+    second = place_order(WEEK, contact='9811200002')
+    assert submit_order(second, fingerprint) == (first.order_id, False)
+
+
+def test_submissions_outside_the_window_are_new(place_order, menu, dates, other_worker):
+    fingerprint = order_fingerprint('9811200003', price_order(menu, dates, WEEK))
+    first = place_order(WEEK, contact='9811200003')
+    submit_order(first, fingerprint)
+    other_worker()
+    connect().execute("UPDATE submissions SET created_at = created_at - ? WHERE fingerprint = ?",
+                      (dedupe.DEDUPE_WINDOW_SECONDS + 1, fingerprint))
+
+    assert find_duplicate('HFB-OTHER-ID', fingerprint) is None
@@ -0,0 +1,51 @@
+from deliveries import UNZONED, address_zone, normalize_address, plan_routes
+from storage import SQLiteOrderStore
+
+TUESDAY = '2025-01-07'
+
+
+def test_address_spellings_match():
+    assert normalize_address("Flat 4, M.G. Rd, Pune 411 001") == normalize_address("flat 4 MG Road pune 411001")
+    assert address_zone("Flat 4, M.G. Rd, Pune 411 001") == '411001'
+    assert address_zone("12 Lane 5, Koregaon Park, Pune") == 'Koregaon Park'
+    assert address_zone("Pune") == UNZONED
+
+
+def test_plan_routes_batches_stops_by_zone(place_order):
+    addresses = ['1 FC Road, Pune 411004', '2 FC Road, Pune 411004', '3 FC Road, Pune 411004',
+                 '9 Baner Road, Pune 411045', 'Pune, Maharashtra']
+    for n, address in enumerate(addresses):
+        order = place_order({TUESDAY: {'lunch': {'full_tiffin': 1}}, '2025-01-06': {'dinner': {'half_tiffin': 1}}},
+                            contact=f'98117000{n:02d}')
+        order.address = address
+        SQLiteOrderStore(mirror=False).submit(order)
+    # A second order to the same address, spelt differently, is the same stop
+    again = place_order({TUESDAY: {'lunch': {'half_tiffin': 2, 'Dal Khichadi': 1}}}, contact='9811700000')
+    again.address = '1, F.C. Rd, Pune 411 004'
+    SQLiteOrderStore(mirror=False).submit(again)
+
+    plan = plan_routes(TUESDAY, 'lunch', max_stops=2, store=SQLiteOrderStore(mirror=False))
+    assert list(plan.zones) == ['411004', '411045', UNZONED]
+    batches = [(number, zone, [stop.address_key for stop in stops]) for number, zone, stops in plan.batches()]
+    assert batches == [
+        (1, '411004', ['1 fc road pune 411004', '2 fc road pune 411004']),
+        (2, '411004', ['3 fc road pune 411004']),
+        (3, '411045', ['9 baner road pune 411045']),
+        (4, UNZONED, ['pune maharashtra']),
+    ]
+    first = plan.zones['411004'][0][0]
+    assert len(first.order_ids) == 2
+    # Only Tuesday lunch's lines are counted
+    assert first.items == {'full_tiffin': 1, 'half_tiffin': 2, 'Dal Khichadi': 1}
+
+
+def test_customers_at_one_address_are_separate_stops(place_order):
+    store = SQLiteOrderStore(mirror=False)
+    for contact, sku in (('9811700101', 'full_tiffin'), ('9811700102', 'half_tiffin')):
+        order = place_order({TUESDAY: {'dinner': {sku: 1}}}, contact=contact)
+        order.address = '5 Shivaji Nagar, Pune 411005'
+        store.submit(order)
+
+    (batch,) = plan_routes(TUESDAY, 'dinner', store=store).zones['411005']
+    assert [(stop.contact, stop.items) for stop in batch] == [
+        ('9811700101', {'full_tiffin': 1}), ('9811700102', {'half_tiffin': 1})]
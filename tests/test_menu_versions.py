@@ -0,0 +1,70 @@
+import copy
+
+import pytest
+
+from menu import MenuError, get_menu, menu_to_raw
+from menu_versions import list_publications, publish_menu, publish_version, revenue_by_version
+from orders import Order, submit_order
+from pricing import price_order
+
+# A date no other test orders for, so revenue only counts this file's orders
+TUESDAY = {'date': '04 Mar', 'day': 'Tuesday', 'full_date': '2025-03-04'}
+
+
+@pytest.fixture
+def file_menu():
+    """The day-menu.yaml menu; published menus are rolled back to it afterwards"""
+    menu = get_menu()
+    yield menu
+    publish_version(menu.version, 'Back to the file menu')
+
+
+def _raised(menu, day, size, by):
+    raw = copy.deepcopy(menu_to_raw(menu))
+    raw[day][size]['cost'] += by
+    return raw
+
+
+def test_publish_swaps_the_live_menu(file_menu):
+    full = file_menu.sku_index['full_tiffin']
+    price = file_menu.day('Tuesday').prices[full]
+
+    published = publish_menu(_raised(file_menu, 'Tuesday', 'full_tiffin', 10), 'Dearer Tuesday')
+    assert published.version != file_menu.version
+    assert get_menu().version == published.version
+    assert get_menu().day('Tuesday').prices[full] == price + 10
+    assert list_publications()[0]['version'] == published.version
+
+    # The same content is the same version
+    again = publish_menu(_raised(file_menu, 'Tuesday', 'full_tiffin', 10), 'Again')
+    assert again.version == published.version
+
+    assert publish_version(file_menu.version, 'Roll back').version == file_menu.version
+    assert get_menu().day('Tuesday').prices[full] == price
+
+
+def test_bad_publish_keeps_the_live_menu(file_menu):
+    with pytest.raises(MenuError):
+        publish_version('not-a-version')
+    raw = menu_to_raw(file_menu)
+    raw['Tuesday']['full_tiffin']['cost'] = 'free'
+    with pytest.raises(MenuError):
+        publish_menu(raw)
+    assert get_menu().version == file_menu.version
+
+
+def test_revenue_by_version(file_menu):
+    priced = price_order(file_menu, [TUESDAY], {TUESDAY['full_date']: {'lunch': {'full_tiffin': 2}}})
+    order = Order.from_priced(priced, 'Asha', '9555000001', '12 MG Road, Pune 411001')
+    assert order.menu_version == file_menu.version
+    submit_order(order)
+
+    revenue = revenue_by_version(TUESDAY['full_date'], TUESDAY['full_date'])
+    assert revenue['menu_version'].tolist() == [file_menu.version]
+    assert revenue['charged'].tolist() == revenue['recomputed'].tolist() == [order.total_price]
+
+    dearer = publish_menu(_raised(file_menu, 'Tuesday', 'full_tiffin', 10), 'Dearer Tuesday')
+    repriced = revenue_by_version(TUESDAY['full_date'], TUESDAY['full_date'], at_version=dearer.version)
+    assert repriced['charged'].tolist() == [order.total_price]
+    assert repriced['recomputed'].tolist() == [order.total_price + 20]
+    assert repriced['unpriced_lines'].tolist() == [0]
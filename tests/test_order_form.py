@@ -0,0 +1,47 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'streamlit_app.py')
+
+
+def open_form():
+    """The order form with its first served date picked"""
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    dates = at.multiselect[0]
+    dates.set_value([next(option for option in dates.options if 'Friday' not in option)]).run()
+    assert not at.exception
+    return at
+
+
+def submit(at, tiffins):
+    at.number_input[0].set_value(tiffins)
+    at.text_input(key='form_name').input("Asha")
+    at.text_input(key='form_contact').input("98765 43210")
+    at.text_area(key='form_address').input("12 MG Road, Pune 411001")
+    next(button for button in at.button if button.label == 'Submit Order').click().run()
+    assert not at.exception
+    return at
+
+
+def test_capacity_and_lookup_follow_the_store(store):
+    at = open_form()
+    assert "2 tiffins left for Lunch." in [caption.value for caption in at.caption]
+    submit(at, 2)
+    assert "confirmation ID" in at.success[0].value
+    (order_id,) = store.orders
+
+    at = open_form()
+    assert "Lunch is fully booked for this day." in [warning.value for warning in at.warning]
+    at.text_input(key='lookup_contact').input("9876543210")
+    at.text_input(key='lookup_order_id').input(order_id.lower())
+    next(button for button in at.button if button.label == 'Find my details').click().run()
+    assert not at.exception
+    assert at.text_input(key='form_name').value == "Asha"
+    assert at.text_area(key='form_address').value == "12 MG Road, Pune 411001"
+
+
+def test_full_slot_is_reported(store):
+    at = submit(open_form(), 3)
+    assert "is down to 2 tiffins" in at.error[0].value
+    assert store.orders == {}
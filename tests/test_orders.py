@@ -0,0 +1,39 @@
+import json
+
+from db import connect
+from orders import submit_order
+
+MONDAY, TUESDAY = '2025-01-06', '2025-01-07'
+
+
+def test_order_and_sheet_row_stored_together(place_order):
+    order = place_order({MONDAY: {'lunch': {'full_tiffin': 1, 'Bhaji': 2}}, TUESDAY: {'dinner': {'half_tiffin': 1}}})
+    assert submit_order(order) == (order.order_id, True)
+
+    conn = connect()
+    header = conn.execute("SELECT * FROM orders WHERE order_id = ?", (order.order_id,)).fetchone()
+    assert (header['name'], header['contact'], header['total_price']) == ('Asha', '9876543210', 380)
+    lines = conn.execute("SELECT date, day, meal, sku, qty, unit_price FROM order_lines "
+                         "WHERE order_id = ? ORDER BY date, sku", (order.order_id,)).fetchall()
+    assert [tuple(line) for line in lines] == [
+        (MONDAY, 'Monday', 'lunch', 'Bhaji', 2, 60),
+        (MONDAY, 'Monday', 'lunch', 'full_tiffin', 1, 160),
+        (TUESDAY, 'Tuesday', 'dinner', 'half_tiffin', 1, 100),
+    ]
+    payload = json.loads(conn.execute("SELECT payload FROM outbox WHERE order_id = ?",
+                                      (order.order_id,)).fetchone()['payload'])
+    assert payload['Order ID'] == order.order_id
+    assert payload['Total Price'] == 380
+    assert payload['Tiffin Details'].startswith("06 Jan (Monday): Lunch: 0 half, 1 full, Extras: Bhaji x2")
+
+
+def test_resubmitting_an_order_id_writes_nothing(place_order):
+    order = place_order({MONDAY: {'lunch': {'half_tiffin': 1}}})
+    submit_order(order)
+    again = place_order({MONDAY: {'lunch': {'full_tiffin': 3}}}, order_id=order.order_id)
+    assert submit_order(again) == (order.order_id, False)
+
+    conn = connect()
+    assert conn.execute("SELECT total_price FROM orders WHERE order_id = ?", (order.order_id,)).fetchone()[0] == 100
+    assert conn.execute("SELECT COUNT(*) FROM order_lines WHERE order_id = ?", (order.order_id,)).fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM outbox WHERE order_id = ?", (order.order_id,)).fetchone()[0] == 1
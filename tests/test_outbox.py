@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+import outbox
+import sheets
+from benchmarks.fake_gspread import DEFAULT_HEADERS, FakeClient
+from config import SHEET_NAME, SPREADSHEET_NAME
+from db import connect
+from outbox import BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS, ORDER_ID_HEADER
+
+
+class FlakySheet:
+    """Stands in for a WorksheetHandle; fails the next append, before or after it lands"""
+
+    def __init__(self):
+        self.rows = []
+        self.calls = []
+        self.fail = None
+
+    def add_headers(self, names):
+        return names
+
+    def column_values(self, header):
+        self.calls.append('column_values')
+        return [row.get(header, '') for row in self.rows]
+
+    def append_rows(self, data_dicts):
+        self.calls.append('append_rows')
+        if self.fail == 'before':
+            self.fail = None
+            raise ConnectionError("connection reset")
+        self.rows.extend(data_dicts)
+        if self.fail == 'after':
+            self.fail = None
+            raise TimeoutError("read timed out")
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    connect().execute("DELETE FROM outbox")
+    sheet = FlakySheet()
+    monkeypatch.setattr(outbox, 'get_worksheet', lambda *args: sheet)
+    return sheet
+
+
+def outbox_row(order_id):
+    return dict(connect().execute("SELECT * FROM outbox WHERE order_id = ?", (order_id,)).fetchone())
+
+
+def make_due(order_id):
+    connect().execute("UPDATE outbox SET next_attempt_at = 0 WHERE order_id = ?", (order_id,))
+
+
+def test_batch_is_one_append(sheet):
+    for n in range(3):
+        outbox.enqueue_order({'Name': f"Customer {n}"}, f"HFB-250106-00000{n}")
+    assert outbox.drain_once(batch_size=2) == 2
+    assert outbox.drain_once(batch_size=2) == 1
+    assert outbox.drain_once(batch_size=2) == 0
+    assert sheet.calls == ['append_rows', 'append_rows']
+    assert [row[ORDER_ID_HEADER] for row in sheet.rows] == [f"HFB-250106-00000{n}" for n in range(3)]
+    assert outbox.pending_count() == 0
+
+
+def test_failed_append_backs_off_then_retries(sheet):
+    outbox.enqueue_order({'Name': 'Asha'}, 'HFB-250106-000001')
+    sheet.fail = 'before'
+    assert outbox.drain_once() == 0
+    row = outbox_row('HFB-250106-000001')
+    assert (row['status'], row['attempts'], row['last_error']) == ('pending', 1, "connection reset")
+    assert row['next_attempt_at'] > 0
+
+    # Not due yet: the sheet isn't touched
+    assert outbox.drain_once() == 0
+    assert sheet.calls == ['append_rows']
+
+    make_due('HFB-250106-000001')
+    assert outbox.drain_once() == 1
+    assert sheet.calls == ['append_rows', 'column_values', 'append_rows']
+    assert len(sheet.rows) == 1
+    assert outbox_row('HFB-250106-000001')['status'] == 'sent'
+
+
+def test_retry_skips_rows_that_landed(sheet):
+    outbox.enqueue_order({'Name': 'Asha'}, 'HFB-250106-000001')
+    sheet.fail = 'after'
+    assert outbox.drain_once() == 0
+    outbox.enqueue_order({'Name': 'Ravi'}, 'HFB-250106-000002')
+
+    make_due('HFB-250106-000001')
+    assert outbox.drain_once() == 2
+    assert [row[ORDER_ID_HEADER] for row in sheet.rows] == ['HFB-250106-000001', 'HFB-250106-000002']
+
+
+def test_interrupted_batch_is_checked_before_resending(sheet):
+    outbox.enqueue_order({'Name': 'Asha'}, 'HFB-250106-000001')
+    sheet.rows.append(json.loads(outbox_row('HFB-250106-000001')['payload']))
+    # A worker died after appending but before marking the batch sent
+    connect().execute("UPDATE outbox SET status = 'sending'")
+
+    outbox.recover_in_flight()
+    assert outbox.drain_once() == 1
+    assert sheet.calls == ['column_values']
+    assert len(sheet.rows) == 1
+
+
+def test_baseline_sheet_gets_order_id_column(monkeypatch):
+    connect().execute("DELETE FROM outbox")
+    fake = FakeClient(latency=0)
+    monkeypatch.setattr(sheets, '_pool', None)
+    sheets.use_client_factory(fake.factory)
+    worksheet = fake.spreadsheets[SPREADSHEET_NAME].sheets[SHEET_NAME]
+    assert ORDER_ID_HEADER not in DEFAULT_HEADERS
+
+    # The first append lands but its response times out
+    land = worksheet.append_row
+
+    def land_then_time_out(values, **kwargs):
+        monkeypatch.setattr(worksheet, 'append_row', land)
+        land(values)
+        raise TimeoutError("read timed out")
+    monkeypatch.setattr(worksheet, 'append_row', land_then_time_out)
+
+    outbox.enqueue_order({'Name': 'Asha', 'Payment Screenshot': 'screenshots/a.png'}, 'HFB-250106-000001')
+    assert outbox.drain_once() == 0
+    make_due('HFB-250106-000001')
+    assert outbox.drain_once() == 1
+
+    headers = worksheet.rows[0]
+    assert headers[:len(DEFAULT_HEADERS)] == DEFAULT_HEADERS
+    assert set(headers[len(DEFAULT_HEADERS):]) == {ORDER_ID_HEADER, 'Payment Screenshot'}
+    (row,) = [dict(zip(headers, row)) for row in worksheet.rows[1:]]
+    assert (row['Name'], row[ORDER_ID_HEADER], row['Payment Screenshot']) == (
+        'Asha', 'HFB-250106-000001', 'screenshots/a.png')
+
+
+def test_retry_waits_for_a_removed_order_id_column(sheet, monkeypatch):
+    outbox.enqueue_order({'Name': 'Asha'}, 'HFB-250106-000001')
+    sheet.fail = 'after'
+    assert outbox.drain_once() == 0
+    monkeypatch.setattr(sheet, 'column_values', lambda header: None)
+
+    make_due('HFB-250106-000001')
+    assert outbox.drain_once() == 0
+    row = outbox_row('HFB-250106-000001')
+    assert (row['status'], row['attempts']) == ('pending', 2)
+    assert ORDER_ID_HEADER in row['last_error']
+    assert len(sheet.rows) == 1
+
+
+def test_backoff_grows_to_the_cap():
+    for attempts in range(12):
+        ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempts)
+        assert ceiling / 2 <= outbox.backoff_delay(attempts) <= ceiling
+    assert outbox.backoff_delay(30) <= BACKOFF_MAX_SECONDS
@@ -0,0 +1,43 @@
+from pricing import MINIMUM_ORDER_VALUE, price_order
+
+MONDAY, TUESDAY, FRIDAY = '2025-01-06', '2025-01-07', '2025-01-10'
+
+
+def test_week_total_and_lines(menu, dates):
+    priced = price_order(menu, dates, {
+        MONDAY: {'lunch': {'full_tiffin': 1, 'Chapati': 2}, 'dinner': {'half_tiffin': 1}},
+        TUESDAY: {'dinner': {'full_tiffin': 2}},
+    })
+    assert priced.total == 160 + 2 * 15 + 100 + 2 * 160
+    assert priced.meal_total(0, 'lunch') == 190
+    assert priced.day_total(1) == 320
+    assert priced.meets_minimum()
+    assert sorted((line['date_info']['full_date'], line['meal'], line['sku'], line['qty'], line['unit_price'])
+                  for line in priced.line_items()) == [
+        (MONDAY, 'dinner', 'half_tiffin', 1, 100),
+        (MONDAY, 'lunch', 'Chapati', 2, 15),
+        (MONDAY, 'lunch', 'full_tiffin', 1, 160),
+        (TUESDAY, 'dinner', 'full_tiffin', 2, 160),
+    ]
+
+
+def test_items_not_served_are_free(menu, dates):
+    # Varan is sold Monday, Wednesday and Friday; Friday has no tiffins
+    priced = price_order(menu, dates, {
+        TUESDAY: {'lunch': {'Varan': 1}},
+        FRIDAY: {'lunch': {'full_tiffin': 1}},
+    })
+    assert priced.total == 0
+    assert not priced.meets_minimum()
+
+
+def test_minimum_order_value(menu, dates):
+    assert MINIMUM_ORDER_VALUE == 100
+    assert not price_order(menu, dates, {MONDAY: {'lunch': {'Chapati': 6}}}).meets_minimum()
+    assert price_order(menu, dates, {MONDAY: {'lunch': {'half_tiffin': 1}}}).meets_minimum()
+
+
+def test_tiffin_details(menu, dates):
+    priced = price_order(menu, dates[:1], {MONDAY: {'lunch': {'full_tiffin': 2, 'Bhaji': 1}}})
+    assert priced.tiffin_details() == [
+        "06 Jan (Monday): Lunch: 0 half, 2 full, Extras: Bhaji x1; Dinner: 0 half, 0 full"]
@@ -0,0 +1,28 @@
+from db import connect
+from orders import submit_order
+from production import production_summary, rebuild_counts
+
+SATURDAY = '2025-01-11'
+
+
+def _counts():
+    return sorted(tuple(row) for row in connect().execute(
+        "SELECT date, meal, sku, qty FROM production_counts WHERE qty > 0"))
+
+
+def test_running_counts_match_a_rebuild(place_order):
+    submit_order(place_order({SATURDAY: {'lunch': {'full_tiffin': 2, 'Bhaji': 1}}}))
+    submit_order(place_order({SATURDAY: {'lunch': {'full_tiffin': 1}, 'dinner': {'half_tiffin': 1}}},
+                             contact='9123456780'))
+    running = _counts()
+    rebuild_counts()
+    assert _counts() == running
+
+
+def test_summary_has_tiffins_before_extras(place_order):
+    submit_order(place_order({SATURDAY: {'lunch': {'half_tiffin': 1, 'full_tiffin': 1, 'Bhaji': 1}}},
+                             contact='9000000001'))
+    summary = production_summary(SATURDAY, SATURDAY)
+    assert list(summary.columns[:2]) == ['date', 'meal']
+    columns = list(summary.columns[2:])
+    assert columns.index('Bhaji') > max(columns.index('Half Tiffin'), columns.index('Full Tiffin'))
@@ -0,0 +1,41 @@
+from db import connect
+from orders import Order, import_orders, submit_order
+from pricing import price_order
+from reports import daily_revenue, rebuild_sales
+
+# A week no other test orders for
+TUESDAY = {'date': '11 Mar', 'day': 'Tuesday', 'full_date': '2025-03-11'}
+SATURDAY = {'date': '15 Mar', 'day': 'Saturday', 'full_date': '2025-03-15'}
+WEEK = '2025-03-10'
+
+
+def _order(menu, per_date_tiffin, contact):
+    priced = price_order(menu, [TUESDAY, SATURDAY], per_date_tiffin)
+    return Order.from_priced(priced, 'Asha', contact, '12 MG Road, Pune 411001')
+
+
+def _sales():
+    conn = connect()
+    return (sorted(tuple(row) for row in conn.execute(
+                "SELECT * FROM sales_daily WHERE date BETWEEN ? AND ?",
+                (TUESDAY['full_date'], SATURDAY['full_date']))),
+            sorted(tuple(row) for row in conn.execute("SELECT * FROM sales_weekly WHERE week = ?", (WEEK,))))
+
+
+def test_running_sales_match_a_rebuild(menu):
+    submit_order(_order(menu, {TUESDAY['full_date']: {'lunch': {'full_tiffin': 1, 'Bhaji': 2}},
+                               SATURDAY['full_date']: {'dinner': {'half_tiffin': 1}}}, '9444000001'))
+    import_orders([_order(menu, {SATURDAY['full_date']: {'dinner': {'half_tiffin': 2}}}, '9444000002')])
+    running = _sales()
+    assert running[0] and running[1]
+    rebuild_sales()
+    assert _sales() == running
+
+
+def test_daily_revenue(menu):
+    order = _order(menu, {TUESDAY['full_date']: {'dinner': {'full_tiffin': 2}}}, '9444000003')
+    before = daily_revenue(TUESDAY['full_date'], TUESDAY['full_date'])
+    submit_order(order)
+    after = daily_revenue(TUESDAY['full_date'], TUESDAY['full_date'])
+    assert after['orders'].sum() == before['orders'].sum() + 1
+    assert after['revenue'].sum() == before['revenue'].sum() + order.total_price
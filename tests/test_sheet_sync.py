@@ -0,0 +1,92 @@
+import pytest
+
+import sheet_sync
+from db import connect
+from orders import submit_order
+from sheet_sync import SheetSync
+
+# The order sheet's columns before the app stored order IDs
+HEADERS = ['Timestamp', 'Name', 'Contact Number', 'Address', 'Tiffin Details',
+           'Special Instructions', 'Total Price']
+
+
+def sheet_row(timestamp, contact, details, total=None):
+    row = [timestamp, 'Ravi', contact, '4 FC Road, Pune', details, '', str(total)]
+    # The API drops trailing empty cells
+    return row if total is not None else row[:5]
+
+
+class StubSheet:
+    """Stands in for a WorksheetHandle; records which ranges were read"""
+
+    def __init__(self, rows):
+        self.values = [list(HEADERS)] + rows
+        self.reads = []
+
+    def headers(self, refresh=False):
+        return self.values[0]
+
+    def get_values(self, range_name=None):
+        self.reads.append(range_name)
+        if range_name is None:
+            return [list(row) for row in self.values]
+        first = int(range_name[1:range_name.index(':')])
+        return [list(row) for row in self.values[first - 1:]]
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    connect().execute("DELETE FROM sheet_sync")
+    sheet = StubSheet([
+        sheet_row('2024-12-30 09:15:00', '9811100001',
+                  "02 Jan (Thursday): Lunch: 1 half, 1 full, Extras: Bhaji x2; Dinner: 0 half, 0 full", 380),
+    ])
+    monkeypatch.setattr(sheet_sync, 'get_worksheet', lambda *args: sheet)
+    return sheet
+
+
+def imported(contact):
+    return connect().execute("SELECT * FROM orders WHERE contact = ?", (contact,)).fetchall()
+
+
+def test_first_sync_imports_the_whole_sheet(sheet):
+    stats = SheetSync().sync()
+    assert (stats['mode'], stats['rows_fetched'], stats['imported']) == ('full', 1, 1)
+    assert sheet.reads == [None]
+
+    order = imported('9811100001')[0]
+    assert order['order_id'].startswith('SHEET-')
+    assert order['total_price'] == 380
+    lines = connect().execute("SELECT date, day, meal, sku, qty FROM order_lines WHERE order_id = ? "
+                              "ORDER BY sku", (order['order_id'],)).fetchall()
+    # The year comes from the order timestamp, which was in the year before
+    assert [tuple(line) for line in lines] == [
+        ('2025-01-02', 'Thursday', 'lunch', 'Bhaji', 2),
+        ('2025-01-02', 'Thursday', 'lunch', 'full_tiffin', 1),
+        ('2025-01-02', 'Thursday', 'lunch', 'half_tiffin', 1),
+    ]
+
+
+def test_later_syncs_read_only_new_rows(sheet):
+    SheetSync().sync()
+    sheet.values.append(sheet_row('2025-01-01 18:00:00', '9811100002',
+                                  "04 Jan (Saturday): Lunch: 0 half, 0 full; Dinner: 2 half, 0 full"))
+    stats = SheetSync().sync()
+    assert (stats['mode'], stats['rows_fetched'], stats['imported']) == ('delta', 1, 1)
+    assert sheet.reads == [None, 'A3:G']
+    # Without a Total Price cell the total is rebuilt from the menu
+    assert imported('9811100002')[0]['total_price'] > 0
+
+    assert SheetSync().sync()['rows_fetched'] == 0
+    assert sheet.reads[-1] == 'A4:G'
+
+
+def test_rows_already_stored_are_skipped(sheet, place_order):
+    order = place_order({'2025-01-06': {'lunch': {'full_tiffin': 1}}}, contact='9811100003')
+    submit_order(order)
+    # The app's own row, read back from a sheet without an Order ID column
+    sheet.values.append(sheet_row(order.created_at, order.contact, order.tiffin_details, order.total_price))
+    SheetSync().sync()
+    assert len(imported('9811100003')) == 1
+    # A full re-read finds nothing new
+    assert SheetSync().sync(full=True)['imported'] == 0
@@ -0,0 +1,77 @@
+import pytest
+
+from capacity import CapacityError, remaining
+from db import connect
+from storage import SQLiteOrderStore
+
+MONDAY = '2025-01-06'
+
+
+def test_memory_store_deduplicates(store, place_order):
+    week = {MONDAY: {'lunch': {'full_tiffin': 1}}}
+    first, second = place_order(week), place_order(week)
+    assert store.submit(first, 'fingerprint') == (first.order_id, True)
+    assert store.submit(second, 'fingerprint') == (first.order_id, False)
+    # A retry of the same form reuses its order ID
+    assert store.submit(first) == (first.order_id, False)
+    assert list(store.orders) == [first.order_id]
+    assert store.get(first.order_id) is first
+
+
+def test_memory_store_rejects_full_slots(store, place_order):
+    store.submit(place_order({MONDAY: {'lunch': {'full_tiffin': 1, 'half_tiffin': 1}}}))
+    with pytest.raises(CapacityError) as excinfo:
+        store.submit(place_order({MONDAY: {'lunch': {'half_tiffin': 1}, 'dinner': {'half_tiffin': 1}}},
+                                 contact='9123456780'))
+    assert (excinfo.value.date, excinfo.value.meal, excinfo.value.remaining) == (MONDAY, 'lunch', 0)
+    # Nothing of the rejected order is booked, including the meal that had room
+    assert store.booked == {(MONDAY, 'lunch'): 2}
+    assert len(store.orders) == 1
+
+
+def test_memory_store_many_skips_full_orders(store, place_order):
+    orders = [place_order({MONDAY: {'dinner': {'full_tiffin': qty}}}, contact=f'98765432{n:02d}')
+              for n, qty in enumerate((1, 2, 1))]
+    created, rejected = store.store_many(orders)
+    assert created == [orders[0].order_id, orders[2].order_id]
+    assert list(rejected) == [orders[1].order_id]
+    assert rejected[orders[1].order_id].remaining == 1
+    assert store.remaining(MONDAY, 'dinner') == 0
+
+
+def test_memory_store_remaining_counts_tiffins_only(store, place_order):
+    assert store.remaining(MONDAY, 'lunch') == 2
+    store.submit(place_order({MONDAY: {'lunch': {'full_tiffin': 1, 'Chapati': 4}}}))
+    assert store.remaining(MONDAY, 'lunch') == 1
+    assert store.remaining(MONDAY, 'dinner') == 2
+
+
+def test_memory_store_lookup_needs_confirmation_id(store, place_order):
+    first = place_order({MONDAY: {'lunch': {'full_tiffin': 1}}}, order_id='HFB-250106-000001')
+    store.submit(first)
+    latest = place_order({MONDAY: {'dinner': {'half_tiffin': 1}}}, order_id='HFB-250106-000002')
+    latest.created_at = '2099-01-01 00:00:00'
+    store.submit(latest)
+
+    customer = store.lookup_customer('+91 98765 43210')
+    assert (customer.contact, customer.name, customer.last_order_id, customer.order_count) == (
+        '9876543210', 'Asha', latest.order_id, 2)
+
+    assert store.verify_customer('98765-43210', first.order_id.lower()).last_order_id == latest.order_id
+    assert store.verify_customer('9876543210', 'HFB-250106-FFFFFF') is None
+    assert store.verify_customer('9123456780', first.order_id) is None
+    assert store.lookup_customer('9123456780') is None
+
+
+def test_sqlite_store_without_mirror_queues_nothing(place_order):
+    store = SQLiteOrderStore(mirror=False)
+    order = place_order({MONDAY: {'dinner': {'half_tiffin': 1, 'Bhat': 1}}}, contact='9811500001')
+    assert store.submit(order) == (order.order_id, True)
+    assert connect().execute("SELECT COUNT(*) FROM outbox WHERE order_id = ?", (order.order_id,)).fetchone()[0] == 0
+
+    loaded = store.get(order.order_id)
+    assert (loaded.contact, loaded.total_price) == ('9811500001', order.total_price)
+    assert sorted((line.sku, line.qty) for line in loaded.lines) == [('Bhat', 1), ('half_tiffin', 1)]
+    assert store.get('HFB-000000-000000') is None
+    assert store.remaining(MONDAY, 'dinner') == remaining(MONDAY, 'dinner')
+    assert store.verify_customer('9811500001', order.order_id).last_order_id == order.order_id
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+from capacity import DEFAULT_MEAL_CAPACITY, remaining, set_capacity
+from db import connect
+from orders import store_orders
+from subscriptions import (cancel_subscription, get_subscription, materialize_week, save_subscription,
+                           subscription_order_id)
+
+# Subscriptions are saved in one week and ordered for the next
+SAVED_ON, NEXT_WEEK = datetime(2025, 1, 27), datetime(2025, 2, 3)
+TEMPLATE = {
+    'Monday': {'lunch': {'full_tiffin': 1, 'Varan': 1}},
+    # Varan isn't sold on Tuesdays and nothing is served on Fridays
+    'Tuesday': {'dinner': {'half_tiffin': 1, 'Varan': 2}},
+    'Friday': {'lunch': {'full_tiffin': 1}},
+}
+
+
+@pytest.fixture(autouse=True)
+def no_subscriptions():
+    connect().execute("DELETE FROM subscriptions")
+
+
+def lines_of(order_id):
+    return [tuple(row) for row in connect().execute(
+        "SELECT date, meal, sku, qty FROM order_lines WHERE order_id = ? ORDER BY date, sku", (order_id,))]
+
+
+def test_materialize_week_orders_what_the_menu_serves():
+    save_subscription('98114 00001', 'Meera', '7 JM Road, Pune', '', TEMPLATE, today=SAVED_ON)
+    assert materialize_week(NEXT_WEEK) == 1
+
+    order_id = subscription_order_id('9811400001', '2025-02-03')
+    assert lines_of(order_id) == [
+        ('2025-02-03', 'lunch', 'Varan', 1),
+        ('2025-02-03', 'lunch', 'full_tiffin', 1),
+        ('2025-02-04', 'dinner', 'half_tiffin', 1),
+    ]
+    assert connect().execute("SELECT COUNT(*) FROM outbox WHERE order_id = ?", (order_id,)).fetchone()[0] == 1
+    # The week is done; running again (or from another worker) orders nothing
+    assert materialize_week(NEXT_WEEK) == 0
+    assert get_subscription('9811400001')['last_week'] == '2025-02-03'
+
+
+def test_cancelled_subscriptions_are_not_ordered():
+    save_subscription('9811400002', 'Meera', '7 JM Road, Pune', '', TEMPLATE, today=SAVED_ON)
+    assert cancel_subscription('98114 00002')
+    assert get_subscription('9811400002') is None
+    assert materialize_week(NEXT_WEEK) == 0
+
+
+def test_existing_subscription_is_only_replaced_on_request():
+    assert save_subscription('9811400003', 'Meera', '7 JM Road, Pune', '', TEMPLATE, today=SAVED_ON)
+    other = {'Monday': {'dinner': {'half_tiffin': 2}}}
+    assert not save_subscription('9811400003', 'Someone else', 'Elsewhere', '', other, today=SAVED_ON)
+    assert get_subscription('9811400003')['name'] == 'Meera'
+
+    # Nor is a cancelled one restarted
+    cancel_subscription('9811400003')
+    assert not save_subscription('9811400003', 'Someone else', 'Elsewhere', '', other, today=SAVED_ON)
+    assert get_subscription('9811400003') is None
+
+    assert save_subscription('9811400003', 'Meera', '7 JM Road, Pune', '', other, today=SAVED_ON, replace=True)
+    assert get_subscription('9811400003')['template'] == other
+
+
+def test_store_orders_skips_full_orders_under_savepoints(place_order):
+    stored = place_order({'2025-01-11': {'dinner': {'full_tiffin': 1}}}, contact='9811400010')
+    store_orders([stored])
+    # Room for two more tiffins; the second order doesn't fit once the first is in
+    set_capacity('2025-01-11', 'dinner', DEFAULT_MEAL_CAPACITY - remaining('2025-01-11', 'dinner') + 2)
+    orders = [place_order({'2025-01-11': {'dinner': {'half_tiffin': qty}}}, contact=f'98114000{n:02d}')
+              for n, qty in zip((11, 12, 13), (1, 2, 1))]
+    created, rejected = store_orders([stored] + orders)
+
+    assert created == [orders[0].order_id, orders[2].order_id]
+    assert list(rejected) == [orders[1].order_id]
+    assert rejected[orders[1].order_id].remaining == 1
+    assert lines_of(orders[1].order_id) == []
+    queued = {row[0] for row in connect().execute("SELECT order_id FROM outbox")}
+    assert {orders[0].order_id, orders[2].order_id} <= queued
+    assert orders[1].order_id not in queued
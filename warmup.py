@@ -0,0 +1,44 @@
+import logging
+import threading
+import time
+
+from config import SHEET_MIRROR, SHEET_NAME, SPREADSHEET_NAME
+from metrics import span
+
+
+log = logging.getLogger(__name__)
+
+
+def warm_up():
+    """
+    Do the slow first-use work of a fresh worker process: compile the menu
+    and this week's calendar, and authorize the sheet client and read the
+    sheet's header row (importing gspread and google-auth on the way), so
+    neither the first customer nor the first outbox drain pays for it.
+    """
+    started = time.perf_counter()
+    with span('warmup'):
+        from week_calendar import get_week_view
+        get_week_view()
+        if SHEET_MIRROR:
+            from sheets import get_worksheet
+            try:
+                get_worksheet(SPREADSHEET_NAME, SHEET_NAME).headers()
+            except Exception as e:
+                # The outbox retries on its own schedule; nothing to do here
+                log.warning(f"Warm-up couldn't reach Google Sheets: {e}")
+    log.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+_started = False
+_started_lock = threading.Lock()
+
+
+def start_warmup():
+    """Run warm_up() once per process on a background thread"""
+    global _started
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
@@ -0,0 +1,155 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from menu import get_menu
+from pricing import TIFFIN_LABELS
+
+
+# Orders for the current week close after this weekday (Wednesday)
+CUTOFF_WEEKDAY = 2
+ORDER_DAYS_PER_WEEK = 6  # Monday to Saturday
+# Customers can order this many weeks ahead, starting with week_start()
+ADVANCE_WEEKS = int(os.environ.get('TIFFIN_ADVANCE_WEEKS', 4))
+
+
+def week_start(today=None):
+    """Monday of the week customers are ordering for on a given day.
+
+    Up to Wednesday that is the current week; from Thursday on it is next week.
+    """
+    today = today or datetime.now()
+    if today.weekday() > CUTOFF_WEEKDAY:
+        days_until_monday = (7 - today.weekday()) % 7
+        start_date = today + timedelta(days=days_until_monday)
+    else:
+        days_since_monday = today.weekday()
+        start_date = today - timedelta(days=days_since_monday)
+    return start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_rollover(today=None):
+    """When week_start() next changes: the Thursday 00:00 after today"""
+    today = today or datetime.now()
+    days_ahead = (CUTOFF_WEEKDAY + 1 - today.weekday()) % 7 or 7
+    return (today + timedelta(days=days_ahead)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_week_dates(today=None, weeks=1):
+    """Get ordering dates for the current week and, if weeks > 1, the weeks after it"""
+    start_date = week_start(today)
+    dates = []
+    for week in range(weeks):
+        for i in range(ORDER_DAYS_PER_WEEK):
+            current_date = start_date + timedelta(weeks=week, days=i)
+            dates.append({
+                'date': current_date.strftime('%d %b'),
+                'day': current_date.strftime('%A'),
+                'full_date': current_date.strftime('%Y-%m-%d')
+            })
+    return dates
+
+
+class DayView:
+    """Pre-rendered menu text for one weekday"""
+    __slots__ = ('day', 'tiffin_headings', 'tiffin_items', 'extra_labels')
+
+    def __init__(self, day_menu):
+        self.day = day_menu.day
+        # size -> "<b>Full Tiffin (₹160):</b>"
+        self.tiffin_headings = {
+            size: f"<b>{TIFFIN_LABELS[size]} (₹{tiffin.cost}):</b>"
+            for size, tiffin in day_menu.tiffins.items()
+        }
+        # size -> markdown bullet list of the tiffin's items
+        self.tiffin_items = {
+            size: "\n".join(f"- {item}" for item in tiffin.items)
+            for size, tiffin in day_menu.tiffins.items()
+        }
+        # (extra item name, number input label) in menu order
+        self.extra_labels = tuple((extra.name, f"{extra.name} (₹{extra.cost} each)")
+                                  for extra in day_menu.extras)
+
+
+class WeekView:
+    """Calendar and menu text for the weeks open for ordering, shared by all sessions"""
+    __slots__ = ('key', 'dates', 'date_options', 'date_map', 'day_views')
+
+    def __init__(self, key, dates, menu):
+        self.key = key
+        self.dates = tuple(dates)
+        self.date_options = tuple(f"{d['date']} ({d['day']})" for d in dates)
+        self.date_map = dict(zip(self.date_options, self.dates))
+        self.day_views = {
+            d['day']: DayView(menu.day(d['day'])) for d in dates if menu.day(d['day'])
+        }
+
+    def day_view(self, day):
+        return self.day_views.get(day)
+
+
+_views = {}
+_views_lock = threading.Lock()
+# Keys being precomputed in the background
+_pending = set()
+
+
+def _view_key(start_date, menu):
+    iso_year, iso_week, _ = start_date.isocalendar()
+    return (iso_year, iso_week, menu.version)
+
+
+def _build(start_date, menu):
+    key = _view_key(start_date, menu)
+    with _views_lock:
+        view = _views.get(key)
+    if view is None:
+        view = WeekView(key, get_week_dates(start_date, ADVANCE_WEEKS), menu)
+        with _views_lock:
+            view = _views.setdefault(key, view)
+    return view
+
+
+def _prune(current_key):
+    """Drop views for past weeks or superseded menus"""
+    with _views_lock:
+        for key in list(_views):
+            if key[:2] < current_key[:2] or (key[:2] == current_key[:2] and key[2] != current_key[2]):
+                del _views[key]
+
+
+def _precompute(start_date, menu):
+    try:
+        _build(start_date, menu)
+    finally:
+        with _views_lock:
+            _pending.discard(_view_key(start_date, menu))
+
+
+def get_week_view(today=None):
+    """
+    Return the WeekView customers should see now.
+
+    Views are keyed by ISO week and menu version. Whenever the view after
+    the next Wednesday cutoff isn't cached yet it is built in the
+    background, so the first visitor after the rollover finds it ready.
+    """
+    today = today or datetime.now()
+    menu = get_menu()
+    start_date = week_start(today)
+    key = _view_key(start_date, menu)
+    view = _views.get(key)
+    if view is None:
+        view = _build(start_date, menu)
+        _prune(key)
+
+    upcoming = week_start(next_rollover(today))
+    upcoming_key = _view_key(upcoming, menu)
+    if upcoming_key not in _views:
+        with _views_lock:
+            start = upcoming_key not in _pending
+            _pending.add(upcoming_key)
+        if start:
+            threading.Thread(target=_precompute, args=(upcoming, menu),
+                             name="week-view-precompute", daemon=True).start()
+    return view